@@ -0,0 +1,71 @@
+"""Import time of DXFImporter with ezdxf document and with fast_scan
+
+    PYTHONPATH=src python benchmarks/dxf_scanner_benchmark.py [FILE.dxf ...] [--lines 100000] [--repeat 5]
+
+Without files sample/*.DXF are measured. --lines adds a generated drawing with this many LINE entities.
+"""
+
+from pathlib import Path
+from typing import List
+
+import argparse
+import os
+import tempfile
+import time
+
+import ezdxf
+
+from laser_offset.importers.dxf_importer import DXFImporter
+
+SAMPLE_FOLDER = Path(__file__).parent.parent / "sample"
+
+
+def import_time(path: Path, fast_scan: bool, repeat: int) -> float:
+    # Best of several runs, file is read from page cache after the first one
+    best = float('inf')
+    for _ in range(repeat):
+        with open(path, "rt") as reader:
+            start = time.perf_counter()
+            DXFImporter(fast_scan=fast_scan).import_canvas(False, reader)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def generated_file(folder: str, lines: int) -> Path:
+    doc = ezdxf.new()
+    model_space = doc.modelspace()
+    for index in range(lines):
+        x = (index % 1000) * 0.1
+        y = (index // 1000) * 0.1
+        model_space.add_line((x, y), (x + 0.05, y + 0.05))
+    path = Path(folder) / "lines_{lines}.dxf".format(lines=lines)
+    doc.saveas(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares DXF import time of ezdxf document and fast scan")
+    parser.add_argument('files', nargs='*', type=Path)
+    parser.add_argument('--lines', type=int, default=0, help="Add generated drawing with this many LINE entities")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs of every file, the best one is shown")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        files: List[Path] = args.files or sorted(filter(lambda path: path.suffix.lower() == '.dxf', SAMPLE_FOLDER.iterdir()))
+        if args.lines > 0:
+            files.append(generated_file(folder, args.lines))
+
+        print("{file:<28} {size:>9} {ezdxf:>10} {scan:>10} {speedup:>8}".format(file="file", size="KB", ezdxf="ezdxf ms", scan="scan ms", speedup="speedup"))
+        for path in files:
+            ezdxf_time = import_time(path, False, args.repeat)
+            scan_time = import_time(path, True, args.repeat)
+            print("{file:<28} {size:>9.0f} {ezdxf:>10.1f} {scan:>10.1f} {speedup:>7.1f}x".format(
+                file=path.name,
+                size=os.path.getsize(path) / 1024,
+                ezdxf=ezdxf_time * 1000,
+                scan=scan_time * 1000,
+                speedup=ezdxf_time / scan_time))
+
+
+if __name__ == '__main__':
+    main()
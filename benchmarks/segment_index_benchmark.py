@@ -0,0 +1,90 @@
+"""fix_loops time with every segment index on offset rings of generated contours
+
+    PYTHONPATH=src python benchmarks/segment_index_benchmark.py [--segments 6000] [--repeat 3]
+
+Comb has long teeth side by side, star has long rays around one center. Both offset rings have many loops.
+"""
+
+from typing import Callable, Dict, List, Tuple, Type
+
+import argparse
+import math
+import time
+
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.style2d import Style
+from laser_offset.geometry_2d.shapes_2d.path2d import Path2d, PathComponent, MoveOrigin, Line, ClosePath
+from laser_offset.modifiers.polygon_data import PolygonData, ShapeSegment
+from laser_offset.modifiers.segment_index import SEGMENT_INDEXES, SegmentIndex
+from laser_offset.modifiers.segment_operations import expdand_segments, fix_segments, fix_loops
+
+
+def polygon(points: List[Tuple[float, float]]) -> Path2d:
+    components: List[PathComponent] = [MoveOrigin(Point2d.cartesian(*points[0]))]
+    components += list(map(lambda point: Line(Point2d.cartesian(*point)), points[1:]))
+    components.append(ClosePath())
+    return Path2d(Style(), components)
+
+
+def comb(segments: int) -> Path2d:
+    # Horizontal teeth, 4 segments each, gaps are narrower than the offset
+    points: List[Tuple[float, float]] = [(0, 0)]
+    for tooth in range(segments // 4):
+        y = tooth * 1.0
+        points += [(100, y), (100, y + 0.6), (0, y + 0.6), (0, y + 1.0)]
+    return polygon(points)
+
+
+def star(segments: int) -> Path2d:
+    # Inner points are 1.2 apart, so neighbour rays do not overlap after offset and the ring has no loops
+    rays = segments // 2
+    inner_radius = rays * 1.2 / (2 * math.pi)
+    points: List[Tuple[float, float]] = list()
+    for ray in range(rays):
+        angle = 2 * math.pi * ray / rays
+        points.append(((inner_radius + 100) * math.cos(angle), (inner_radius + 100) * math.sin(angle)))
+        angle += math.pi / rays
+        points.append((inner_radius * math.cos(angle), inner_radius * math.sin(angle)))
+    return polygon(points)
+
+
+def offset_ring(shape: Path2d, expand_value: float) -> List[ShapeSegment]:
+    polygon_data = PolygonData.fromShape(shape)
+    segments = expdand_segments(polygon_data, expand_value, False)
+    return fix_segments(polygon_data, segments, expand_value, False)
+
+
+def fix_loops_time(segments: List[ShapeSegment], segment_index: Type[SegmentIndex], repeat: int) -> Tuple[float, int]:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, result = fix_loops(segments, segment_index)
+        best = min(best, time.perf_counter() - start)
+    return (best, result.__len__())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares fix_loops time of segment indexes")
+    parser.add_argument('--segments', type=int, default=6000, help="Segments of every generated contour")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs of every index, the best one is shown")
+    parser.add_argument('--brute', action='store_true', help="Measure brute force index too, it is quadratic")
+    args = parser.parse_args()
+
+    contours: Dict[str, Callable[[int], Path2d]] = {'comb': comb, 'star': star}
+    index_names = list(filter(lambda name: args.brute or name != 'brute', SEGMENT_INDEXES.keys()))
+
+    print("{contour:<8} {segments:>9} {index:>7} {time:>10} {result:>9}".format(contour="contour", segments="segments", index="index", time="ms", result="result"))
+    for name, make_contour in contours.items():
+        segments = offset_ring(make_contour(args.segments), 0.3)
+        for index_name in index_names:
+            best, result = fix_loops_time(segments, SEGMENT_INDEXES[index_name], args.repeat)
+            print("{contour:<8} {segments:>9} {index:>7} {time:>10.1f} {result:>9}".format(
+                contour=name,
+                segments=segments.__len__(),
+                index=index_name,
+                time=best * 1000,
+                result=result))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 from laser_offset.cli.laser_offset_cli import laser_offset
+from laser_offset.cli.laser_offset_daemon_cli import laser_offset_daemon
 
 def run_laser_offset():
     laser_offset()
@@ -1,25 +1,72 @@
 import click
+import os
+import sys
 from typing import List
-from laser_offset.file_converters.folder_converter import FolderConverter
+from laser_offset.file_converters.folder_converter import FileResult, FolderConverter
+from laser_offset.modifiers.offset_cache import OffsetCache
+from laser_offset.modifiers.segment_index import SEGMENT_INDEXES
 
 @click.command()
 @click.argument('source_path', type=click.Path(exists=True, file_okay=False, dir_okay=True, readable=True, resolve_path=True, allow_dash=True))
 @click.argument('target_path', type=click.Path(exists=False, file_okay=False, dir_okay=True, writable=True, resolve_path=True, allow_dash=True))
-@click.argument('laser_width', type=click.IntRange(min=1, max=999))
+@click.argument('laser_width', nargs=-1, required=True, type=click.IntRange(min=1, max=999))
 @click.option('--svg', '-s', default=False, is_flag=True, show_default="False", help="Output as SVG")
 @click.option('--dxf/--no-dxf', '-d/-D', default=True, show_default="True", help="Output as DXF")
-def laser_offset(source_path, target_path, laser_width, svg, dxf):
+@click.option('--cache-dir', default=None, type=click.Path(file_okay=False, dir_okay=True, writable=True, resolve_path=True), help="Folder to keep offset results between runs")
+@click.option('--cache-size', default=256, show_default=True, type=click.IntRange(min=1), help="Cache folder size limit in MB")
+@click.option('--cache-stats', default=False, is_flag=True, help="Print offset cache hit rate")
+@click.option('--stream', default=False, is_flag=True, help="Read DXFs entity by entity to save memory on large files")
+@click.option('--fast-dxf', default=False, is_flag=True, help="Read supported DXF entities without building ezdxf document")
+@click.option('--packed-paths', default=False, is_flag=True, help="Keep DXF polylines and splines in flat arrays to save memory on large drawings")
+@click.option('--compact-svg', default=False, is_flag=True, help="Write short SVG path data with numbers rounded by --svg-tolerance and styles as classes")
+@click.option('--svg-tolerance', default=0.001, show_default=True, type=click.FloatRange(min=0, min_open=True), help="Largest rounding error of compact SVG coordinates in drawing units")
+@click.option('--direct-dxf', default=False, is_flag=True, help="Write DXF entities straight to file without building ezdxf document, drawings with blocks are written by ezdxf")
+@click.option('--segment-index', default='grid', show_default=True, type=click.Choice(list(SEGMENT_INDEXES.keys())), help="How pairs of offset segments are selected for self-intersection tests, brute checks every pair")
+@click.option('--jobs', '-j', default=1, show_default=True, type=click.IntRange(min=1), help="Convert this many files at once in separate processes")
+@click.option('--incremental', default=False, is_flag=True, help="Skip files which were converted into TARGET_PATH with the same content and options, continues a stopped run")
+@click.option('--watch', default=False, is_flag=True, help="Keep running and convert DXFs which are added to SOURCE_PATH or changed, until Ctrl+C")
+@click.option('--watch-polling', default=False, is_flag=True, help="Find changes in --watch mode by scanning SOURCE_PATH instead of inotify, for network folders")
+@click.option('--report', 'report_path', default=None, type=click.Path(file_okay=False, dir_okay=True, writable=True, resolve_path=True), help="Folder for JSON report of stage times and counters of every file and summary.json of the batch")
+@click.option('--profile', default=False, is_flag=True, help="Profile conversion of every file with cProfile, writes FILE.pstats, FILE.collapsed for flame graphs and FILE.txt with the slowest functions")
+@click.option('--profile-out', default=None, type=click.Path(file_okay=False, dir_okay=True, writable=True, resolve_path=True), help="Folder for profiles, TARGET_PATH/profile by default, turns on --profile")
+@click.option('--profile-sampling', default=False, is_flag=True, help="Profile by sampling stacks instead of cProfile, slows long runs less, no .pstats is written")
+@click.option('--profile-interval', default=10, show_default=True, type=click.FloatRange(min=1), help="Time between stack samples in ms")
+def laser_offset(source_path, target_path, laser_width, svg, dxf, cache_dir, cache_size, cache_stats, stream, fast_dxf, packed_paths, compact_svg, svg_tolerance, direct_dxf, segment_index, jobs, incremental, watch, watch_polling, report_path, profile, profile_out, profile_sampling, profile_interval):
     """Creates new drawings from DXFs with outer and inner offset lines by LASER_WIDTH in μm(microns) ans save them into TARGET_PATH as SVG or DXF.
 
     SOURCE_PATH is folder with DXFs for batch convertion
     
     TARGET_PATH is folder for results
 
-    LASER_WIDTH is beam diameter in μm(microns) from 1 to 999
+    LASER_WIDTH is beam diameter in μm(microns) from 1 to 999, several widths give several offset rings
     """
     
     print(source_path, target_path, laser_width, svg, dxf)
-    converter = FolderConverter(source_path, target_path, laser_width / 2000.0, None, svg, dxf)
+    if profile_sampling or profile_out is not None:
+        profile = True
+    profile_folder = (profile_out or os.path.join(target_path, "profile")) if profile else None
+
+    offset_cache = OffsetCache(cache_dir=cache_dir, max_disk_size=cache_size * 1024 * 1024)
+    converter = FolderConverter(
+        source_path,
+        target_path,
+        list(map(lambda width: width / 2000.0, laser_width)),
+        create_svg=svg,
+        create_dxf=dxf,
+        offset_cache=offset_cache,
+        streaming=stream,
+        fast_dxf=fast_dxf,
+        packed_paths=packed_paths,
+        compact_svg=compact_svg,
+        svg_tolerance=svg_tolerance,
+        direct_dxf=direct_dxf,
+        segment_index=segment_index,
+        jobs=jobs,
+        incremental=incremental,
+        report_folder=report_path,
+        profile_folder=profile_folder,
+        profile_sampling=profile_sampling,
+        profile_interval=profile_interval / 1000)
 
     files_to_convert = converter.files_to_convert
     click.echo('\nFiles to convert: ')
@@ -34,4 +81,35 @@ def laser_offset(source_path, target_path, laser_width, svg, dxf):
             for target in target_files:
                 click.echo(f"\t{target}")
 
-    converter.convert(convertion_callback)
+    def report_results(results: List[FileResult]) -> int:
+        skipped = list(filter(lambda result: result.skipped, results))
+        if skipped.__len__() > 0:
+            click.echo(f"\nNot changed, skipped: {skipped.__len__()} of {results.__len__()}")
+
+        failed = list(filter(lambda result: result.error is not None, results))
+        if failed.__len__() > 0:
+            click.echo(f"\nFailed files: {failed.__len__()} of {results.__len__()}")
+            for result in failed:
+                click.echo(f"\t{click.format_filename(result.file_name)}: {result.error}")
+        return failed.__len__()
+
+    if watch:
+        try:
+            for index, results in enumerate(converter.watch(convertion_callback, use_inotify=not watch_polling)):
+                report_results(results)
+                if index == 0:
+                    click.echo(f"\nWatching {click.format_filename(source_path)}, Ctrl+C to stop\n")
+        except KeyboardInterrupt:
+            pass
+        failed_count = 0
+    else:
+        failed_count = report_results(converter.convert(convertion_callback))
+
+    if profile_folder is not None:
+        click.echo(f"\nProfiles: {click.format_filename(profile_folder)}")
+
+    if cache_stats:
+        click.echo(f"\nOffset cache: {offset_cache.hits} hits, {offset_cache.misses} misses, hit rate {offset_cache.hit_rate * 100:.1f}%")
+
+    if failed_count > 0:
+        sys.exit(1)
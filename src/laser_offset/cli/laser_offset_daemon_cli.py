@@ -0,0 +1,60 @@
+import click
+import os
+from laser_offset.file_converters.conversion_server import ConversionServer, DEFAULT_CANVAS_CACHE_SIZE, make_server
+from laser_offset.modifiers.offset_cache import OffsetCache
+from laser_offset.modifiers.segment_index import SEGMENT_INDEXES
+
+@click.command()
+@click.option('--socket', 'socket_path', default=None, type=click.Path(dir_okay=False, resolve_path=True), help="Listen on this Unix socket instead of TCP")
+@click.option('--host', default='127.0.0.1', show_default=True, help="Address to listen on, only local clients should reach it")
+@click.option('--port', default=8765, show_default=True, type=click.IntRange(min=0, max=65535), help="TCP port to listen on")
+@click.option('--workers', default=os.cpu_count() or 1, show_default="CPU count", type=click.IntRange(min=1), help="Worker processes which convert requests")
+@click.option('--canvas-cache', default=DEFAULT_CANVAS_CACHE_SIZE, show_default=True, type=click.IntRange(min=0), help="Imported drawings kept by every worker for requests with other widths")
+@click.option('--cache-dir', default=None, type=click.Path(file_okay=False, dir_okay=True, writable=True, resolve_path=True), help="Folder to keep offset results between runs")
+@click.option('--cache-size', default=256, show_default=True, type=click.IntRange(min=1), help="Cache folder size limit in MB")
+@click.option('--fast-dxf', default=False, is_flag=True, help="Read supported DXF entities without building ezdxf document")
+@click.option('--packed-paths', default=False, is_flag=True, help="Keep DXF polylines and splines in flat arrays to save memory on large drawings")
+@click.option('--compact-svg', default=False, is_flag=True, help="Write short SVG path data with numbers rounded by --svg-tolerance and styles as classes")
+@click.option('--svg-tolerance', default=0.001, show_default=True, type=click.FloatRange(min=0, min_open=True), help="Largest rounding error of compact SVG coordinates in drawing units")
+@click.option('--direct-dxf', default=False, is_flag=True, help="Write DXF entities straight to file without building ezdxf document, drawings with blocks are written by ezdxf")
+@click.option('--segment-index', default='grid', show_default=True, type=click.Choice(list(SEGMENT_INDEXES.keys())), help="How pairs of offset segments are selected for self-intersection tests, brute checks every pair")
+def laser_offset_daemon(socket_path, host, port, workers, canvas_cache, cache_dir, cache_size, fast_dxf, packed_paths, compact_svg, svg_tolerance, direct_dxf, segment_index):
+    """Keeps conversion processes running and converts DXFs sent over HTTP, on localhost or Unix socket.
+
+    POST /convert?width=150&format=svg with DXF as request body, or with path=/absolute/file.dxf and no body.
+    width is beam diameter in μm(microns) and can be repeated, format is svg or dxf and can be repeated.
+    One format is returned as the file itself, several as JSON object with text of every format.
+    """
+
+    offset_cache = OffsetCache(cache_dir=cache_dir, max_disk_size=cache_size * 1024 * 1024)
+    converter_options = dict(
+        offset_cache = offset_cache,
+        fast_dxf = fast_dxf,
+        packed_paths = packed_paths,
+        compact_svg = compact_svg,
+        svg_tolerance = svg_tolerance,
+        direct_dxf = direct_dxf,
+        segment_index = segment_index
+    )
+
+    click.echo(f"Starting {workers} workers...")
+    conversion_server = ConversionServer(workers, converter_options, canvas_cache)
+    server = make_server(conversion_server, host, port, socket_path)
+
+    if socket_path is not None:
+        click.echo(f"Listening on {click.format_filename(socket_path)}, Ctrl+C to stop")
+    else:
+        click.echo(f"Listening on http://{host}:{server.server_address[1]}, Ctrl+C to stop")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        conversion_server.close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+if __name__ == '__main__':
+    laser_offset_daemon()
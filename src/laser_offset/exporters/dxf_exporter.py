@@ -5,29 +5,50 @@ import math
 
 from abc import ABC
 from codecs import StreamWriter
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 from laser_offset.exporters.exporter import Exporter
+from laser_offset.exporters.dxf_writer import DXFWriter, LAYER_NAME
 
+from laser_offset.geometry_2d.block2d import Block2d
 from laser_offset.geometry_2d.canvas2d import Canvas2d
 from laser_offset.geometry_2d.point2d import Point2d
 from laser_offset.geometry_2d.shape2d import Shape2d
 from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
 from laser_offset.geometry_2d.shapes_2d.circle2d import Circle2d
 from laser_offset.geometry_2d.shapes_2d.ellipse2d import Ellipse2d
-from laser_offset.geometry_2d.shapes_2d.path2d import HorizontalLine, Line, MoveOrigin, Path2d, RelHorizontalLine, RelLine, RelMoveOrigin, RelVerticalLine, SimpleArc, VerticalLine, HorizontalLine, ClosePath, CubicBezier, RelCubicBezier, Quadratic, RelQuadratic, ReflectedQuadratic, RelReflectedQuadratic, Arc, RelArc, StrugBezier, RelStrugBezier
+from laser_offset.geometry_2d.shapes_2d.path2d import HorizontalLine, Line, MoveOrigin, Path2d, PathComponent, RelHorizontalLine, RelLine, RelMoveOrigin, RelVerticalLine, SimpleArc, VerticalLine, HorizontalLine, ClosePath, CubicBezier, RelCubicBezier, Quadratic, RelQuadratic, ReflectedQuadratic, RelReflectedQuadratic, Arc, RelArc, StrugBezier, RelStrugBezier
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d
 from laser_offset.geometry_2d.shapes_2d.polygon2d import Polygon2d
 from laser_offset.geometry_2d.shapes_2d.polyline2d import Polyline2d
 from laser_offset.geometry_2d.shapes_2d.rect2d import Rect2d
+from laser_offset.geometry_2d.shapes_2d.block_reference2d import BlockReference2d
 from laser_offset.math.float_functions import fge
 
 class DXFExporter(Exporter):
 
+    # Names of written block definitions, every block is written once
+    block_names: Dict[Block2d, str]
+
+    # Entities are written straight to the stream without ezdxf document
+    direct: bool
+
+    def __init__(self, direct: bool = False) -> None:
+        super().__init__()
+        self.block_names = dict()
+        self.direct = direct
+
     def export_canvas(self, canvas: Canvas2d, match_size: bool, stream: StreamWriter):
 
+        # Blocks are written by ezdxf
+        if self.direct and not any(map(lambda shape: isinstance(shape, BlockReference2d), canvas.shapes)):
+            DXFWriter(self).write_shapes(canvas.shapes, stream)
+            return
+
         doc: Drawing = ezdxf.new(dxfversion="R2010")
         model_space: Modelspace = doc.modelspace()
+        self.block_names = dict()
 
-        layer_name = "LASERCUT"
+        layer_name = LAYER_NAME
 
         doc.layers.add(layer_name, color=7)
         dxf_layer_attribs = {"layer": layer_name}
@@ -50,15 +71,67 @@ class DXFExporter(Exporter):
             self.write_polygon(shape, model_space, dxf_layer_attribs)
         elif isinstance(shape, Path2d):
             self.write_path(shape, model_space, dxf_layer_attribs)
+        elif isinstance(shape, PackedPath2d):
+            self.write_packed_path(shape, model_space, dxf_layer_attribs)
+        elif isinstance(shape, BlockReference2d):
+            self.write_block_reference(shape, model_space, dxf_layer_attribs)
+
+    def write_block_reference(self, reference: BlockReference2d, model_space: Modelspace, dxf_layer_attribs: Dict[str, str]):
+        transform = reference.transform
+        # INSERT can not stretch block along rotated axes
+        if not transform.isSimilarity:
+            for shape in reference.transformedShapes:
+                self.write_shape(shape, model_space, dxf_layer_attribs)
+            return
+
+        block_name = self.write_block(reference.block, model_space.doc, dxf_layer_attribs)
+
+        # Shapes are written with flipped Y, so is the transform
+        scale = transform.scaleFactor
+        model_space.add_blockref(block_name, (transform.e, -transform.f), dxfattribs=dict(dxf_layer_attribs,
+            xscale=scale,
+            yscale=scale if transform.determinant > 0 else -scale,
+            rotation=math.degrees(math.atan2(-transform.b, transform.a))
+        ))
+
+    def write_block(self, block: Block2d, doc: Drawing, dxf_layer_attribs: Dict[str, str]) -> str:
+        block_name: Optional[str] = self.block_names.get(block)
+        if block_name is not None:
+            return block_name
+
+        # Offset blocks keep source block name, so names can repeat, anonymous names are not kept
+        base_name = block.name.lstrip('*') or 'BLOCK'
+        block_name = base_name
+        index = 1
+        while block_name in doc.blocks:
+            block_name = "{name}_{index}".format(name=base_name, index=index)
+            index += 1
+        self.block_names[block] = block_name
+
+        block_layout = doc.blocks.new(name=block_name)
+        for shape in block.shapes:
+            self.write_shape(shape, block_layout, dxf_layer_attribs)
+        return block_name
 
     def write_line(self, line: Line2d, model_space: Modelspace, dxf_layer_attribs: Dict[str, str]):
-        model_space.add_line((line.start.x, -line.start.y), (line.end.x, line.end.y), dxfattribs=dxf_layer_attribs)
+        model_space.add_line((line.start.x, -line.start.y), (line.end.x, -line.end.y), dxfattribs=dxf_layer_attribs)
     
     def write_circle(self, circle: Circle2d, model_space: Modelspace, dxf_layer_attribs: Dict[str, str]):
         model_space.add_circle((circle.center.x, -circle.center.y), circle.radius, dxfattribs=dxf_layer_attribs)
 
     def write_ellipse(self, ellipse: Ellipse2d, model_space: Modelspace, dxf_layer_attribs: Dict[str, str]):
-        model_space.add_ellipse((ellipse.center.x, -ellipse.center.y), major_axis=(0, ellipse.radiuses.height, 0), ratio=ellipse.radiuses.width/ellipse.radiuses.height, dxfattribs=dxf_layer_attribs)
+        major_axis, ratio = self.ellipse_axis(ellipse)
+        model_space.add_ellipse((ellipse.center.x, -ellipse.center.y), major_axis=major_axis, ratio=ratio, dxfattribs=dxf_layer_attribs)
+
+    def ellipse_axis(self, ellipse: Ellipse2d) -> Tuple[Tuple[float, float, float], float]:
+        # Major axis is the longer one, angle is measured from X axis to width radius
+        rx = ellipse.radiuses.width
+        ry = ellipse.radiuses.height
+        cos_a = math.cos(ellipse.angle)
+        sin_a = math.sin(ellipse.angle)
+        if rx >= ry:
+            return ((rx * cos_a, -rx * sin_a, 0), ry / rx)
+        return ((-ry * sin_a, -ry * cos_a, 0), rx / ry)
 
     def write_polyline(self, polyline: Polyline2d, model_space: Modelspace, dxf_layer_attribs: Dict[str, str]):
         points = list(map(lambda point: (point.x, -point.y), polyline.points))
@@ -69,46 +142,34 @@ class DXFExporter(Exporter):
         model_space.add_polyline2d(points, close=True, dxfattribs=dxf_layer_attribs)
 
     def write_path(self, path: Path2d, model_space: Modelspace, dxf_layer_attribs: Dict[str, str]):
-        
+        self.write_components(path.components, model_space, dxf_layer_attribs)
+
+    def write_packed_path(self, path: PackedPath2d, model_space: Modelspace, dxf_layer_attribs: Dict[str, str]):
+        # Components are created one by one and are not kept
+        self.write_components(map(path.component, range(path.__len__())), model_space, dxf_layer_attribs)
+
+    def write_components(self, components: Iterable[PathComponent], model_space: Modelspace, dxf_layer_attribs: Dict[str, str]):
+        model_space.add_lwpolyline(self.lw_polyline_points(components), dxfattribs=dxf_layer_attribs)
+
+    def lw_polyline_points(self, components: Iterable[PathComponent]) -> List[Tuple[float, float, float, float, float]]:
+        # Points are made with flipped Y in one pass, bulge of arc goes to the point where the arc starts
         polyline_points: List[Tuple[float, float, float, float, float]] = list()
-        for index, component in enumerate(path.components):
-
-            if isinstance(component, MoveOrigin):
-                polyline_points.append(self.lw_polyline_point_from_move(component))
-            elif isinstance(component, Line):
-                polyline_points.append(self.lw_polyline_point_from_line(component))
-            elif isinstance(component, SimpleArc):
-                polyline_points.append(self.lw_polyline_point_from_arc(component))
-            elif isinstance(component, Arc):
-                polyline_points.append(self.lw_polyline_point_from_arc(component))
-
-            
+        for index, component in enumerate(components):
+
+            if isinstance(component, (MoveOrigin, Line, SimpleArc, Arc)):
+                polyline_points.append((component.target.x, -component.target.y, 0, 0, 0))
+
             if index == 0:
                 continue
 
             if isinstance(component, SimpleArc):
                 prev_point = polyline_points[index-1]
-                bulge = self.lw_poly_bulge_from_arc(component, prev_point)
-                polyline_points[index-1] = (prev_point[0], prev_point[1], prev_point[2], prev_point[2], bulge)
+                bulge = self.lw_poly_bulge_from_arc(component, (prev_point[0], -prev_point[1]))
+                polyline_points[index-1] = (prev_point[0], prev_point[1], prev_point[2], prev_point[2], -bulge)
 
-        model_space.add_lwpolyline(self.flip_y(polyline_points), dxfattribs=dxf_layer_attribs)
-
-    def flip_y(self, input_points: List[Tuple[float, float, float, float, float]]) -> List[Tuple[float, float, float, float, float]]:
-        polyline_points: List[Tuple[float, float, float, float, float]] = list()
-        for point in input_points:
-            polyline_points.append((point[0], -point[1], point[2], point[3], -point[4]))
         return polyline_points
 
-    def lw_polyline_point_from_move(self, move: MoveOrigin) -> Tuple[float, float, float, float, float]:
-        return (move.target.x, move.target.y, 0, 0, 0)
-
-    def lw_polyline_point_from_line(self, line: Line) -> Tuple[float, float, float, float, float]:
-        return (line.target.x, line.target.y, 0, 0, 0)
-
-    def lw_polyline_point_from_arc(self, arc: SimpleArc) -> Tuple[float, float, float, float, float]:
-        return (arc.target.x, arc.target.y, 0, 0, 0.0)
-
-    def lw_poly_bulge_from_arc(self, arc: SimpleArc, prev_point: Tuple[float, float, float, float, float]) -> float:
+    def lw_poly_bulge_from_arc(self, arc: SimpleArc, prev_point: Tuple[float, float]) -> float:
         dx: float = prev_point[0] - arc.target.x
         dy: float = prev_point[1] - arc.target.y
         l: float = math.sqrt( dx ** 2 + dy ** 2)
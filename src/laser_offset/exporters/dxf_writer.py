@@ -0,0 +1,147 @@
+from codecs import StreamWriter
+from io import StringIO
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+import ezdxf
+
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
+from laser_offset.geometry_2d.shapes_2d.circle2d import Circle2d
+from laser_offset.geometry_2d.shapes_2d.ellipse2d import Ellipse2d
+from laser_offset.geometry_2d.shapes_2d.path2d import Path2d
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d
+from laser_offset.geometry_2d.shapes_2d.polygon2d import Polygon2d
+from laser_offset.geometry_2d.shapes_2d.polyline2d import Polyline2d
+
+if TYPE_CHECKING:
+    from laser_offset.exporters.dxf_exporter import DXFExporter
+
+LAYER_NAME = "LASERCUT"
+
+# Shapes which are written as one entity each
+DIRECT_TYPES = (Line2d, Circle2d, Ellipse2d, Polyline2d, Polygon2d, Path2d, PackedPath2d)
+
+FULL_ELLIPSE = 6.283185307179586
+
+
+class DXFTemplate:
+    """Empty R2010 document made by ezdxf, split where handle seed and entities are written
+
+    Header, tables, blocks and objects are the same for every file, so the document is made once.
+    """
+
+    head: str
+    middle: str
+    tail: str
+    first_handle: int
+    owner: str
+
+    def __init__(self) -> None:
+        doc = ezdxf.new(dxfversion="R2010")
+        doc.layers.add(LAYER_NAME, color=7)
+        self.owner = doc.modelspace().layout_key
+
+        output = StringIO()
+        doc.write(output)
+        text = output.getvalue()
+
+        seed_start = text.index("$HANDSEED\n  5\n") + "$HANDSEED\n  5\n".__len__()
+        seed_end = text.index("\n", seed_start)
+        entities_start = text.index("  2\nENTITIES\n") + "  2\nENTITIES\n".__len__()
+        entities_end = text.index("  0\nENDSEC\n", entities_start)
+
+        self.head = text[:seed_start]
+        self.first_handle = int(text[seed_start:seed_end], 16)
+        self.middle = text[seed_end:entities_start]
+        self.tail = text[entities_end:]
+
+
+template: Optional[DXFTemplate] = None
+
+
+def dxf_template() -> DXFTemplate:
+    global template
+    if template is None:
+        template = DXFTemplate()
+    return template
+
+
+class DXFWriter:
+    """Writes LINE, CIRCLE, ELLIPSE and LWPOLYLINE group codes straight to the stream
+
+    Geometry is converted by the same exporter methods as for ezdxf document, so both give the same shapes.
+    Polylines and polygons are written as LWPOLYLINE, other shapes are not written.
+    """
+
+    exporter: 'DXFExporter'
+
+    template: DXFTemplate
+    handle: int
+
+    def __init__(self, exporter: 'DXFExporter') -> None:
+        self.exporter = exporter
+        self.template = dxf_template()
+        self.handle = self.template.first_handle
+
+    def write_shapes(self, shapes: List[Shape2d], stream: StreamWriter):
+        # Handle seed is in the header, so entities are counted first
+        entities_count = sum(map(lambda shape: isinstance(shape, DIRECT_TYPES), shapes))
+
+        stream.write(self.template.head)
+        stream.write("{handle:X}".format(handle=self.template.first_handle + entities_count))
+        stream.write(self.template.middle)
+        for shape in shapes:
+            entity = self.entity(shape)
+            if entity is not None:
+                stream.write(entity)
+        stream.write(self.template.tail)
+
+    def entity(self, shape: Shape2d) -> Optional[str]:
+        if isinstance(shape, Line2d):
+            return self.line(shape)
+        elif isinstance(shape, Circle2d):
+            return self.circle(shape)
+        elif isinstance(shape, Ellipse2d):
+            return self.ellipse(shape)
+        elif isinstance(shape, Polyline2d):
+            return self.lw_polyline(list(map(lambda point: (point.x, -point.y, 0, 0, 0), shape.points)), False)
+        elif isinstance(shape, Polygon2d):
+            return self.lw_polyline(list(map(lambda point: (point.x, -point.y, 0, 0, 0), shape.points)), True)
+        elif isinstance(shape, Path2d):
+            return self.lw_polyline(self.exporter.lw_polyline_points(shape.components), False)
+        elif isinstance(shape, PackedPath2d):
+            return self.lw_polyline(self.exporter.lw_polyline_points(map(shape.component, range(shape.__len__()))), False)
+        return None
+
+    def entity_head(self, entity_type: str, subclass: str) -> str:
+        handle = self.handle
+        self.handle += 1
+        return "  0\n{type}\n  5\n{handle:X}\n330\n{owner}\n100\nAcDbEntity\n  8\n{layer}\n100\n{subclass}\n".format(
+            type=entity_type, handle=handle, owner=self.template.owner, layer=LAYER_NAME, subclass=subclass)
+
+    def line(self, line: Line2d) -> str:
+        return self.entity_head("LINE", "AcDbLine") + " 10\n{x1}\n 20\n{y1}\n 30\n0.0\n 11\n{x2}\n 21\n{y2}\n 31\n0.0\n".format(
+            x1=float(line.start.x), y1=float(-line.start.y), x2=float(line.end.x), y2=float(-line.end.y))
+
+    def circle(self, circle: Circle2d) -> str:
+        return self.entity_head("CIRCLE", "AcDbCircle") + " 10\n{x}\n 20\n{y}\n 30\n0.0\n 40\n{r}\n".format(
+            x=float(circle.center.x), y=float(-circle.center.y), r=float(circle.radius))
+
+    def ellipse(self, ellipse: Ellipse2d) -> str:
+        major_axis, ratio = self.exporter.ellipse_axis(ellipse)
+        return self.entity_head("ELLIPSE", "AcDbEllipse") + (
+            " 10\n{x}\n 20\n{y}\n 30\n0.0\n 11\n{ax}\n 21\n{ay}\n 31\n0.0\n 40\n{ratio}\n 41\n0.0\n 42\n{end}\n").format(
+            x=float(ellipse.center.x), y=float(-ellipse.center.y),
+            ax=float(major_axis[0]), ay=float(major_axis[1]),
+            ratio=float(ratio), end=FULL_ELLIPSE)
+
+    def lw_polyline(self, points: List[Tuple[float, float, float, float, float]], closed: bool) -> str:
+        parts = [self.entity_head("LWPOLYLINE", "AcDbPolyline"), " 90\n{count}\n 70\n{flags}\n".format(count=points.__len__(), flags=1 if closed else 0)]
+        # Vertices are the most of the output, f-strings are formatted faster
+        for x, y, start_width, end_width, bulge in points:
+            parts.append(f" 10\n{float(x)}\n 20\n{float(y)}\n")
+            if start_width != 0 or end_width != 0:
+                parts.append(f" 40\n{float(start_width)}\n 41\n{float(end_width)}\n")
+            if bulge != 0:
+                parts.append(f" 42\n{float(bulge)}\n")
+        return "".join(parts)
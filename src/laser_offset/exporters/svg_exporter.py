@@ -2,20 +2,37 @@ from abc import ABC
 from codecs import StreamWriter
 import re
 from turtle import st, width
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple
 from laser_offset.exporters.exporter import Exporter
+from laser_offset.exporters.svg_path_encoder import SVGPathEncoder, decimals_for_tolerance
 import math
 
-from laser_offset.geometry_2d.canvas2d import Canvas2d
+from laser_offset.geometry_2d.block2d import Block2d
+from laser_offset.geometry_2d.canvas2d import Canvas2d, boundsWithMargin
 from laser_offset.geometry_2d.point2d import Point2d
 from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.size2d import Size2d
 from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
 from laser_offset.geometry_2d.shapes_2d.circle2d import Circle2d
 from laser_offset.geometry_2d.shapes_2d.ellipse2d import Ellipse2d
 from laser_offset.geometry_2d.shapes_2d.path2d import HorizontalLine, Line, MoveOrigin, Path2d, RelHorizontalLine, RelLine, RelMoveOrigin, RelSimpleArc, RelVerticalLine, SimpleArc, VerticalLine, HorizontalLine, ClosePath, CubicBezier, RelCubicBezier, Quadratic, RelQuadratic, ReflectedQuadratic, RelReflectedQuadratic, Arc, RelArc, StrugBezier, RelStrugBezier
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d
 from laser_offset.geometry_2d.shapes_2d.polygon2d import Polygon2d
 from laser_offset.geometry_2d.shapes_2d.polyline2d import Polyline2d
 from laser_offset.geometry_2d.shapes_2d.rect2d import Rect2d
+from laser_offset.geometry_2d.shapes_2d.block_reference2d import BlockReference2d
+
+SVG_HEADER = '''" xmlns:svgjs="http://svgjs.com/svgjs" xmlns:xlink="http://www.w3.org/1999/xlink" version="1.1" xmlns="http://www.w3.org/2000/svg">
+  <g transform="scale(1, -1)">    
+    '''
+
+SVG_FOOTER = """
+  </g>
+</svg>
+        """
+
+# Space for viewBox which is written when shapes bounds are known
+VIEWBOX_RESERVED_LENGTH = 80
 
 
 class SVGTag:
@@ -51,49 +68,180 @@ class SVGExporter(Exporter):
     scale: float
     skip_xml: bool
 
-    def __init__(self, units: str = "mm", scale: float = 3.7795*0.75, skip_xml: bool = False):
+    # Short path data and numbers rounded by tolerance, styles are written once as classes
+    path_encoder: Optional[SVGPathEncoder]
+    style_classes: Dict[Tuple[str, str, str], str]
+    style_rules: List[str]
+
+    # Ids of blocks written to defs, every block is written once for all its <use> references
+    block_ids: Dict[Block2d, str]
+    block_definitions: List[str]
+
+    def __init__(self, units: str = "mm", scale: float = 3.7795*0.75, skip_xml: bool = False, compact: bool = False, tolerance: float = 0.001):
         super().__init__()
         self.units = units
         self.scale = scale
         self.skip_xml = skip_xml
+        # Tolerance is in drawing units, numbers are rounded after scale
+        self.path_encoder = SVGPathEncoder(scale, decimals_for_tolerance(tolerance, scale)) if compact else None
+        self.style_classes = dict()
+        self.style_rules = list()
+        self.block_ids = dict()
+        self.block_definitions = list()
 
     def export_canvas(self, canvas: Canvas2d, match_size: bool, stream: StreamWriter):
 
         target_canvase = canvas.updateCenterAndSizeFromBounds() if match_size else canvas
+        self.export_shapes(target_canvase.shapes, stream, target_canvase.center, target_canvase.size)
+
+    def export_shapes(self, shapes: Iterable[Shape2d], stream: StreamWriter, center: Optional[Point2d] = None, size: Optional[Size2d] = None):
+        """Writes every shape to the stream when it is taken, so shapes can come from generator
+
+        Without center and size viewBox is taken from shapes bounds, it is written over reserved
+        space of the header when all shapes are written, so the stream should be seekable.
+        Blocks are written to defs and style classes to style element before their first use.
+        """
+
+        self.block_ids = dict()
+        self.block_definitions = list()
+        self.style_classes = dict()
+        self.style_rules = list()
+
+        stream.write('<?xml version="1.0" encoding="UTF-8"?>' if not self.skip_xml else '')
+        stream.write('\n<svg viewBox="')
+        if center is not None and size is not None:
+            stream.write(self.viewbox(center, size))
+        else:
+            if not stream.seekable():
+                raise RuntimeError("Stream should be seekable when canvas size is not known")
+            viewbox_position = stream.tell()
+            stream.write(" " * VIEWBOX_RESERVED_LENGTH)
+        stream.write(SVG_HEADER)
+
+        minX = 10000
+        minY = 10000
+        maxX = -10000
+        maxY = -10000
+
+        separator = "\t"
+        for shape in shapes:
+            shape_text = self.export_shape(shape)
+            if shape_text is None:
+                continue
+
+            if self.style_rules.__len__() > 0:
+                stream.write(separator)
+                stream.write("<style>")
+                stream.write("".join(self.style_rules))
+                stream.write("</style>")
+                separator = "\n\t"
+                self.style_rules = list()
+
+            if self.block_definitions.__len__() > 0:
+                stream.write(separator)
+                stream.write("<defs>\n")
+                stream.write("\n".join(self.block_definitions))
+                stream.write("\n\t</defs>")
+                separator = "\n\t"
+                self.block_definitions = list()
+
+            stream.write(separator)
+            stream.write(shape_text)
+            separator = "\n\t"
+
+            if center is None or size is None:
+                bounds = shape.maxBoundary
+                minX = min(minX, bounds.minX)
+                minY = min(minY, bounds.minY)
+                maxX = max(maxX, bounds.maxX)
+                maxY = max(maxY, bounds.maxY)
+
+        stream.write(SVG_FOOTER)
+
+        if center is None or size is None:
+            bounds = boundsWithMargin(minX, minY, maxX, maxY)
+            viewbox = self.viewbox(
+                Point2d.cartesian((bounds.maxX + bounds.minX)/2, (bounds.maxY + bounds.minY)/2),
+                Size2d(bounds.maxX - bounds.minX, bounds.maxY - bounds.minY))
+            end_position = stream.tell()
+            stream.seek(viewbox_position)
+            stream.write(viewbox.ljust(VIEWBOX_RESERVED_LENGTH))
+            stream.seek(end_position)
+
+    def viewbox(self, center: Point2d, size: Size2d) -> str:
+        return " ".join(map(lambda n: self.convert_number(n), [
+            center.x - size.width/2,
+            - center.y - size.height/2,
+            size.width,
+            size.height
+        ]))
+
+    def export_shape(self, shape: Shape2d) -> Optional[str]:
+        if isinstance(shape, BlockReference2d):
+            return self.block_reference_to_use(shape)
 
-        viewboxWidth = 100
-        
-        svg_content = """{xml_header}
-<svg viewBox="{viewbox_size}" xmlns:svgjs="http://svgjs.com/svgjs" xmlns:xlink="http://www.w3.org/1999/xlink" version="1.1" xmlns="http://www.w3.org/2000/svg">
-  <g transform="scale(1, -1)">    
-    {lines}
-  </g>
-</svg>
-        """.format(
-            xml_header='<?xml version="1.0" encoding="UTF-8"?>' if not self.skip_xml else '',
-            viewbox_size=" ".join(map(lambda n: self.convert_number(n), [
-                target_canvase.center.x - target_canvase.size.width/2,
-                - target_canvase.center.y - target_canvase.size.height/2,
-                target_canvase.size.width,
-                target_canvase.size.height
-            ])),
-            width=self.convert_number(target_canvase.size.width, use_units=True),
-            height=self.convert_number(target_canvase.size.height, use_units=True),
-            lines="\n".join(
-                map(
-                    lambda shape: "\t"+self.export_shape(shape),
-                    target_canvase.shapes
-                    )))
-
-        stream.write(svg_content)
-
-    def export_shape(self, shape: Shape2d) -> str:
-        stroke_attributes = self.stroke_attributes(shape)
         shape_tag = self.shape_to_tag(shape)
-        result_tag = shape_tag.merge_attributes(stroke_attributes)
-        result = self.export_tag(result_tag)
-        return result
-        
+        if shape_tag is None:
+            return None
+        # Tag is made for this shape only, so stroke attributes are added without copy
+        if self.path_encoder is not None:
+            shape_tag.attributes["class"] = self.style_class(shape)
+        else:
+            shape_tag.attributes.update(self.stroke_attributes(shape))
+        return self.export_tag(shape_tag)
+
+    def style_class(self, shape: Shape2d) -> str:
+        attributes = self.stroke_attributes(shape)
+        key = (attributes["stroke"], attributes["stroke-width"], attributes["fill"])
+        class_name = self.style_classes.get(key)
+        if class_name is None:
+            class_name = "s{index}".format(index=self.style_classes.__len__())
+            self.style_classes[key] = class_name
+            self.style_rules.append(".{name}{{{rules}}}".format(
+                name=class_name,
+                rules=";".join(map(lambda key_val: "{0}:{1}".format(*key_val), attributes.items()))
+            ))
+        return class_name
+
+    def block_reference_to_use(self, reference: BlockReference2d) -> str:
+        transform = reference.transform
+        # Block content is scaled as canvas shapes, so only offset is scaled
+        return self.export_tag(SVGTag(
+            "use",
+            {
+                "xlink:href": "#" + self.block_id(reference.block),
+                "transform": "matrix({a} {b} {c} {d} {e} {f})".format(
+                    a=self.convert_factor(transform.a),
+                    b=self.convert_factor(transform.b),
+                    c=self.convert_factor(transform.c),
+                    d=self.convert_factor(transform.d),
+                    e=self.convert_number(transform.e),
+                    f=self.convert_number(transform.f)
+                )
+            }
+        ))
+
+    def block_id(self, block: Block2d) -> str:
+        block_id = self.block_ids.get(block)
+        if block_id is not None:
+            return block_id
+
+        # Offset blocks keep source block name, so names can repeat
+        base_id = re.sub(r'[^A-Za-z0-9_.-]', '_', block.name.lstrip('*'))
+        if not base_id[:1].isalpha():
+            base_id = 'block_' + base_id
+        block_id = base_id
+        used_ids = set(self.block_ids.values())
+        index = 1
+        while block_id in used_ids:
+            block_id = "{name}_{index}".format(name=base_id, index=index)
+            index += 1
+        self.block_ids[block] = block_id
+
+        # Nested blocks are added to definitions before this one
+        content = "\n\t\t".join(filter(None, map(self.export_shape, block.shapes)))
+        self.block_definitions.append('\t<g id="{id}">\n\t\t{content}\n\t</g>'.format(id=block_id, content=content))
+        return block_id
 
     def stroke_attributes(self, shape: Shape2d) -> Dict[str, str]:
         result: Dict[str, str] = dict()
@@ -104,7 +252,7 @@ class SVGExporter(Exporter):
 
     def shape_to_tag(self, shape: Shape2d) -> SVGTag:
         if isinstance(shape, Rect2d):
-            return self.rectange_to_tag(shape)
+            return self.rect_to_tag(shape)
         elif isinstance(shape, Line2d):
             return self.line_to_tag(shape)
         elif isinstance(shape, Circle2d):
@@ -117,18 +265,17 @@ class SVGExporter(Exporter):
             return self.polygon_to_tag(shape)
         elif isinstance(shape, Path2d):
             return self.path_to_tag(shape)
+        elif isinstance(shape, PackedPath2d):
+            return self.packed_path_to_tag(shape)
         else:
             print("Unknown shape type ", type(shape), " ",shape)
 
 
     def export_tag(self, tag: SVGTag) -> str:
-        attributes_list = list(map(lambda key_val: '{attribute}="{value}"'.format(
-            attribute=key_val[0], 
-            value=key_val[1]
-            ), tag.attributes.items() ))
+        attributes_list = ['{attribute}="{value}"'.format(attribute=attribute, value=value) for attribute, value in tag.attributes.items()]
 
         if tag.content.__len__() == 0:
-            return "<{tag_name} {attributes}/>".format(tag_name=tag.tag, attributes=" ".join(attributes_list))
+            return "<" + tag.tag + " " + " ".join(attributes_list) + "/>"
         else:
             return """
             <{tag_name} {attributes}>
@@ -171,15 +318,19 @@ class SVGExporter(Exporter):
         )
 
     def ellipse_to_tag(self, ellipse: Ellipse2d) -> SVGTag:
-        return SVGTag(
-            "ellipse",
-            {
-                "cx": self.convert_number(ellipse.center.x),
-                "cy": self.convert_number(ellipse.center.y),
-                "rx": self.convert_number(ellipse.radiuses.width),
-                "ry": self.convert_number(ellipse.radiuses.height),
-            }
-        )
+        attributes = {
+            "cx": self.convert_number(ellipse.center.x),
+            "cy": self.convert_number(ellipse.center.y),
+            "rx": self.convert_number(ellipse.radiuses.width),
+            "ry": self.convert_number(ellipse.radiuses.height),
+        }
+        if ellipse.angle != 0:
+            attributes["transform"] = "rotate({angle} {cx} {cy})".format(
+                angle=math.degrees(ellipse.angle),
+                cx=attributes["cx"],
+                cy=attributes["cy"]
+            )
+        return SVGTag("ellipse", attributes)
 
     def polyline_to_tag(self, polyline: Polyline2d) -> SVGTag:
         return SVGTag(
@@ -204,6 +355,9 @@ class SVGExporter(Exporter):
         )
 
     def path_to_tag(self, path: Path2d) -> SVGTag:
+        if self.path_encoder is not None:
+            return SVGTag("path", {"d": self.path_encoder.encode(path.components)})
+
         prevPoint: Point2d = None
         path_definition = " ".join(map(lambda component: self.component_to_svg(component, prevPoint), path.components))
         return SVGTag(
@@ -213,6 +367,18 @@ class SVGExporter(Exporter):
             }
         )
 
+    def packed_path_to_tag(self, path: PackedPath2d) -> SVGTag:
+        if self.path_encoder is not None:
+            return SVGTag("path", {"d": self.path_encoder.encode(map(path.component, range(path.__len__())))})
+
+        path_definition = " ".join(map(lambda index: self.component_to_svg(path.component(index), None), range(path.__len__())))
+        return SVGTag(
+            "path",
+            {
+                "d": path_definition
+            }
+        )
+
     def component_to_svg(self, component: Shape2d, prevPoint: Point2d) -> str:
         if isinstance(component, MoveOrigin):
             return self.move_origin_to_svg(component)
@@ -418,4 +584,15 @@ class SVGExporter(Exporter):
         return "Z".format()
 
     def convert_number(self, number: float, use_units: bool = False, use_scale: bool = True) -> str:
-        return "{value:.4f}{units}".format(value=number * self.scale if use_scale else 1, units=self.units if use_units else "")
\ No newline at end of file
+        if self.path_encoder is not None and use_scale:
+            return self.path_encoder.number(number) + (self.units if use_units else "")
+        return "{value:.4f}{units}".format(value=number * self.scale if use_scale else 1, units=self.units if use_units else "")
+
+    # Not scaled factor of transform matrix
+    def convert_factor(self, number: float) -> str:
+        result = "{value:.6f}".format(value=number)
+        if self.path_encoder is not None:
+            result = result.rstrip('0').rstrip('.')
+            if result == '-0':
+                result = '0'
+        return result
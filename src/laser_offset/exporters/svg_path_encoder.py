@@ -0,0 +1,177 @@
+from typing import Iterable, List, Optional, Tuple
+
+import math
+
+from laser_offset.geometry_2d.shapes_2d.path2d import Arc, ClosePath, CubicBezier, HorizontalLine, Line, MoveOrigin, PathComponent, Quadratic, ReflectedQuadratic, RelArc, RelCubicBezier, RelHorizontalLine, RelLine, RelMoveOrigin, RelQuadratic, RelReflectedQuadratic, RelSimpleArc, RelStrugBezier, RelVerticalLine, SimpleArc, StrugBezier, VerticalLine
+
+# Command which is implied when parameters of moveto are repeated
+IMPLIED_AFTER_MOVE = {'M': 'L', 'm': 'l'}
+
+
+def decimals_for_tolerance(tolerance: float, scale: float) -> int:
+    # Rounding to the last decimal moves output point by half of its step at most
+    return max(0, math.ceil(-math.log10(2 * tolerance * scale)))
+
+
+class SVGPathEncoder:
+    """Short path data: relative or absolute command, whichever is shorter, H and V for straight lines,
+    numbers without trailing zeros and separators which are not needed, repeated command letters are dropped
+
+    Coordinates are rounded to grid of 10^-decimals in output units. Current point is kept on the grid,
+    so relative commands do not add rounding error.
+    """
+
+    scale: float
+    decimals: int
+
+    grid_scale: float
+
+    def __init__(self, scale: float, decimals: int) -> None:
+        self.scale = scale
+        self.decimals = decimals
+        self.grid_scale = scale * 10 ** decimals
+
+    def grid(self, value: float) -> int:
+        return round(value * self.grid_scale)
+
+    def number(self, value: float) -> str:
+        return self.grid_number(self.grid(value))
+
+    def grid_number(self, value: int) -> str:
+        sign = '-' if value < 0 else ''
+        integer, fraction = divmod(abs(value), 10 ** self.decimals)
+        if fraction == 0:
+            return sign + str(integer)
+        fraction_text = str(fraction).rjust(self.decimals, '0').rstrip('0')
+        return sign + (str(integer) if integer != 0 else '') + '.' + fraction_text
+
+    def angle(self, angle: float) -> str:
+        return self.grid_number(round(math.degrees(angle) * 10 ** self.decimals))
+
+    def encode(self, components: Iterable[PathComponent]) -> str:
+        result: List[str] = list()
+        last_command: Optional[str] = None
+        # Last written number, empty after command letter
+        last_number = ''
+
+        # Exact current point and the same point on the grid
+        x, y = (0.0, 0.0)
+        grid_x, grid_y = (0, 0)
+        start = (x, y, grid_x, grid_y)
+
+        for component in components:
+            if isinstance(component, ClosePath):
+                command, parameters = ('z', [])
+                x, y, grid_x, grid_y = start
+            else:
+                command, parameters, (x, y) = self.encode_component(component, x, y, grid_x, grid_y)
+                grid_x, grid_y = (self.grid(x), self.grid(y))
+                if command in ('M', 'm'):
+                    start = (x, y, grid_x, grid_y)
+
+            if command != last_command and command != IMPLIED_AFTER_MOVE.get(last_command) or command in ('M', 'm', 'z'):
+                result.append(command)
+                last_number = ''
+            last_command = command
+
+            for number in parameters:
+                # Sign or second decimal point starts new number
+                if last_number != '' and number[0] != '-' and not (number[0] == '.' and '.' in last_number):
+                    result.append(' ')
+                result.append(number)
+                last_number = number
+
+        return ''.join(result)
+
+    def encode_component(self, component: PathComponent, x: float, y: float, grid_x: int, grid_y: int) -> Tuple[str, List[str], Tuple[float, float]]:
+        """Command letter, its parameters and exact end point of component"""
+
+        if isinstance(component, (MoveOrigin, RelMoveOrigin)):
+            end = self.absolute(component.target, x, y, isinstance(component, RelMoveOrigin))
+            return self.shorter('M', [], [end], grid_x, grid_y) + (end,)
+
+        elif isinstance(component, (HorizontalLine, RelHorizontalLine)):
+            end = (component.length + (x if isinstance(component, RelHorizontalLine) else 0), y)
+            return self.line(end, grid_x, grid_y) + (end,)
+
+        elif isinstance(component, (VerticalLine, RelVerticalLine)):
+            end = (x, component.length + (y if isinstance(component, RelVerticalLine) else 0))
+            return self.line(end, grid_x, grid_y) + (end,)
+
+        elif isinstance(component, (Line, RelLine)):
+            end = self.absolute(component.target, x, y, isinstance(component, RelLine))
+            return self.line(end, grid_x, grid_y) + (end,)
+
+        elif isinstance(component, (StrugBezier, RelStrugBezier)):
+            relative = isinstance(component, RelStrugBezier)
+            control = self.absolute(component.endControlPoint, x, y, relative)
+            end = self.absolute(component.target, x, y, relative)
+            return self.shorter('S', [], [control, end], grid_x, grid_y) + (end,)
+
+        elif isinstance(component, (CubicBezier, RelCubicBezier)):
+            relative = isinstance(component, RelCubicBezier)
+            start_control = self.absolute(component.startControlPoint, x, y, relative)
+            end_control = self.absolute(component.endControlPoint, x, y, relative)
+            end = self.absolute(component.target, x, y, relative)
+            return self.shorter('C', [], [start_control, end_control, end], grid_x, grid_y) + (end,)
+
+        elif isinstance(component, (Quadratic, RelQuadratic)):
+            relative = isinstance(component, RelQuadratic)
+            control = self.absolute(component.controlPoint, x, y, relative)
+            end = self.absolute(component.target, x, y, relative)
+            return self.shorter('Q', [], [control, end], grid_x, grid_y) + (end,)
+
+        elif isinstance(component, (ReflectedQuadratic, RelReflectedQuadratic)):
+            end = self.absolute(component.target, x, y, isinstance(component, RelReflectedQuadratic))
+            return self.shorter('T', [], [end], grid_x, grid_y) + (end,)
+
+        elif isinstance(component, (Arc, RelArc)):
+            end = self.absolute(component.target, x, y, isinstance(component, RelArc))
+            arc_parameters = [
+                self.number(component.radiuses.width),
+                self.number(component.radiuses.height),
+                self.angle(component.angle),
+                '1' if component.large_arc else '0',
+                '1' if component.sweep else '0'
+            ]
+            return self.shorter('A', arc_parameters, [end], grid_x, grid_y) + (end,)
+
+        elif isinstance(component, (SimpleArc, RelSimpleArc)):
+            end = self.absolute(component.target, x, y, isinstance(component, RelSimpleArc))
+            radius = self.number(component.radius)
+            arc_parameters = [radius, radius, '0', '1' if component.large_arc else '0', '0' if component.cw_direction else '1']
+            return self.shorter('A', arc_parameters, [end], grid_x, grid_y) + (end,)
+
+        else:
+            raise RuntimeError("Not Implemented")
+
+    def absolute(self, target, x: float, y: float, relative: bool) -> Tuple[float, float]:
+        if relative:
+            return (x + target.dx, y + target.dy)
+        return (target.x, target.y)
+
+    def line(self, end: Tuple[float, float], grid_x: int, grid_y: int) -> Tuple[str, List[str]]:
+        end_x, end_y = (self.grid(end[0]), self.grid(end[1]))
+        if end_y == grid_y:
+            return self.shorter_number('H', end_x, grid_x)
+        elif end_x == grid_x:
+            return self.shorter_number('V', end_y, grid_y)
+        return self.shorter('L', [], [end], grid_x, grid_y)
+
+    def shorter_number(self, command: str, value: int, current: int) -> Tuple[str, List[str]]:
+        absolute = self.grid_number(value)
+        relative = self.grid_number(value - current)
+        if relative.__len__() < absolute.__len__():
+            return (command.lower(), [relative])
+        return (command, [absolute])
+
+    def shorter(self, command: str, prefix: List[str], points: List[Tuple[float, float]], grid_x: int, grid_y: int) -> Tuple[str, List[str]]:
+        absolute: List[str] = list(prefix)
+        relative: List[str] = list(prefix)
+        for point_x, point_y in points:
+            point_grid_x, point_grid_y = (self.grid(point_x), self.grid(point_y))
+            absolute += [self.grid_number(point_grid_x), self.grid_number(point_grid_y)]
+            relative += [self.grid_number(point_grid_x - grid_x), self.grid_number(point_grid_y - grid_y)]
+        if sum(map(len, relative)) < sum(map(len, absolute)):
+            return (command.lower(), relative)
+        return (command, absolute)
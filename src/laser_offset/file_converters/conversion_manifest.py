@@ -0,0 +1,126 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import hashlib
+import json
+import os
+import tempfile
+
+from laser_offset.modifiers.offset_cache import package_version
+
+# Changes when manifest lines change, lines of other versions are not read
+MANIFEST_VERSION = 1
+
+MANIFEST_FILE_NAME = ".laser_offset_manifest.jsonl"
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ConversionManifest:
+    """Source files which were converted into target folder, with content hash, parameters, package version and outputs
+
+    Every converted file is appended as one JSON line, so a run which was stopped keeps the files it finished.
+    The last line of a file wins, the manifest is rewritten without old lines when it is loaded.
+    """
+
+    source_folder: str
+    target_folder: str
+    parameters: Dict[str, Any]
+    version: str
+
+    manifest_path: str
+    entries: Dict[str, Dict[str, Any]]
+
+    def __init__(self, source_folder: str, target_folder: str, parameters: Dict[str, Any], version: Optional[str] = None) -> None:
+        self.source_folder = source_folder
+        self.target_folder = target_folder
+        # Compared with loaded entries, so lists and tuples are the same
+        self.parameters = json.loads(json.dumps(parameters))
+        self.version = version if version is not None else package_version()
+        self.manifest_path = os.path.join(target_folder, MANIFEST_FILE_NAME)
+        self.entries = dict()
+        self.load()
+
+    def load(self):
+        lines_count = 0
+        try:
+            with open(self.manifest_path, "rt") as manifest:
+                for line in manifest:
+                    lines_count += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Last line of a stopped run can be cut
+                        continue
+                    if not isinstance(entry, dict) or entry.get("manifest") != MANIFEST_VERSION or "file" not in entry:
+                        continue
+                    if entry.get("outputs") is None:
+                        self.entries.pop(entry["file"], None)
+                    else:
+                        self.entries[entry["file"]] = entry
+        except OSError:
+            return
+
+        if lines_count > self.entries.__len__():
+            self.save()
+
+    def save(self):
+        os.makedirs(self.target_folder, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.target_folder, suffix='.tmp')
+        with os.fdopen(file_descriptor, "wt") as manifest:
+            for entry in self.entries.values():
+                manifest.write(json.dumps(entry) + "\n")
+        os.replace(temp_path, self.manifest_path)
+
+    def append(self, entry: Dict[str, Any]):
+        os.makedirs(self.target_folder, exist_ok=True)
+        with open(self.manifest_path, "at") as manifest:
+            manifest.write(json.dumps(entry) + "\n")
+
+    def source_state(self, file_name: str) -> Tuple[int, int, str]:
+        """Size, modification time and content hash of source file
+
+        Hash of the entry is used while size and time are not changed, other files are read.
+        """
+        source_path = os.path.join(self.source_folder, file_name)
+        stat = os.stat(source_path)
+        entry = self.entries.get(file_name)
+        if entry is not None and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime_ns:
+            return (stat.st_size, stat.st_mtime_ns, entry["hash"])
+
+        content_hash = hashlib.sha256()
+        with open(source_path, "rb") as source:
+            for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b''):
+                content_hash.update(block)
+        return (stat.st_size, stat.st_mtime_ns, content_hash.hexdigest())
+
+    def is_converted(self, file_name: str, source_state: Tuple[int, int, str]) -> bool:
+        entry = self.entries.get(file_name)
+        if entry is None or entry.get("parameters") != self.parameters or entry.get("version") != self.version:
+            return False
+
+        if entry.get("hash") != source_state[2]:
+            return False
+
+        return all(map(lambda output: os.path.isfile(os.path.join(self.target_folder, output)), entry["outputs"]))
+
+    def outputs(self, file_name: str) -> List[str]:
+        return list(map(lambda output: os.path.join(self.target_folder, output), self.entries[file_name]["outputs"]))
+
+    def record(self, file_name: str, source_state: Tuple[int, int, str], target_files: List[str]):
+        size, mtime, content_hash = source_state
+        entry = {
+            "manifest": MANIFEST_VERSION,
+            "file": file_name,
+            "hash": content_hash,
+            "size": size,
+            "mtime": mtime,
+            "parameters": self.parameters,
+            "version": self.version,
+            "outputs": list(map(lambda target_file: os.path.relpath(target_file, self.target_folder), target_files))
+        }
+        self.entries[file_name] = entry
+        self.append(entry)
+
+    def forget(self, file_name: str):
+        if self.entries.pop(file_name, None) is not None:
+            self.append({"manifest": MANIFEST_VERSION, "file": file_name, "outputs": None})
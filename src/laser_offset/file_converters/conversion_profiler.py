@@ -0,0 +1,212 @@
+from types import CodeType, FrameType
+from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+
+# Functions listed in the text report of every file
+TOP_FUNCTIONS_COUNT = 20
+
+# Default time between stack samples in seconds, Python switches threads every 5 ms
+DEFAULT_SAMPLING_INTERVAL = 0.01
+
+# Stacks of cProfile call graph which take less of total time are not written
+MIN_STACK_FRACTION = 1e-4
+
+# cProfile graph is not followed deeper
+MAX_STACK_DEPTH = 100
+
+Result = TypeVar('Result')
+
+# pstats function key: file, line, name
+FunctionKey = Tuple[str, int, str]
+
+
+def function_label(file_name: str, line: int, name: str) -> str:
+    # Built-in functions have no file
+    if file_name == '~':
+        return name
+    return "{name} ({file}:{line})".format(name=name, file=os.path.basename(file_name), line=line)
+
+
+def code_label(code: CodeType) -> str:
+    return function_label(code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def write_collapsed(stacks: Dict[str, int], file_path: str):
+    """Stacks in the format of flamegraph.pl and speedscope, root first, frames separated by ; and count after the last space"""
+
+    with open(file_path, "wt") as output:
+        for stack, count in sorted(stacks.items()):
+            if count > 0:
+                output.write("{stack} {count}\n".format(stack=stack, count=count))
+
+
+def collapsed_from_stats(stats: pstats.Stats) -> Dict[str, int]:
+    """Approximate stacks in microseconds from cProfile call graph
+
+    cProfile keeps only caller and callee pairs, so time of a function is split between its callers
+    in proportion of time it spent for every caller.
+    """
+
+    functions = stats.stats
+    callees: Dict[FunctionKey, Dict[FunctionKey, float]] = dict()
+    roots: List[FunctionKey] = list()
+    for function, (_, _, _, _, callers) in functions.items():
+        if callers.__len__() == 0:
+            roots.append(function)
+        for caller, caller_stats in callers.items():
+            callees.setdefault(caller, dict())[function] = caller_stats[3]
+
+    total_time = sum(map(lambda function: functions[function][3], roots))
+    min_time = total_time * MIN_STACK_FRACTION
+    result: Dict[str, float] = dict()
+
+    def walk(function: FunctionKey, stack: str, fraction: float, visited: Set[FunctionKey], depth: int):
+        own_time = functions[function][2] * fraction
+        result[stack] = result.get(stack, 0) + own_time
+        if depth >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(function, dict()).items():
+            callee_time = functions[callee][3]
+            if callee in visited or callee_time <= 0 or edge_time * fraction < min_time:
+                continue
+            callee_stack = stack + ";" + function_label(*callee)
+            walk(callee, callee_stack, fraction * edge_time / callee_time, visited | {callee}, depth + 1)
+
+    for root in roots:
+        walk(root, function_label(*root), 1.0, {root}, 0)
+
+    return dict(map(lambda item: (item[0], round(item[1] * 1e6)), result.items()))
+
+
+class StackSampler:
+    """Samples stack of one thread from a background thread
+
+    Stacks are kept from the frame below root_frame, so frames of the caller are not repeated in every stack.
+    """
+
+    interval: float
+    thread_id: int
+    root_frame: Optional[FrameType]
+
+    stacks: Dict[str, int]
+    samples: int
+
+    stop_event: threading.Event
+    thread: Optional[threading.Thread]
+
+    def __init__(self, interval: float = DEFAULT_SAMPLING_INTERVAL) -> None:
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.root_frame = None
+        self.stacks = dict()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self, root_frame: Optional[FrameType] = None):
+        self.thread_id = threading.get_ident()
+        self.root_frame = root_frame
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="laser_offset sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.add_sample(frame)
+
+    def add_sample(self, frame: FrameType):
+        labels: List[str] = list()
+        while frame is not None and frame is not self.root_frame:
+            labels.append(code_label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        stack = ";".join(labels)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+    def top_functions(self) -> List[Tuple[str, int, int]]:
+        """Function, samples where it runs itself and samples where it is on the stack"""
+
+        own: Dict[str, int] = dict()
+        total: Dict[str, int] = dict()
+        for stack, count in self.stacks.items():
+            labels = stack.split(";")
+            own[labels[-1]] = own.get(labels[-1], 0) + count
+            for label in set(labels):
+                total[label] = total.get(label, 0) + count
+        functions = sorted(total.keys(), key=lambda label: (-own.get(label, 0), -total[label], label))
+        return list(map(lambda label: (label, own.get(label, 0), total[label]), functions[:TOP_FUNCTIONS_COUNT]))
+
+
+class ConversionProfiler:
+    """Profiles conversion of every file and writes profiles to output folder
+
+    cProfile mode writes FILE.pstats, FILE.collapsed made from the call graph and FILE.txt with functions by own time.
+    Sampling mode has lower overhead for long runs, it writes FILE.collapsed from sampled stacks and FILE.txt.
+    """
+
+    output_folder: str
+    sampling: bool
+    interval: float
+
+    def __init__(self, output_folder: str, sampling: bool = False, interval: float = DEFAULT_SAMPLING_INTERVAL) -> None:
+        self.output_folder = output_folder
+        self.sampling = sampling
+        self.interval = interval
+
+    def output_path(self, file_name: str, extension: str) -> str:
+        return os.path.join(self.output_folder, file_name + extension)
+
+    def profile(self, file_name: str, function: Callable[[], Result]) -> Result:
+        # Profile is written for files which fail too, slow files often fail after a long time
+        os.makedirs(self.output_folder, exist_ok=True)
+        if self.sampling:
+            sampler = StackSampler(self.interval)
+            sampler.start(sys._getframe())
+            try:
+                return function()
+            finally:
+                sampler.stop()
+                self.write_samples(file_name, sampler)
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(function)
+        finally:
+            self.write_stats(file_name, profiler)
+
+    def write_stats(self, file_name: str, profiler: cProfile.Profile):
+        profiler.create_stats()
+        if profiler.stats.__len__() == 0:
+            return
+        stats = pstats.Stats(profiler)
+        stats.dump_stats(self.output_path(file_name, ".pstats"))
+        write_collapsed(collapsed_from_stats(stats), self.output_path(file_name, ".collapsed"))
+
+        with open(self.output_path(file_name, ".txt"), "wt") as output:
+            output.write("{file}: functions by own time\n".format(file=file_name))
+            stats.stream = output
+            stats.sort_stats(pstats.SortKey.TIME).print_stats(TOP_FUNCTIONS_COUNT)
+
+    def write_samples(self, file_name: str, sampler: StackSampler):
+        write_collapsed(sampler.stacks, self.output_path(file_name, ".collapsed"))
+
+        with open(self.output_path(file_name, ".txt"), "wt") as output:
+            output.write("{file}: {samples} samples every {interval:g} ms, functions by own samples\n\n".format(
+                file=file_name, samples=sampler.samples, interval=sampler.interval * 1000))
+            output.write("{own:>8} {total:>8}  function\n".format(own="own", total="total"))
+            for label, own, total in sampler.top_functions():
+                output.write("{own:>8} {total:>8}  {label}\n".format(own=own, total=total, label=label))
@@ -0,0 +1,247 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO, TextIOWrapper
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import hashlib
+import json
+import os
+import socketserver
+import threading
+
+from laser_offset.file_converters.file_converter import FileConverter
+from laser_offset.geometry_2d.canvas2d import Canvas2d
+from laser_offset.modifiers.offset_cache import OffsetCache
+
+# Content type of every output format
+FORMAT_CONTENT_TYPES = {
+    'svg': 'image/svg+xml',
+    'dxf': 'application/dxf'
+}
+
+DEFAULT_CANVAS_CACHE_SIZE = 16
+
+
+class ConversionWorker:
+    """FileConverter pipeline of one worker process
+
+    Keeps combined canvases of recent inputs by content hash, so the same part with other widths is not imported again.
+    """
+
+    converter_options: Dict[str, Any]
+    offset_cache: OffsetCache
+    canvas_cache_size: int
+    canvases: 'OrderedDict[str, Canvas2d]'
+
+    def __init__(self, converter_options: Dict[str, Any], canvas_cache_size: int) -> None:
+        self.converter_options = converter_options
+        self.offset_cache = converter_options.get('offset_cache') or OffsetCache()
+        self.canvas_cache_size = canvas_cache_size
+        self.canvases = OrderedDict()
+
+    def file_converter(self, widths: List[float], formats: List[str]) -> FileConverter:
+        return FileConverter(**dict(self.converter_options,
+            source_folder = '',
+            target_folder = '',
+            laser_beam_width = widths,
+            create_svg = 'svg' in formats,
+            create_dxf = 'dxf' in formats,
+            offset_cache = self.offset_cache
+        ))
+
+    def canvas(self, converter: FileConverter, data: bytes, key: str) -> Tuple[Canvas2d, bool]:
+        canvas = self.canvases.get(key)
+        if canvas is not None:
+            self.canvases.move_to_end(key)
+            return (canvas, True)
+
+        # Text is decoded as open() in FileConverter.convert does
+        canvas = converter.modify_canvas(converter.dxf_importer.import_canvas(False, TextIOWrapper(BytesIO(data))))
+        self.canvases[key] = canvas
+        while self.canvases.__len__() > self.canvas_cache_size:
+            self.canvases.popitem(last=False)
+        return (canvas, False)
+
+    def convert(self, data: Optional[bytes], path: Optional[str], key: Optional[str], widths: List[float], formats: List[str]) -> Tuple[Dict[str, bytes], bool]:
+        """Output of every format and True when the canvas was taken from the cache"""
+
+        if data is None:
+            with open(path, "rb") as input:
+                data = input.read()
+        if key is None:
+            key = hashlib.sha256(data).hexdigest()
+
+        converter = self.file_converter(widths, formats)
+        canvas, cached = self.canvas(converter, data, key)
+        result_canvas = converter.expanded_canvas(canvas)
+
+        outputs: Dict[str, bytes] = dict()
+        for output_format in formats:
+            output = StringIO()
+            if output_format == 'svg':
+                converter.svg_exporter.export_canvas(result_canvas, True, output)
+            else:
+                converter.dxf_exporter.export_canvas(result_canvas, True, output)
+            outputs[output_format] = output.getvalue().encode('utf-8')
+        return (outputs, cached)
+
+
+# Worker of this process, made once by init_worker
+worker: Optional[ConversionWorker] = None
+
+def init_worker(converter_options: Dict[str, Any], canvas_cache_size: int):
+    global worker
+    worker = ConversionWorker(converter_options, canvas_cache_size)
+
+def convert_in_worker(data: Optional[bytes], path: Optional[str], key: Optional[str], widths: List[float], formats: List[str]) -> Tuple[Dict[str, bytes], bool]:
+    return worker.convert(data, path, key, widths, formats)
+
+
+class ConversionServer:
+    """Warm worker processes which convert requests, one process for every worker slot
+
+    Requests for the same input go to the same slot, so its canvas cache is used.
+    """
+
+    converter_options: Dict[str, Any]
+    canvas_cache_size: int
+    workers: List[ProcessPoolExecutor]
+    lock: threading.Lock
+
+    def __init__(self, workers_count: int, converter_options: Dict[str, Any], canvas_cache_size: int = DEFAULT_CANVAS_CACHE_SIZE) -> None:
+        self.converter_options = converter_options
+        self.canvas_cache_size = canvas_cache_size
+        self.lock = threading.Lock()
+        self.workers = list(map(lambda _: self.start_worker(), range(workers_count)))
+
+    def start_worker(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(max_workers=1, initializer=init_worker, initargs=(self.converter_options, self.canvas_cache_size))
+        # Process is started and imports are done before the first request
+        executor.submit(os.getpid).result()
+        return executor
+
+    def convert(self, data: Optional[bytes], path: Optional[str], widths: List[float], formats: List[str]) -> Tuple[Dict[str, bytes], bool]:
+        key = hashlib.sha256(data).hexdigest() if data is not None else None
+        routing_key = key if key is not None else hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()
+        slot = int(routing_key[:8], 16) % self.workers.__len__()
+
+        with self.lock:
+            executor = self.workers[slot]
+        try:
+            return executor.submit(convert_in_worker, data, path, key, widths, formats).result()
+        except BrokenProcessPool:
+            # Killed worker is replaced, the request which broke it fails
+            with self.lock:
+                if self.workers[slot] is executor:
+                    self.workers[slot] = self.start_worker()
+            raise RuntimeError("Worker process stopped")
+
+    def close(self):
+        for executor in self.workers:
+            executor.shutdown()
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    """POST /convert?width=150&format=svg with DXF as request body, or with path=/absolute/file.dxf and no body
+
+    width is beam diameter in μm as in the CLI and can be repeated, format is svg or dxf and can be repeated, dxf by default.
+    One format is returned as the file itself, several are returned as JSON object with text of every format.
+    GET /health answers ok.
+    """
+
+    server_version = "laser_offset"
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def send_text(self, status: int, text: str):
+        self.send_body(status, 'text/plain; charset=utf-8', (text + "\n").encode('utf-8'))
+
+    def send_body(self, status: int, content_type: str, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(body.__len__()))
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/health':
+            self.send_text(200, "ok")
+        else:
+            self.send_text(404, "Not found")
+
+    def do_POST(self):
+        # Body is read before any answer, so client is not stopped while it sends
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length) if length > 0 else None
+
+        url = urlparse(self.path)
+        if url.path != '/convert':
+            self.send_text(404, "Not found")
+            return
+
+        query = parse_qs(url.query)
+        try:
+            widths = list(map(int, query.get('width', [])))
+        except ValueError:
+            widths = []
+        if widths.__len__() == 0 or any(map(lambda width: width < 1 or width > 999, widths)):
+            self.send_text(400, "width from 1 to 999 μm is required")
+            return
+
+        formats = list(dict.fromkeys(query.get('format', ['dxf'])))
+        if any(map(lambda output_format: output_format not in FORMAT_CONTENT_TYPES, formats)):
+            self.send_text(400, "format can be svg or dxf")
+            return
+
+        path = query.get('path', [None])[0]
+        if (data is None) == (path is None):
+            self.send_text(400, "DXF in request body or path is required")
+            return
+        if path is not None and not os.path.isfile(path):
+            self.send_text(404, "No file {path}".format(path=path))
+            return
+
+        try:
+            outputs, cached = self.server.conversion_server.convert(data, path, list(map(lambda width: width / 2000.0, widths)), formats)
+        except Exception as exception:
+            self.send_text(500, "{name}: {error}".format(name=type(exception).__name__, error=exception))
+            return
+
+        headers = {'X-Canvas-Cache': 'hit' if cached else 'miss'}
+        if formats.__len__() == 1:
+            self.send_body(200, FORMAT_CONTENT_TYPES[formats[0]], outputs[formats[0]], headers)
+        else:
+            body = json.dumps(dict(map(lambda item: (item[0], item[1].decode('utf-8')), outputs.items()))).encode('utf-8')
+            self.send_body(200, 'application/json', body, headers)
+
+
+class ConversionHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    conversion_server: ConversionServer
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class ConversionUnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+        conversion_server: ConversionServer
+
+
+def make_server(conversion_server: ConversionServer, host: str = '127.0.0.1', port: int = 8765, socket_path: Optional[str] = None) -> socketserver.BaseServer:
+    if socket_path is not None:
+        if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+            raise RuntimeError("Unix sockets are not supported on this platform")
+        # Socket of the previous run is left when it was killed
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ConversionUnixServer(socket_path, ConversionRequestHandler)
+    else:
+        server = ConversionHTTPServer((host, port), ConversionRequestHandler)
+    server.conversion_server = conversion_server
+    return server
@@ -0,0 +1,192 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import heapq
+import time
+
+from laser_offset.geometry_2d import arc_info
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.shapes_2d.arc2d import Arc2d
+from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
+from laser_offset.geometry_2d.shapes_2d.path2d import Path2d, Arc, SimpleArc, MoveOrigin, ClosePath
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d, COMPONENT_ARC, COMPONENT_MOVE, COMPONENT_CLOSE
+from laser_offset.modifiers import segment_operations
+from laser_offset.modifiers.parallel_expand import shape_size
+
+# Shapes with the longest expand time which are kept in the report
+SLOWEST_SHAPES_COUNT = 10
+
+
+def work_counters() -> Dict[str, int]:
+    # Counters of the offset code, stages take their differences
+    return {
+        "arc_solves": arc_info.solved_arcs,
+        "intersection_tests": segment_operations.intersection_tests,
+        "loops_removed": segment_operations.removed_loops
+    }
+
+
+def count_segments(shape: Shape2d) -> Tuple[int, int]:
+    """Lines and arcs of shape, loose lines and arcs are one segment, circles and other shapes have none"""
+
+    segments = 0
+    arcs = 0
+    if isinstance(shape, Line2d):
+        segments = 1
+    elif isinstance(shape, Arc2d):
+        segments = 1
+        arcs = 1
+    elif isinstance(shape, Path2d):
+        for component in shape.components:
+            if isinstance(component, (MoveOrigin, ClosePath)):
+                continue
+            segments += 1
+            if isinstance(component, (SimpleArc, Arc)):
+                arcs += 1
+    elif isinstance(shape, PackedPath2d):
+        for code in shape.codes:
+            if code == COMPONENT_MOVE or code == COMPONENT_CLOSE:
+                continue
+            segments += 1
+            if code == COMPONENT_ARC:
+                arcs += 1
+    return (segments, arcs)
+
+
+class ConversionStats:
+    """Wall and CPU time of conversion stages and of every expanded shape, with counters of the offset work
+
+    Made by FileConverter only when the report is asked for, so conversion without report does not measure anything.
+    """
+
+    file_name: str
+    stages: Dict[str, Dict[str, float]]
+    counters: Dict[str, int]
+
+    shapes_count: int
+    shapes_wall: float
+    shapes_cpu: float
+    # Heap of (wall, cpu, index, type, components) for the slowest shapes
+    slowest_shapes: List[Tuple[float, float, int, str, int]]
+
+    def __init__(self, file_name: str) -> None:
+        self.file_name = file_name
+        self.stages = dict()
+        self.counters = dict()
+        self.shapes_count = 0
+        self.shapes_wall = 0
+        self.shapes_cpu = 0
+        self.slowest_shapes = list()
+
+    def add_time(self, name: str, wall: float, cpu: float):
+        stage = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+        stage["wall"] += wall
+        stage["cpu"] += cpu
+
+    def add_counter(self, name: str, value: int):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        counters = work_counters()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - wall, time.process_time() - cpu)
+            for counter, value in work_counters().items():
+                self.add_counter(counter, value - counters[counter])
+
+    def timed_iterator(self, name: str, iterator: Iterable[Any]) -> Iterator[Any]:
+        # Time spent in the iterator is added to the stage, time of the loop body is not
+        iterator = iter(iterator)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count_shapes(self, name: str, shapes: List[Shape2d]):
+        segments = 0
+        arcs = 0
+        for shape in shapes:
+            shape_segments, shape_arcs = count_segments(shape)
+            segments += shape_segments
+            arcs += shape_arcs
+        self.counters[name + "_shapes"] = shapes.__len__()
+        self.counters[name + "_segments"] = segments
+        self.counters[name + "_arcs"] = arcs
+
+    def expand_shapes(self, modifier, shapes: List[Shape2d]) -> List[Shape2d]:
+        """Expands shapes one by one as Expand.modifyShapes does, with time of every shape"""
+
+        result: List[Shape2d] = list()
+        for shape in shapes:
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            result += modifier.modifyShape(shape)
+            self.add_shape(shape, time.perf_counter() - wall, time.process_time() - cpu)
+        return result
+
+    def add_shape(self, shape: Shape2d, wall: float, cpu: float):
+        item = (wall, cpu, self.shapes_count, type(shape).__name__, shape_size(shape))
+        if self.slowest_shapes.__len__() < SLOWEST_SHAPES_COUNT:
+            heapq.heappush(self.slowest_shapes, item)
+        elif wall > self.slowest_shapes[0][0]:
+            heapq.heapreplace(self.slowest_shapes, item)
+        self.shapes_count += 1
+        self.shapes_wall += wall
+        self.shapes_cpu += cpu
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "file": self.file_name,
+            "stages": self.stages,
+            "total": {
+                "wall": sum(map(lambda stage: stage["wall"], self.stages.values())),
+                "cpu": sum(map(lambda stage: stage["cpu"], self.stages.values()))
+            },
+            "counters": self.counters,
+            "shapes": {
+                "count": self.shapes_count,
+                "wall": self.shapes_wall,
+                "cpu": self.shapes_cpu,
+                "slowest": list(map(lambda item: {
+                    "index": item[2],
+                    "type": item[3],
+                    "components": item[4],
+                    "wall": item[0],
+                    "cpu": item[1]
+                }, sorted(self.slowest_shapes, reverse=True)))
+            }
+        }
+
+
+def summary_report(reports: List[Dict[str, Any]], failed_files: List[str]) -> Dict[str, Any]:
+    """Sums of stage times and counters of all files, with the slowest files"""
+
+    stages: Dict[str, Dict[str, float]] = dict()
+    counters: Dict[str, int] = dict()
+    for report in reports:
+        for name, stage in report["stages"].items():
+            total = stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            total["wall"] += stage["wall"]
+            total["cpu"] += stage["cpu"]
+        for name, value in report["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+
+    slowest = sorted(reports, key=lambda report: report["total"]["wall"], reverse=True)[:SLOWEST_SHAPES_COUNT]
+    return {
+        "files": reports.__len__(),
+        "failed": failed_files,
+        "stages": stages,
+        "total": {
+            "wall": sum(map(lambda stage: stage["wall"], stages.values())),
+            "cpu": sum(map(lambda stage: stage["cpu"], stages.values()))
+        },
+        "counters": counters,
+        "slowest_files": list(map(lambda report: {"file": report["file"], "wall": report["total"]["wall"]}, slowest))
+    }
@@ -1,4 +1,5 @@
-from typing import List, Optional, Protocol
+from contextlib import nullcontext
+from typing import ContextManager, Iterable, List, Optional, Protocol, Union
 from pathlib import Path
 
 from laser_offset.exporters.dxf_exporter import DXFExporter
@@ -8,8 +9,15 @@ from laser_offset.importers.svg_importer import SVGImporter
 
 from laser_offset.modifiers.modifier import Modifier
 from laser_offset.modifiers.expand import Expand
+from laser_offset.modifiers.offset_cache import OffsetCache
+from laser_offset.modifiers.segment_index import SEGMENT_INDEXES
+from laser_offset.file_converters.conversion_stats import ConversionStats
+from laser_offset.file_converters.conversion_profiler import ConversionProfiler, DEFAULT_SAMPLING_INTERVAL
 
-from laser_offset.geometry_2d.canvas2d import Canvas2d
+from laser_offset.geometry_2d.canvas2d import Canvas2d, extractPathsFromShapes, joinBlockReferences, joinShapesToPathShapesWithOpenChains
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.size2d import Size2d
 
 class FileConverter:
 
@@ -19,7 +27,10 @@ class FileConverter:
     create_svg: bool
     create_dxf: bool
     
-    laser_beam_width: float
+    laser_beam_width: Union[float, List[float]]
+
+    streaming: bool
+    streaming_batch: int
     
     dxf_importer: DXFImporter
     svg_importer: SVGImporter
@@ -29,51 +40,100 @@ class FileConverter:
     svg_exporter: SVGExporter
     dxf_exporter: DXFExporter
 
+    # Stage times and counters of the last converted file are kept in stats
+    collect_stats: bool
+    stats: Optional[ConversionStats] = None
+
+    # Conversion of every file is profiled when profiler is set
+    profiler: Optional[ConversionProfiler] = None
+
     def __init__(self,
         source_folder: str,
         target_folder: str,
-        laser_beam_width: float,
+        laser_beam_width: Union[float, List[float]],
         file_list: Optional[List[str]] = None,
 
         create_svg: bool = False,
-        create_dxf: bool = True
+        create_dxf: bool = True,
+        offset_cache: Optional[OffsetCache] = None,
+        streaming: bool = False,
+        streaming_batch: int = 1000,
+        fast_dxf: bool = False,
+        packed_paths: bool = False,
+        compact_svg: bool = False,
+        svg_tolerance: float = 0.001,
+        direct_dxf: bool = False,
+        segment_index: str = 'grid',
+        collect_stats: bool = False,
+        profile_folder: Optional[str] = None,
+        profile_sampling: bool = False,
+        profile_interval: float = DEFAULT_SAMPLING_INTERVAL
         ) -> None:
 
         self.laser_beam_width = laser_beam_width
+        # DXF is read entity by entity, shapes which need no merge are expanded in batches while reading
+        self.streaming = streaming
+        self.streaming_batch = streaming_batch
         
         self.source_folder = source_folder
         self.target_folder = target_folder
         self.create_svg = create_svg
         self.create_dxf = create_dxf
+        self.collect_stats = collect_stats
+        if profile_folder is not None:
+            self.profiler = ConversionProfiler(profile_folder, profile_sampling, profile_interval)
 
-        self.dxf_importer = DXFImporter()
+        self.dxf_importer = DXFImporter(packed_paths=packed_paths, fast_scan=fast_dxf)
         self.svg_importer = SVGImporter()
-        self.dxf_exporter = DXFExporter()
-        self.svg_exporter = SVGExporter()
+        self.dxf_exporter = DXFExporter(direct=direct_dxf)
+        self.svg_exporter = SVGExporter(compact=compact_svg, tolerance=svg_tolerance)
 
-        self.expand_modifier = Expand(self.laser_beam_width)
+        self.expand_modifier = Expand(self.laser_beam_width, segment_index=SEGMENT_INDEXES[segment_index], offset_cache=offset_cache)
 
     def convert(self, file_name) -> List[str]:
+        if self.profiler is not None:
+            return self.profiler.profile(file_name, lambda: self.convert_source(file_name))
+        return self.convert_source(file_name)
+
+    def convert_source(self, file_name) -> List[str]:
 
         result: List[str] = list()
         file_path = self.source_folder+"/"+file_name
+        self.stats = ConversionStats(file_name) if self.collect_stats else None
         
         with open(file_path, "rt") as input:
 
-            canvas = self.dxf_importer.import_canvas(False, input)
-            input.close()
-            result_canvas = self.convert_canvas(canvas)
+            if self.streaming:
+                shapes = self.dxf_importer.import_shapes(input)
+                if self.stats is not None:
+                    shapes = self.stats.timed_iterator("import", shapes)
+                result_canvas = self.convert_shapes(shapes)
+            else:
+                with self.stage("import"):
+                    canvas = self.dxf_importer.import_canvas(False, input)
+                input.close()
+                if self.stats is not None:
+                    self.stats.count_shapes("imported", canvas.shapes)
+                result_canvas = self.convert_canvas(canvas)
+
+            if self.stats is not None:
+                self.stats.count_shapes("output", result_canvas.shapes)
 
             if self.create_svg:
-                target_svg_file = self.save_svg(result_canvas, file_name.replace('.dxf', '.svg').replace('.DXF', '.svg'))
+                with self.stage("export_svg"):
+                    target_svg_file = self.save_svg(result_canvas, file_name.replace('.dxf', '.svg').replace('.DXF', '.svg'))
                 result.append(target_svg_file)
                                     
             if self.create_dxf:
-                target_dxf_file = self.save_dxf(result_canvas, file_name)
+                with self.stage("export_dxf"):
+                    target_dxf_file = self.save_dxf(result_canvas, file_name)
                 result.append(target_dxf_file)
 
         return result
 
+    def stage(self, name: str) -> ContextManager:
+        return self.stats.stage(name) if self.stats is not None else nullcontext()
+
     def save_svg(self, canvas: Canvas2d, file_name: str) -> str:
         target_path = self.target_folder
         Path(target_path).mkdir(parents=True, exist_ok=True)
@@ -96,9 +156,55 @@ class FileConverter:
         return expanded_canvas
             
     def modify_canvas(self, canvas: Canvas2d) -> Canvas2d:
-        combined_canvas = canvas.cobineShapesToPaths()
+        with self.stage("combine"):
+            combined_canvas = canvas.cobineShapesToPaths()
+        if self.stats is not None:
+            self.stats.count_shapes("combined", combined_canvas.shapes)
         return combined_canvas
         
     def expanded_canvas(self, canvas: Canvas2d) -> Canvas2d: 
-        expanded_canvas = self.expand_modifier.modify(canvas)
-        return expanded_canvas
\ No newline at end of file
+        if self.stats is None:
+            return self.expand_modifier.modify(canvas)
+
+        with self.stage("expand"):
+            expanded_canvas = Canvas2d(canvas.center, canvas.size, self.stats.expand_shapes(self.expand_modifier, canvas.shapes))
+        return expanded_canvas
+
+    def expand_shapes(self, shapes: List[Shape2d]) -> List[Shape2d]:
+        if self.stats is None:
+            return self.expand_modifier.modifyShapes(shapes)
+
+        with self.stage("expand"):
+            return self.stats.expand_shapes(self.expand_modifier, shapes)
+
+    def convert_shapes(self, shapes: Iterable[Shape2d]) -> Canvas2d:
+        # Same result as convert_canvas, shapes which are not merged go first in their order, merged paths after them
+        expanded_shapes: List[Shape2d] = list()
+        shapes_to_merge: List[Shape2d] = list()
+        batch: List[Shape2d] = list()
+        joined_blocks = dict()
+        block_open_chains = 0
+
+        imported_shapes = 0
+        for shape in shapes:
+            imported_shapes += 1
+            with self.stage("combine"):
+                (shape_parts, other_shapes) = extractPathsFromShapes([shape])
+                (other_shapes, shape_open_chains) = joinBlockReferences(other_shapes, joined_blocks)
+            shapes_to_merge += shape_parts
+            batch += other_shapes
+            block_open_chains += shape_open_chains
+            if batch.__len__() >= self.streaming_batch:
+                expanded_shapes += self.expand_shapes(batch)
+                batch = list()
+
+        with self.stage("combine"):
+            merged_shapes, open_chains = joinShapesToPathShapesWithOpenChains(shapes_to_merge)
+        if self.stats is not None:
+            self.stats.counters["imported_shapes"] = imported_shapes
+        expanded_shapes += self.expand_shapes(batch + merged_shapes)
+
+        # Size is taken from shape bounds by exporters
+        result_canvas = Canvas2d(Point2d.cartesian(0, 0), Size2d(0, 0), expanded_shapes)
+        result_canvas.open_chains = open_chains + block_open_chains
+        return result_canvas
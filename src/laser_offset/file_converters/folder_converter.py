@@ -1,32 +1,106 @@
-from typing import List, Optional, Protocol, NamedTuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional, Protocol, NamedTuple, Tuple, Union
 from pathlib import Path
+import json
 import os
+import traceback
 
+from laser_offset.file_converters.conversion_manifest import ConversionManifest
+from laser_offset.file_converters.conversion_profiler import DEFAULT_SAMPLING_INTERVAL
+from laser_offset.file_converters.conversion_stats import summary_report
 from laser_offset.file_converters.file_converter import FileConverter
+from laser_offset.file_converters.folder_watcher import DEFAULT_DEBOUNCE, FolderWatcher
+from laser_offset.modifiers.offset_cache import OffsetCache
 
 class FileStatusCallback(Protocol):
-    def __call__(self, file_name: str, full_path: str, completed: bool, index: int, total: int) -> None: ...
+    def __call__(self, file_name: str, full_path: str, target_files: List[str], completed: bool, index: int, total: int) -> None: ...
+
+class FileResult(NamedTuple):
+    file_name: str
+    target_files: List[str]
+    # Last line of the exception when the file was not converted
+    error: Optional[str] = None
+    # File was not changed since it was converted by the same parameters
+    skipped: bool = False
+    # Stage times and counters when report is written
+    report: Optional[Dict[str, Any]] = None
+
+# FileConverter options which do not change output files, they are not kept in the manifest
+NOT_OUTPUT_OPTIONS = ('source_folder', 'target_folder', 'offset_cache', 'segment_index', 'collect_stats', 'profile_folder', 'profile_sampling', 'profile_interval')
+
+# Converter of the worker process, made once by init_worker
+worker_file_converter: Optional[FileConverter] = None
+
+def init_worker(converter_options: Dict[str, Any]):
+    global worker_file_converter
+    worker_file_converter = FileConverter(**converter_options)
+
+def convert_file(file_converter: FileConverter, file_name: str) -> Tuple[List[str], Optional[str], int, int, Optional[Dict[str, Any]]]:
+    """Converts one file, returns target files, error, offset cache hits and misses made by this file and its report"""
+
+    offset_cache = file_converter.expand_modifier.offset_cache
+    hits, misses = (offset_cache.hits, offset_cache.misses) if offset_cache is not None else (0, 0)
+    try:
+        target_files = file_converter.convert(file_name)
+        error = None
+    except Exception as exception:
+        target_files = []
+        error = traceback.format_exception_only(type(exception), exception)[-1].strip()
+    if offset_cache is not None:
+        hits, misses = (offset_cache.hits - hits, offset_cache.misses - misses)
+    report = file_converter.stats.report() if file_converter.stats is not None else None
+    return (target_files, error, hits, misses, report)
+
+def convert_file_in_worker(file_name: str) -> Tuple[List[str], Optional[str], int, int, Optional[Dict[str, Any]]]:
+    return convert_file(worker_file_converter, file_name)
 
 class FolderConverter:
 
     source_folder: str
     target_folder: str
-    laser_beam_width: float
+    laser_beam_width: Union[float, List[float]]
     file_list: Optional[List[str]] = None
 
     create_svg: bool = False
     create_dxf: bool = True
 
+    # Files are converted by this many processes
+    jobs: int = 1
+
+    # Files which are in the target folder manifest with the same hash and parameters are not converted
+    incremental: bool = False
+
+    # Folder for JSON report of every file and summary.json of the batch
+    report_folder: Optional[str] = None
+
+    # FileConverter arguments, workers make their own converters from them
+    converter_options: Dict[str, Any]
+
     file_converter: FileConverter
 
     def __init__(self, 
         source_folder: str,
         target_folder: str,
-        laser_beam_width: float,
+        laser_beam_width: Union[float, List[float]],
         file_list: Optional[List[str]] = None,
 
         create_svg: bool = False,
-        create_dxf: bool = True
+        create_dxf: bool = True,
+        offset_cache: Optional[OffsetCache] = None,
+        streaming: bool = False,
+        fast_dxf: bool = False,
+        packed_paths: bool = False,
+        compact_svg: bool = False,
+        svg_tolerance: float = 0.001,
+        direct_dxf: bool = False,
+        segment_index: str = 'grid',
+        jobs: int = 1,
+        incremental: bool = False,
+        report_folder: Optional[str] = None,
+        profile_folder: Optional[str] = None,
+        profile_sampling: bool = False,
+        profile_interval: float = DEFAULT_SAMPLING_INTERVAL
         ) -> None:
         
         self.source_folder = source_folder
@@ -35,14 +109,30 @@ class FolderConverter:
         self.file_list = file_list
         self.create_svg = create_svg
         self.create_dxf = create_dxf
+        self.jobs = jobs
+        self.incremental = incremental
+        self.report_folder = report_folder
 
-        self.file_converter = FileConverter(
+        self.converter_options = dict(
             source_folder = source_folder,
             target_folder = target_folder,
             create_dxf = create_dxf,
             create_svg = create_svg,
-            laser_beam_width = laser_beam_width
+            laser_beam_width = laser_beam_width,
+            offset_cache = offset_cache,
+            streaming = streaming,
+            fast_dxf = fast_dxf,
+            packed_paths = packed_paths,
+            compact_svg = compact_svg,
+            svg_tolerance = svg_tolerance,
+            direct_dxf = direct_dxf,
+            segment_index = segment_index,
+            collect_stats = report_folder is not None,
+            profile_folder = profile_folder,
+            profile_sampling = profile_sampling,
+            profile_interval = profile_interval
         )
+        self.file_converter = FileConverter(**self.converter_options)
         
     @property
     def files_to_convert(self) -> List[str]:
@@ -50,17 +140,136 @@ class FolderConverter:
             return self.file_list
 
         else:
-            return list(filter(lambda file_name: file_name.lower().endswith(".dxf") and os.path.isfile(os.path.join(self.source_folder, file_name)), os.listdir(self.source_folder)))
+            return sorted(filter(lambda file_name: self.is_source_file(file_name) and os.path.isfile(os.path.join(self.source_folder, file_name)), os.listdir(self.source_folder)))
+
+    def is_source_file(self, file_name: str) -> bool:
+        return file_name.lower().endswith(".dxf")
+
+    @property
+    def manifest_parameters(self) -> Dict[str, Any]:
+        # Everything which changes output files
+        return dict(filter(lambda item: item[0] not in NOT_OUTPUT_OPTIONS, self.converter_options.items()))
+
+    def convert(self, file_status_callback: FileStatusCallback, file_names: Optional[List[str]] = None) -> List[FileResult]:
+        """Converts every file or only file_names, a file which fails does not stop the others
+
+        Results are in files_to_convert order. Skipped files are not passed to the callback.
+        """
+        all_files = file_names if file_names is not None else self.files_to_convert
+        files_to_convert = all_files
+        manifest: Optional[ConversionManifest] = None
+        source_states: Dict[str, Tuple[int, int, str]] = dict()
+        skipped: Dict[str, FileResult] = dict()
+
+        if self.incremental:
+            manifest = ConversionManifest(self.source_folder, self.target_folder, self.manifest_parameters)
+            for file in files_to_convert:
+                try:
+                    source_states[file] = manifest.source_state(file)
+                except OSError:
+                    continue
+                if manifest.is_converted(file, source_states[file]):
+                    skipped[file] = FileResult(file, manifest.outputs(file), None, True)
+            files_to_convert = list(filter(lambda file: file not in skipped, files_to_convert))
+
+        if self.jobs > 1 and files_to_convert.__len__() > 1:
+            converted = self.convert_parallel(files_to_convert, file_status_callback, manifest, source_states)
+        else:
+            converted = self.convert_serial(files_to_convert, file_status_callback, manifest, source_states)
+
+        results: List[FileResult] = list()
+        converted_results = iter(converted)
+        for file in all_files:
+            results.append(skipped[file] if file in skipped else next(converted_results))
+
+        if self.report_folder is not None:
+            reports = list(map(lambda result: result.report, filter(lambda result: result.report is not None, results)))
+            failed_files = list(map(lambda result: result.file_name, filter(lambda result: result.error is not None, results)))
+            self.write_report("summary.json", summary_report(reports, failed_files))
+        return results
+
+    def watch(self, file_status_callback: FileStatusCallback, use_inotify: bool = True, debounce: float = DEFAULT_DEBOUNCE) -> Iterator[List[FileResult]]:
+        """Converts all files, then files which are added or changed, results of every conversion are yielded
+
+        Runs until it is interrupted. Watch starts before the first conversion, so files dropped meanwhile are not missed.
+        """
+        watcher = FolderWatcher(self.source_folder, self.is_source_file, debounce=debounce, use_inotify=use_inotify)
+        try:
+            yield self.convert(file_status_callback)
+            for file_names in watcher.changed_files():
+                yield self.convert(file_status_callback, file_names)
+        finally:
+            watcher.close()
 
-    def convert(self, file_status_callback: FileStatusCallback) -> List[str]:
-        files_to_convert = self.files_to_convert
+    def write_report(self, report_name: str, report: Dict[str, Any]):
+        Path(self.report_folder).mkdir(parents=True, exist_ok=True)
+        with open(os.path.join(self.report_folder, report_name), "wt") as report_file:
+            json.dump(report, report_file, indent=2)
 
+    def finish_file(self, result: FileResult, manifest: Optional[ConversionManifest], source_states: Dict[str, Tuple[int, int, str]]):
+        if result.report is not None:
+            self.write_report(result.file_name + ".json", result.report)
+
+        # Manifest line is written as soon as the file is done, so the next run continues after a stop
+        if manifest is None:
+            return
+        if result.error is None and result.file_name in source_states:
+            manifest.record(result.file_name, source_states[result.file_name], result.target_files)
+        else:
+            manifest.forget(result.file_name)
+
+    def convert_serial(self, files_to_convert: List[str], file_status_callback: FileStatusCallback, manifest: Optional[ConversionManifest], source_states: Dict[str, Tuple[int, int, str]]) -> List[FileResult]:
         files_count: int = files_to_convert.__len__()
+        results: List[FileResult] = list()
 
         for index, file in enumerate(files_to_convert):
             file_path = self.source_folder + "/" + file
             file_status_callback(file, file_path, [], False, index, files_count)
 
-            target_files = self.file_converter.convert(file)
+            target_files, error, _, _, report = convert_file(self.file_converter, file)
+            results.append(FileResult(file, target_files, error, report=report))
+            self.finish_file(results[-1], manifest, source_states)
 
             file_status_callback(file, file_path, target_files, True, index, files_count)
+
+        return results
+
+    def convert_parallel(self, files_to_convert: List[str], file_status_callback: FileStatusCallback, manifest: Optional[ConversionManifest], source_states: Dict[str, Tuple[int, int, str]]) -> List[FileResult]:
+        files_count: int = files_to_convert.__len__()
+        results: List[Optional[FileResult]] = [None] * files_count
+        offset_cache: Optional[OffsetCache] = self.converter_options['offset_cache']
+
+        # Largest files go first, so a long file does not start when others are done
+        order = sorted(range(files_count), key=lambda index: -self.file_size(files_to_convert[index]))
+
+        with ProcessPoolExecutor(max_workers=min(self.jobs, files_count), initializer=init_worker, initargs=(self.converter_options,)) as executor:
+            futures = dict()
+            for index in order:
+                file = files_to_convert[index]
+                futures[executor.submit(convert_file_in_worker, file)] = index
+                file_status_callback(file, self.source_folder + "/" + file, [], False, index, files_count)
+
+            for future in as_completed(futures):
+                index = futures[future]
+                file = files_to_convert[index]
+                try:
+                    target_files, error, hits, misses, report = future.result()
+                except BrokenProcessPool as exception:
+                    # Worker was killed, files it did not finish are failed
+                    target_files, error, hits, misses, report = ([], "Worker process stopped: {error}".format(error=exception), 0, 0, None)
+
+                if offset_cache is not None:
+                    offset_cache.hits += hits
+                    offset_cache.misses += misses
+
+                results[index] = FileResult(file, target_files, error, report=report)
+                self.finish_file(results[index], manifest, source_states)
+                file_status_callback(file, self.source_folder + "/" + file, target_files, True, index, files_count)
+
+        return results
+
+    def file_size(self, file_name: str) -> int:
+        try:
+            return os.path.getsize(os.path.join(self.source_folder, file_name))
+        except OSError:
+            return 0
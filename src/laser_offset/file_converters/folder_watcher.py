@@ -0,0 +1,216 @@
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# Files which were not written for this many seconds are ready
+DEFAULT_DEBOUNCE = 0.3
+
+# Seconds between folder scans without inotify
+DEFAULT_POLL_INTERVAL = 0.5
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+INOTIFY_EVENT = struct.Struct('iIII')
+INOTIFY_BUFFER_SIZE = 64 * 1024
+
+# Size and modification time, file is changed when they are changed
+FileStat = Tuple[int, int]
+
+
+class InotifyEvents:
+    """Names of files changed in one folder, read from Linux inotify through libc"""
+
+    file_descriptor: int
+
+    def __init__(self, folder: str) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.file_descriptor = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.file_descriptor < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.file_descriptor, os.fsencode(folder), INOTIFY_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.file_descriptor)
+            raise OSError(error, "inotify_add_watch failed")
+
+    def read(self, timeout: float) -> Optional[List[str]]:
+        """Waits for events up to timeout seconds, None when events were lost and the folder has to be scanned"""
+
+        readable, _, _ = select.select([self.file_descriptor], [], [], timeout)
+        if readable.__len__() == 0:
+            return []
+
+        try:
+            data = os.read(self.file_descriptor, INOTIFY_BUFFER_SIZE)
+        except BlockingIOError:
+            return []
+
+        names: List[str] = list()
+        offset = 0
+        while offset < data.__len__():
+            _, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            if mask & IN_Q_OVERFLOW:
+                return None
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+            if name != '' and name not in names:
+                names.append(name)
+        return names
+
+    def close(self):
+        os.close(self.file_descriptor)
+
+
+class FolderWatcher:
+    """Finds files which were added or changed in folder, with inotify when it is available or by scanning the folder
+
+    File is ready when its size and modification time were not changed for debounce seconds,
+    so files which are still copied are not read.
+    """
+
+    folder: str
+    file_filter: Callable[[str], bool]
+    debounce: float
+    poll_interval: float
+
+    # Files which were there at start or were reported
+    known: Dict[str, FileStat]
+    # Changed files with the time of the last change
+    pending: Dict[str, Tuple[FileStat, float]]
+
+    inotify: Optional[InotifyEvents]
+
+    def __init__(self,
+        folder: str,
+        file_filter: Callable[[str], bool],
+        debounce: float = DEFAULT_DEBOUNCE,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        use_inotify: bool = True
+        ) -> None:
+
+        self.folder = folder
+        self.file_filter = file_filter
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.pending = dict()
+
+        self.inotify = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self.inotify = InotifyEvents(folder)
+            except (OSError, AttributeError):
+                # Polling is used without libc inotify functions or when watches are exhausted
+                self.inotify = None
+
+        self.known = self.scan()
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self.inotify is not None
+
+    def file_stat(self, file_name: str) -> Optional[FileStat]:
+        try:
+            stat = os.stat(os.path.join(self.folder, file_name))
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def scan(self) -> Dict[str, FileStat]:
+        result: Dict[str, FileStat] = dict()
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not self.file_filter(entry.name):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                result[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return result
+
+    def mark_changed(self, file_name: str, stat: Optional[FileStat], now: float):
+        if stat is None:
+            self.pending.pop(file_name, None)
+            self.known.pop(file_name, None)
+            return
+
+        pending = self.pending.get(file_name)
+        if pending is not None:
+            if pending[0] != stat:
+                self.pending[file_name] = (stat, now)
+        elif self.known.get(file_name) != stat:
+            self.pending[file_name] = (stat, now)
+
+    def wait_for_changes(self, timeout: float):
+        if self.inotify is not None:
+            names = self.inotify.read(timeout)
+            now = time.monotonic()
+            if names is not None:
+                for name in names:
+                    if self.file_filter(name):
+                        self.mark_changed(name, self.file_stat(name), now)
+                return
+        else:
+            time.sleep(timeout)
+            now = time.monotonic()
+
+        files = self.scan()
+        for name in list(self.known.keys()):
+            if name not in files:
+                self.known.pop(name)
+        for name, stat in files.items():
+            self.mark_changed(name, stat, now)
+
+    def ready_files(self) -> List[str]:
+        now = time.monotonic()
+        result: List[str] = list()
+        for name, (stat, changed) in list(self.pending.items()):
+            if now - changed < self.debounce:
+                continue
+            current = self.file_stat(name)
+            if current is None:
+                self.pending.pop(name)
+            elif current != stat:
+                self.pending[name] = (current, now)
+            else:
+                self.pending.pop(name)
+                self.known[name] = stat
+                result.append(name)
+        return sorted(result)
+
+    def changed_files(self) -> Iterator[List[str]]:
+        """Endless lists of ready files, in name order"""
+
+        while True:
+            if self.pending.__len__() > 0:
+                now = time.monotonic()
+                timeout = max(0, min(map(lambda pending: pending[1] + self.debounce - now, self.pending.values())))
+                if self.inotify is None:
+                    timeout = min(timeout, self.poll_interval)
+            else:
+                timeout = self.poll_interval
+
+            self.wait_for_changes(timeout)
+            ready = self.ready_files()
+            if ready.__len__() > 0:
+                yield ready
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
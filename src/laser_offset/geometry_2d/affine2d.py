@@ -0,0 +1,130 @@
+from typing import Tuple
+
+import math
+
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.vector2d import Vector2d
+from laser_offset.math.float_functions import fzero
+
+
+class Affine2d:
+    """Affine transform, same as SVG matrix(a b c d e f)
+
+    x' = a * x + c * y + e
+    y' = b * x + d * y + f
+    """
+
+    a: float
+    b: float
+    c: float
+    d: float
+    e: float
+    f: float
+
+    def __init__(self, a: float, b: float, c: float, d: float, e: float, f: float) -> None:
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+        self.e = e
+        self.f = f
+
+    @classmethod
+    def identity(cls) -> 'Affine2d':
+        return Affine2d(1, 0, 0, 1, 0, 0)
+
+    @classmethod
+    def translate(cls, tx: float, ty: float) -> 'Affine2d':
+        return Affine2d(1, 0, 0, 1, tx, ty)
+
+    @classmethod
+    def scale(cls, sx: float, sy: float) -> 'Affine2d':
+        return Affine2d(sx, 0, 0, sy, 0, 0)
+
+    @classmethod
+    def rotate(cls, angle: float, cx: float = 0, cy: float = 0) -> 'Affine2d':
+        cos_a = math.cos(angle)
+        sin_a = math.sin(angle)
+        rotation = Affine2d(cos_a, sin_a, -sin_a, cos_a, 0, 0)
+        if cx == 0 and cy == 0:
+            return rotation
+        return Affine2d.translate(cx, cy).multiply(rotation).multiply(Affine2d.translate(-cx, -cy))
+
+    @classmethod
+    def skewX(cls, angle: float) -> 'Affine2d':
+        return Affine2d(1, 0, math.tan(angle), 1, 0, 0)
+
+    @classmethod
+    def skewY(cls, angle: float) -> 'Affine2d':
+        return Affine2d(1, math.tan(angle), 0, 1, 0, 0)
+
+    # Transform which applies another one first, then this one
+    def multiply(self, another: 'Affine2d') -> 'Affine2d':
+        return Affine2d(
+            self.a * another.a + self.c * another.b,
+            self.b * another.a + self.d * another.b,
+            self.a * another.c + self.c * another.d,
+            self.b * another.c + self.d * another.d,
+            self.a * another.e + self.c * another.f + self.e,
+            self.b * another.e + self.d * another.f + self.f
+        )
+
+    @property
+    def isIdentity(self) -> bool:
+        return self.a == 1 and self.b == 0 and self.c == 0 and self.d == 1 and self.e == 0 and self.f == 0
+
+    @property
+    def determinant(self) -> float:
+        return self.a * self.d - self.b * self.c
+
+    # Keeps circles as circles, only rotates, reflects, moves and scales evenly
+    @property
+    def isSimilarity(self) -> bool:
+        return (fzero(self.a - self.d) and fzero(self.b + self.c)) or (fzero(self.a + self.d) and fzero(self.b - self.c))
+
+    @property
+    def isAxisAligned(self) -> bool:
+        return self.b == 0 and self.c == 0
+
+    @property
+    def scaleFactor(self) -> float:
+        return math.sqrt(abs(self.determinant))
+
+    @property
+    def rotation(self) -> float:
+        return math.atan2(self.b, self.a)
+
+    def applyToPoint(self, point: Point2d) -> Point2d:
+        return Point2d.cartesian(self.a * point.x + self.c * point.y + self.e, self.b * point.x + self.d * point.y + self.f)
+
+    def applyToVector(self, vector: Vector2d) -> Vector2d:
+        return Vector2d.cartesian(self.a * vector.dx + self.c * vector.dy, self.b * vector.dx + self.d * vector.dy)
+
+    def applyToEllipse(self, rx: float, ry: float, angle: float) -> Tuple[float, float, float]:
+        """Radiuses and rotation of ellipse after transform
+
+        Ellipse is transform of unit circle by rotate(angle) * scale(rx, ry),
+        new radiuses are singular values of that transform after this one.
+        """
+
+        cos_a = math.cos(angle)
+        sin_a = math.sin(angle)
+
+        # Columns are transformed ellipse axes
+        m11 = (self.a * cos_a + self.c * sin_a) * rx
+        m21 = (self.b * cos_a + self.d * sin_a) * rx
+        m12 = (-self.a * sin_a + self.c * cos_a) * ry
+        m22 = (-self.b * sin_a + self.d * cos_a) * ry
+
+        # Eigenvalues of M * M^T are squares of radiuses
+        p = m11 * m11 + m12 * m12
+        q = m11 * m21 + m12 * m22
+        r = m21 * m21 + m22 * m22
+
+        half_sum = (p + r) / 2
+        half_difference = math.sqrt(((p - r) / 2) ** 2 + q ** 2)
+        new_rx = math.sqrt(half_sum + half_difference)
+        new_ry = math.sqrt(max(half_sum - half_difference, 0))
+        new_angle = math.atan2(2 * q, p - r) / 2
+
+        return (new_rx, new_ry, new_angle)
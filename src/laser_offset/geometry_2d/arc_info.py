@@ -4,6 +4,9 @@ from laser_offset.geometry_2d.size2d import Size2d
 from typing import NamedTuple
 import math
 
+# Number of ArcInfo.fromArc solves, arcs cache their ArcInfo so it should stay close to number of arcs
+solved_arcs: int = 0
+
 class ArcInfo(NamedTuple):
     center: Point2d
     startAngle: float
@@ -25,6 +28,9 @@ class ArcInfo(NamedTuple):
     
     def fromArc(start_point: Point2d, end_point: Point2d, radius: float, large_arc: bool, cw_direction: bool) -> 'ArcInfo':
 
+        global solved_arcs
+        solved_arcs += 1
+
         def radian(ux: float, uy: float, vx: float, vy: float):
             dot: float = ux * vx + uy * vy
             mod: float = math.sqrt( ( ux * ux + uy * uy ) * ( vx * vx + vy * vy ) )
@@ -7,8 +7,9 @@ from typing import List, Optional
 
 from laser_offset.geometry_2d.normalize_angle import normalize_angle
 from laser_offset.math.float_functions import fclose
-from laser_offset.geometry_2d.shapes_2d.path2d import Arc
+from laser_offset.geometry_2d.shapes_2d.path2d import SimpleArc
 from laser_offset.geometry_2d.arc_info import ArcInfo
+from laser_offset.geometry_2d.bounds_rect_2d import BoundsRect2d
 
 class ArcSegment2d:
 
@@ -23,6 +24,8 @@ class ArcSegment2d:
 
     clockwise: bool
 
+    cached_angle_range: Optional[AngleRange]
+
     def __init__(self, center: Point2d, radius: float, start_angle: float, end_angle: float, clockwise: bool) -> None:
         self.center = center
         self.radius = radius
@@ -31,12 +34,19 @@ class ArcSegment2d:
         self.start = self.center + Vector2d.polar(radius, self.start_angle)
         self.end = self.center + Vector2d.polar(radius, self.end_angle)
         self.clockwise = clockwise
+        self.cached_angle_range = None
         
     @classmethod
-    def fromArc(cls, prev_point: Point2d, arc: Arc) -> 'ArcSegment2d':
-        arcinfo = ArcInfo.fromArc(prev_point, arc.target, arc.radius, arc.large_arc, arc.cw_direction)
+    def fromArc(cls, prev_point: Point2d, arc: SimpleArc) -> 'ArcSegment2d':
+        arcinfo = arc.arcInfo(prev_point)
         return ArcSegment2d(arcinfo.center, arc.radius, arcinfo.startAngle, arcinfo.endAngle, arcinfo.cw)
 
+    @property
+    def angle_range(self) -> AngleRange:
+        if self.cached_angle_range is None:
+            self.cached_angle_range = AngleRange(self.start_angle, self.end_angle, self.clockwise)
+        return self.cached_angle_range
+
     @property
     def delta_angle(self) -> float:
         return normalize_angle(self.end_angle - self.start_angle)
@@ -45,10 +55,48 @@ class ArcSegment2d:
     def length(self) -> float:
         return self.radius * self.delta_angle
 
+    @property
+    def maxBoundary(self) -> BoundsRect2d:
+        # Same angle ranges as is_point_in_segment, so every accepted point lies inside
+        rng: AngleRange = self.angle_range
+        angles: List[float] = list()
+        for angle_range in rng.angle_ranges:
+            angles += [angle_range[0], angle_range[1]]
+        for quadrant in range(4):
+            angle = quadrant * math.pi / 2
+            if rng.has_angle(angle):
+                angles.append(angle)
+
+        return self.bounds_for_angles(angles)
+
+    @property
+    def monotoneBounds(self) -> List[BoundsRect2d]:
+        # Arc is split at 0 and pi, so every piece is x-monotone
+        rng: AngleRange = self.angle_range
+        result: List[BoundsRect2d] = list()
+        for start_angle, end_angle in rng.angle_ranges:
+            cuts = [start_angle] + ([math.pi] if start_angle < math.pi < end_angle else []) + [end_angle]
+            for piece_start, piece_end in zip(cuts, cuts[1:]):
+                angles = [piece_start, piece_end]
+                for angle in [math.pi / 2, 3 * math.pi / 2]:
+                    if piece_start < angle < piece_end:
+                        angles.append(angle)
+                result.append(self.bounds_for_angles(angles))
+
+        return result
+
+    def bounds_for_angles(self, angles: List[float]) -> BoundsRect2d:
+        xs = list(map(lambda angle: self.center.x + self.radius * math.cos(angle), angles))
+        ys = list(map(lambda angle: self.center.y + self.radius * math.sin(angle), angles))
+
+        # has_angle compares angles with tolerance
+        margin = abs(self.radius) * 1e-5
+        return BoundsRect2d(min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin)
+
     def is_point_in_segment(self, point: 'Point2d') -> bool:
             cp = Vector2d.fromTwoPoints(self.center, point)
 
-            rng: AngleRange = AngleRange(self.start_angle, self.end_angle, self.clockwise)
+            rng: AngleRange = self.angle_range
             return rng.has_angle(cp.da)
     
     def intersection(self, another) -> List[Point2d]:
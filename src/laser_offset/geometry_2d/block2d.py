@@ -0,0 +1,37 @@
+from typing import List, Optional
+
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.bounds_rect_2d import BoundsRect2d
+
+
+class Block2d:
+    """Shapes shared by several placements, like DXF block definition
+
+    Coordinates are relative to block base point.
+    """
+
+    name: str
+    shapes: List[Shape2d]
+
+    cached_boundary: Optional[BoundsRect2d]
+
+    def __init__(self, name: str, shapes: List[Shape2d]) -> None:
+        self.name = name
+        self.shapes = shapes
+        self.cached_boundary = None
+
+    @property
+    def maxBoundary(self) -> BoundsRect2d:
+        if self.cached_boundary is None:
+            minX = 10000
+            minY = 10000
+            maxX = -10000
+            maxY = -10000
+            for shape in self.shapes:
+                bounds = shape.maxBoundary
+                minX = min(minX, bounds.minX)
+                minY = min(minY, bounds.minY)
+                maxX = max(maxX, bounds.maxX)
+                maxY = max(maxY, bounds.maxY)
+            self.cached_boundary = BoundsRect2d(minX, minY, maxX, maxY)
+        return self.cached_boundary
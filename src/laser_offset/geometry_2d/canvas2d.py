@@ -1,63 +1,113 @@
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
+import math
+
 from laser_offset.geometry_2d.point2d import Point2d
 from laser_offset.geometry_2d.size2d import Size2d
 from laser_offset.geometry_2d.shape2d import Shape2d
 from laser_offset.geometry_2d.shapes_2d.path2d import Path2d, Arc, SimpleArc, Line
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d
 from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
 from laser_offset.geometry_2d.shapes_2d.arc2d import Arc2d
+from laser_offset.geometry_2d.shapes_2d.block_reference2d import BlockReference2d
+from laser_offset.geometry_2d.block2d import Block2d
 
 from laser_offset.geometry_2d.bounds_rect_2d import BoundsRect2d
 
-# Converts list of shapes to shape chains
-def prepareShapes(shapes: List[Shape2d]) -> List[List[Shape2d]]:
-    return list(map(lambda shape: [shape], shapes))
+# Chain ends closer than this are joined, same tolerance as Point2d.eq
+CHAIN_TOLERANCE = 1e-5
 
-# Finds next shape in chain if possible
-def mergeIteration(shapes: List[List[Shape2d]]) -> Tuple[List[List[Shape2d]], bool]:
-    parsed_shapes = list()
-    result = list()
-    has_merged_shapes: bool = False
-    for index, shape in enumerate(shapes):
-        for secondShape in shapes[index+1:]:
-            
-            end_point = shape[-1].end
-            start_point = secondShape[0].start
-            start_point_inv = secondShape[-1].end
-            
-            if shape in parsed_shapes or secondShape in parsed_shapes:
-                continue
-            
-            if end_point.eq(start_point):
-                # # print(shape[-1].index, end_point, ' <-> ', start_point, secondShape[0].index)
-                parsed_shapes.append(shape)
-                parsed_shapes.append(secondShape)
-                result.append(shape+secondShape)
-                has_merged_shapes = True
-                
-            elif end_point.eq(start_point_inv):
-                # print(shape[-1].index, end_point, ' <-> ', start_point_inv, secondShape[0].index, ' I')
-                parsed_shapes.append(shape)
-                parsed_shapes.append(secondShape)
-                
-                secondShapeRev = secondShape.copy()
-                secondShapeRev.reverse()
-                
-                result.append(shape+list(map(lambda ll: ll.inverse, secondShapeRev)))
-                
-                has_merged_shapes = True
-                
-        if not shape in parsed_shapes:
-            parsed_shapes.append(shape)
-            result.append(shape)
+class EndpointGrid:
+    """Start and end points of shapes in hash grid with cells of tolerance size
+
+    Points within tolerance are always in the same or neighbour cells.
+    Cell lists are filled in shape order, so the first match is the earliest unused shape.
+    """
+
+    shapes: List[Shape2d]
+    used: List[bool]
+    cells: Dict[Tuple[int, int], List[Tuple[int, bool]]]
+
+    def __init__(self, shapes: List[Shape2d]) -> None:
+        self.shapes = shapes
+        self.used = [False] * shapes.__len__()
+        self.cells = dict()
+        for index, shape in enumerate(shapes):
+            self.cells.setdefault(self.cell(shape.start), []).append((index, False))
+            self.cells.setdefault(self.cell(shape.end), []).append((index, True))
+
+    def cell(self, point: Point2d) -> Tuple[int, int]:
+        return (math.floor(point.x / CHAIN_TOLERANCE), math.floor(point.y / CHAIN_TOLERANCE))
+
+    # Finds earliest unused shape with start or end at point, returns its index and True for end
+    def find(self, point: Point2d) -> Optional[Tuple[int, bool]]:
+        cell_x, cell_y = self.cell(point)
+        result: Optional[Tuple[int, bool]] = None
+        for x in range(cell_x - 1, cell_x + 2):
+            for y in range(cell_y - 1, cell_y + 2):
+                for index, is_end in self.cells.get((x, y), []):
+                    if self.used[index] or (result is not None and result[0] <= index):
+                        continue
+                    shape = self.shapes[index]
+                    if point.eq(shape.end if is_end else shape.start):
+                        result = (index, is_end)
+                        break
+        return result
+
+# Joins shapes into chains by matching ends, returns chains and number of chains which are not closed
+def chainShapes(shapes: List[Shape2d]) -> Tuple[List[List[Shape2d]], int]:
+    grid = EndpointGrid(shapes)
+    result: List[List[Shape2d]] = list()
+    open_chains = 0
 
-    return (result, has_merged_shapes)
+    for index, shape in enumerate(shapes):
+        if grid.used[index]:
+            continue
+        grid.used[index] = True
+        chain = [shape]
+
+        # Packed contour can end at its own start
+        closed = isinstance(shape, PackedPath2d) and shape.end.eq(shape.start)
+        while not closed:
+            found = grid.find(chain[-1].end)
+            if found is None:
+                break
+            next_index, is_end = found
+            grid.used[next_index] = True
+            chain.append(shapes[next_index].inverse if is_end else shapes[next_index])
+            closed = chain[-1].end.eq(chain[0].start)
+
+        # Open chain is continued backwards from its start
+        head: List[Shape2d] = list()
+        while not closed:
+            first = head[-1] if head.__len__() > 0 else chain[0]
+            found = grid.find(first.start)
+            if found is None:
+                break
+            prev_index, is_end = found
+            grid.used[prev_index] = True
+            head.append(shapes[prev_index] if is_end else shapes[prev_index].inverse)
+            closed = head[-1].start.eq(chain[-1].end)
+
+        if head.__len__() > 0:
+            head.reverse()
+            chain = head + chain
+
+        if not closed and not chain[-1].end.eq(chain[0].start):
+            open_chains += 1
+        result.append(chain)
+
+    return (result, open_chains)
 
 # Mergest list of chains into Paths list
 def mergeShapes(shapes: List[List[Shape2d]]) -> List[Path2d]:
     result = list()
     
     for chain in shapes:
-        result.append(Path2d.pathFromShapes(chain))
+        # Chains with packed paths stay packed
+        if any(map(lambda shape: isinstance(shape, PackedPath2d), chain)):
+            result.append(PackedPath2d.fromShapes(chain))
+        else:
+            result.append(Path2d.pathFromShapes(chain))
     
     return result 
 
@@ -76,6 +126,15 @@ def extractPathsFromShapes(shapes: List[Shape2d]) -> Tuple[List[Shape2d], List[S
                 result.append(shape)
             else:
                 shapes_to_merge += extractComponentsFromPath(path2d)
+        elif isinstance(shape, PackedPath2d):
+            packed_path: PackedPath2d = shape
+            if packed_path.isClosed:
+                result.append(shape)
+            elif packed_path.isContour:
+                # Open contour is merged as one piece
+                shapes_to_merge.append(shape)
+            else:
+                shapes_to_merge += extractComponentsFromPath(packed_path.toPath2d())
         else:
             result.append(shape)
                 
@@ -87,7 +146,7 @@ def extractComponentsFromPath(path: Path2d) -> List[Shape2d]:
     for component in path.components:
         if isinstance(component, SimpleArc):
             arc: SimpleArc = component
-            result.append(Arc2d(path.style, current_point, arc.target, Size2d(arc.radius, arc.radius), 0, arc.large_arc, arc.cw_direction))
+            result.append(Arc2d(path.style, current_point, arc.target, Size2d(arc.radius, arc.radius), 0, arc.large_arc, not arc.cw_direction))
             current_point = arc.target
 
         elif isinstance(component, Arc):
@@ -106,19 +165,38 @@ def extractComponentsFromPath(path: Path2d) -> List[Shape2d]:
 
 # Looks at list of shapes to extract path elements for merge
 def joinShapesToPathShapes(shapes: List[Shape2d]) -> List[Shape2d]:
+    result, _ = joinShapesToPathShapesWithOpenChains(shapes)
+    return result
+
+def joinShapesToPathShapesWithOpenChains(shapes: List[Shape2d], joined_blocks: Optional[Dict[Block2d, Tuple[Block2d, int]]] = None) -> Tuple[List[Shape2d], int]:
     (shapes_to_merge, other_shapes) = extractPathsFromShapes(shapes)
-    
-    prepared_shapes = prepareShapes(shapes_to_merge)
-    end: bool = False
-    current_shapes = prepared_shapes.copy()
-
-    while not end:
-        current_shapes, has_merged_shapes = mergeIteration(current_shapes)
-        end = not has_merged_shapes
-        
-    result_paths = mergeShapes(current_shapes)
-    
-    return other_shapes + result_paths
+    chains, open_chains = chainShapes(shapes_to_merge)
+    result_paths = mergeShapes(chains)
+    other_shapes, block_open_chains = joinBlockReferences(other_shapes, joined_blocks if joined_blocks is not None else dict())
+    return (other_shapes + result_paths, open_chains + block_open_chains)
+
+# Joins shapes of every block once, references are moved to joined blocks
+def joinBlockReferences(shapes: List[Shape2d], joined_blocks: Dict[Block2d, Tuple[Block2d, int]]) -> Tuple[List[Shape2d], int]:
+    result: List[Shape2d] = list()
+    open_chains = 0
+    for shape in shapes:
+        if not isinstance(shape, BlockReference2d):
+            result.append(shape)
+            continue
+
+        if shape.block not in joined_blocks:
+            block_shapes, block_open_chains = joinShapesToPathShapesWithOpenChains(shape.block.shapes, joined_blocks)
+            joined_blocks[shape.block] = (Block2d(shape.block.name, block_shapes), block_open_chains)
+
+        joined_block, block_open_chains = joined_blocks[shape.block]
+        result.append(BlockReference2d(shape.style, joined_block, shape.transform))
+        open_chains += block_open_chains
+    return (result, open_chains)
+
+# Canvas bounds for shapes bounds, with 5% margin of the longer side
+def boundsWithMargin(minX: float, minY: float, maxX: float, maxY: float) -> BoundsRect2d:
+    s = max(maxX - minX, maxY - minY) * 0.05
+    return BoundsRect2d(minX - s, minY - s, maxX + s, maxY + s)
 
 class Canvas2d:
 
@@ -126,6 +204,9 @@ class Canvas2d:
     size: Size2d
     shapes: List[Shape2d]
 
+    # Chains which were left not closed by cobineShapesToPaths
+    open_chains: int = 0
+
     def __init__(self, center: Point2d, size: Size2d, shapes: List[Shape2d]) -> None:
         self.center = center
         self.size = size
@@ -148,8 +229,7 @@ class Canvas2d:
             minY = min(minY, bounds.minY)
             maxX = max(maxX, bounds.maxX)
             maxY = max(maxY, bounds.maxY)
-        s = max(maxX - minX, maxY - minY) * 0.05
-        return BoundsRect2d(minX - s, minY - s, maxX + s, maxY + s)
+        return boundsWithMargin(minX, minY, maxX, maxY)
 
     def updateCenterAndSizeFromBounds(self) -> 'Canvas2d':
         bounds = self.maxBoundary
@@ -159,5 +239,7 @@ class Canvas2d:
                         )
     
     def cobineShapesToPaths(self) -> 'Canvas2d':
-        shapes = joinShapesToPathShapes(self.shapes)
-        return Canvas2d(self.center, self.size, shapes)        
\ No newline at end of file
+        shapes, open_chains = joinShapesToPathShapesWithOpenChains(self.shapes)
+        canvas = Canvas2d(self.center, self.size, shapes)
+        canvas.open_chains = open_chains
+        return canvas        
\ No newline at end of file
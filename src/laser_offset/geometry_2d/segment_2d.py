@@ -2,6 +2,7 @@ from laser_offset.geometry_2d.point2d import Point2d
 import math
 
 from laser_offset.geometry_2d.vector2d import Vector2d
+from laser_offset.geometry_2d.bounds_rect_2d import BoundsRect2d
 from typing import List, Optional
 
 class Segment2d:
@@ -17,6 +18,17 @@ class Segment2d:
     def length(self) -> float:
         return math.sqrt((self.end.x - self.start.x) ** 2 + (self.end.y - self.start.y) ** 2)
 
+    @property
+    def maxBoundary(self) -> BoundsRect2d:
+        return BoundsRect2d(min(self.start.x, self.end.x),
+                            min(self.start.y, self.end.y),
+                            max(self.start.x, self.end.x),
+                            max(self.start.y, self.end.y))
+
+    @property
+    def monotoneBounds(self) -> List[BoundsRect2d]:
+        return [self.maxBoundary]
+
     def is_point_on_segment(self, point: Point2d) -> bool:
         start_dist = self.start.distance(point)
         end_dist = self.end.distance(point)
@@ -0,0 +1,205 @@
+from typing import List
+
+from laser_offset.geometry_2d.affine2d import Affine2d
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.size2d import Size2d
+from laser_offset.geometry_2d.vector2d import Vector2d
+from laser_offset.geometry_2d.shapes_2d.arc2d import Arc2d
+from laser_offset.geometry_2d.shapes_2d.block_reference2d import BlockReference2d
+from laser_offset.geometry_2d.shapes_2d.circle2d import Circle2d
+from laser_offset.geometry_2d.shapes_2d.ellipse2d import Ellipse2d
+from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d
+from laser_offset.geometry_2d.shapes_2d.path2d import Arc, ClosePath, CubicBezier, HorizontalLine, Line, MoveOrigin, Path2d, PathComponent, Quadratic, ReflectedQuadratic, RelArc, RelCubicBezier, RelHorizontalLine, RelLine, RelMoveOrigin, RelQuadratic, RelReflectedQuadratic, RelSimpleArc, RelStrugBezier, RelVerticalLine, SimpleArc, StrugBezier, VerticalLine
+from laser_offset.geometry_2d.shapes_2d.polygon2d import Polygon2d
+from laser_offset.geometry_2d.shapes_2d.polyline2d import Polyline2d
+from laser_offset.geometry_2d.shapes_2d.rect2d import Rect2d
+
+
+# Shape in coordinates given by transform, circles and arcs become elliptic when transform is not similarity
+def transform_shape(shape: Shape2d, transform: Affine2d) -> Shape2d:
+    if transform.isIdentity:
+        return shape
+
+    if isinstance(shape, Line2d):
+        return Line2d(shape.style, transform.applyToPoint(shape.start), transform.applyToPoint(shape.end))
+
+    elif isinstance(shape, Circle2d):
+        if transform.isSimilarity:
+            return Circle2d(shape.style, transform.applyToPoint(shape.centerPoint), shape.radius * transform.scaleFactor)
+        rx, ry, angle = transform.applyToEllipse(shape.radius, shape.radius, 0)
+        return Ellipse2d(shape.style, transform.applyToPoint(shape.centerPoint), Size2d(rx, ry), angle)
+
+    elif isinstance(shape, Ellipse2d):
+        rx, ry, angle = transform.applyToEllipse(shape.radiuses.width, shape.radiuses.height, shape.angle)
+        return Ellipse2d(shape.style, transform.applyToPoint(shape.centerPoint), Size2d(rx, ry), angle)
+
+    elif isinstance(shape, Rect2d):
+        if transform.isAxisAligned and shape.corner_radius == 0:
+            left_top = transform.applyToPoint(shape.left_top)
+            right_bottom = transform.applyToPoint(shape.right_bottom)
+            return Rect2d(shape.style,
+                          Point2d.cartesian(min(left_top.x, right_bottom.x), min(left_top.y, right_bottom.y)),
+                          Point2d.cartesian(max(left_top.x, right_bottom.x), max(left_top.y, right_bottom.y)))
+        return transform_path(rect_to_path(shape), transform)
+
+    elif isinstance(shape, Polyline2d):
+        return Polyline2d(shape.style, list(map(transform.applyToPoint, shape.points)))
+
+    elif isinstance(shape, Polygon2d):
+        return Polygon2d(shape.style, list(map(transform.applyToPoint, shape.points)))
+
+    elif isinstance(shape, Path2d):
+        return transform_path(shape, transform)
+
+    elif isinstance(shape, PackedPath2d):
+        path = transform_path(shape.toPath2d(), transform)
+        return PackedPath2d.fromPath2d(path) if PackedPath2d.canPack(path) else path
+
+    elif isinstance(shape, Arc2d):
+        return transform_arc2d(shape, transform)
+
+    elif isinstance(shape, BlockReference2d):
+        return BlockReference2d(shape.style, shape.block, transform.multiply(shape.transform))
+
+    return shape
+
+
+def transform_arc2d(arc: Arc2d, transform: Affine2d) -> Arc2d:
+    # Mirroring changes arc direction
+    sweep = not arc.sweep_flat if transform.determinant < 0 else arc.sweep_flat
+    if transform.isSimilarity:
+        radiuses = Size2d(arc.radiuses.width * transform.scaleFactor, arc.radiuses.height * transform.scaleFactor)
+        angle = arc.angle
+    else:
+        rx, ry, angle = transform.applyToEllipse(arc.radiuses.width, arc.radiuses.height, 0)
+        radiuses = Size2d(rx, ry)
+    return Arc2d(arc.style, transform.applyToPoint(arc.start), transform.applyToPoint(arc.end), radiuses, angle, arc.large_arc, sweep)
+
+
+def rect_to_path(rect: Rect2d) -> Path2d:
+    x1 = rect.left_top.x
+    y1 = rect.left_top.y
+    x2 = rect.right_bottom.x
+    y2 = rect.right_bottom.y
+    r = min(rect.corner_radius, (x2 - x1) / 2, (y2 - y1) / 2)
+
+    if r <= 0:
+        return Path2d(rect.style, [
+            MoveOrigin(Point2d.cartesian(x1, y1)),
+            Line(Point2d.cartesian(x2, y1)),
+            Line(Point2d.cartesian(x2, y2)),
+            Line(Point2d.cartesian(x1, y2)),
+            ClosePath()
+        ])
+
+    # Same corners as SVG rect with rx, arcs have sweep flag 1
+    return Path2d(rect.style, [
+        MoveOrigin(Point2d.cartesian(x1 + r, y1)),
+        Line(Point2d.cartesian(x2 - r, y1)),
+        SimpleArc(Point2d.cartesian(x2, y1 + r), r, False, False),
+        Line(Point2d.cartesian(x2, y2 - r)),
+        SimpleArc(Point2d.cartesian(x2 - r, y2), r, False, False),
+        Line(Point2d.cartesian(x1 + r, y2)),
+        SimpleArc(Point2d.cartesian(x1, y2 - r), r, False, False),
+        Line(Point2d.cartesian(x1, y1 + r)),
+        SimpleArc(Point2d.cartesian(x1 + r, y1), r, False, False),
+        ClosePath()
+    ])
+
+
+def transform_path(path: Path2d, transform: Affine2d) -> Path2d:
+    """Transformed path with absolute components only
+
+    Relative components depend on the previous point, so it is tracked in source coordinates.
+    """
+
+    components: List[PathComponent] = list()
+    current = Point2d.cartesian(0, 0)
+    subpath_start = current
+
+    def relative(vector: Vector2d) -> Point2d:
+        return Point2d.cartesian(current.x + vector.dx, current.y + vector.dy)
+
+    for component in path.components:
+        if isinstance(component, MoveOrigin) or isinstance(component, RelMoveOrigin):
+            current = component.target if isinstance(component, MoveOrigin) else relative(component.target)
+            subpath_start = current
+            components.append(MoveOrigin(transform.applyToPoint(current)))
+            continue
+
+        elif isinstance(component, ClosePath):
+            current = subpath_start
+            components.append(ClosePath())
+            continue
+
+        elif isinstance(component, Line) or isinstance(component, RelLine):
+            target = component.target if isinstance(component, Line) else relative(component.target)
+            components.append(Line(transform.applyToPoint(target)))
+
+        elif isinstance(component, HorizontalLine) or isinstance(component, RelHorizontalLine):
+            target = Point2d.cartesian(component.length if isinstance(component, HorizontalLine) else current.x + component.length, current.y)
+            components.append(Line(transform.applyToPoint(target)))
+
+        elif isinstance(component, VerticalLine) or isinstance(component, RelVerticalLine):
+            target = Point2d.cartesian(current.x, component.length if isinstance(component, VerticalLine) else current.y + component.length)
+            components.append(Line(transform.applyToPoint(target)))
+
+        elif isinstance(component, CubicBezier):
+            target = component.target
+            components.append(CubicBezier(
+                transform.applyToPoint(target),
+                transform.applyToPoint(component.startControlPoint),
+                transform.applyToPoint(component.endControlPoint)))
+
+        elif isinstance(component, RelCubicBezier):
+            target = relative(component.target)
+            components.append(CubicBezier(
+                transform.applyToPoint(target),
+                transform.applyToPoint(relative(component.startControlPoint)),
+                transform.applyToPoint(relative(component.endControlPoint))))
+
+        # Reflected control points stay reflected after affine transform
+        elif isinstance(component, StrugBezier) or isinstance(component, RelStrugBezier):
+            is_absolute = isinstance(component, StrugBezier)
+            target = component.target if is_absolute else relative(component.target)
+            control_point = component.endControlPoint if is_absolute else relative(component.endControlPoint)
+            components.append(StrugBezier(transform.applyToPoint(target), transform.applyToPoint(control_point)))
+
+        elif isinstance(component, Quadratic) or isinstance(component, RelQuadratic):
+            is_absolute = isinstance(component, Quadratic)
+            target = component.target if is_absolute else relative(component.target)
+            control_point = component.controlPoint if is_absolute else relative(component.controlPoint)
+            components.append(Quadratic(transform.applyToPoint(target), transform.applyToPoint(control_point)))
+
+        elif isinstance(component, ReflectedQuadratic) or isinstance(component, RelReflectedQuadratic):
+            target = component.target if isinstance(component, ReflectedQuadratic) else relative(component.target)
+            components.append(ReflectedQuadratic(transform.applyToPoint(target)))
+
+        elif isinstance(component, SimpleArc) or isinstance(component, RelSimpleArc):
+            target = component.target if isinstance(component, SimpleArc) else relative(component.target)
+            components.append(transform_arc(transform, target, component.radius, component.radius, 0, component.large_arc, not component.cw_direction))
+
+        elif isinstance(component, Arc) or isinstance(component, RelArc):
+            target = component.target if isinstance(component, Arc) else relative(component.target)
+            components.append(transform_arc(transform, target, component.radiuses.width, component.radiuses.height, component.angle, component.large_arc, component.sweep))
+
+        else:
+            continue
+
+        current = target
+
+    return Path2d(path.style, components)
+
+
+def transform_arc(transform: Affine2d, target: Point2d, rx: float, ry: float, angle: float, large_arc: bool, sweep: bool) -> PathComponent:
+    # Mirroring changes arc direction
+    if transform.determinant < 0:
+        sweep = not sweep
+
+    if rx == ry and transform.isSimilarity:
+        return SimpleArc(transform.applyToPoint(target), rx * transform.scaleFactor, not sweep, large_arc)
+
+    new_rx, new_ry, new_angle = transform.applyToEllipse(rx, ry, angle)
+    return Arc(transform.applyToPoint(target), Size2d(new_rx, new_ry), new_angle, large_arc, sweep)
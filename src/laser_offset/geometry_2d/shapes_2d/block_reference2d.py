@@ -0,0 +1,49 @@
+from typing import List
+
+from laser_offset.geometry_2d.affine2d import Affine2d
+from laser_offset.geometry_2d.block2d import Block2d
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.style2d import Style
+from laser_offset.geometry_2d.bounds_rect_2d import BoundsRect2d
+
+
+class BlockReference2d(Shape2d):
+    """Placement of shared block, like DXF INSERT
+
+    Block shapes are not copied, transform maps block coordinates to canvas coordinates.
+    """
+
+    style: Style
+
+    block: Block2d
+    transform: Affine2d
+
+    def __init__(self, style: Style, block: Block2d, transform: Affine2d) -> None:
+        super().__init__(style)
+        self.block = block
+        self.transform = transform
+
+    @property
+    def center(self) -> Point2d:
+        return self.transform.applyToPoint(Point2d.cartesian(0, 0))
+
+    @property
+    def maxBoundary(self) -> BoundsRect2d:
+        bounds = self.block.maxBoundary
+        corners = list(map(self.transform.applyToPoint, [
+            Point2d.cartesian(bounds.minX, bounds.minY),
+            Point2d.cartesian(bounds.maxX, bounds.minY),
+            Point2d.cartesian(bounds.maxX, bounds.maxY),
+            Point2d.cartesian(bounds.minX, bounds.maxY)
+        ]))
+        return BoundsRect2d(min(map(lambda point: point.x, corners)),
+                            min(map(lambda point: point.y, corners)),
+                            max(map(lambda point: point.x, corners)),
+                            max(map(lambda point: point.y, corners)))
+
+    # Block shapes in canvas coordinates, nested references stay references
+    @property
+    def transformedShapes(self) -> List[Shape2d]:
+        from laser_offset.geometry_2d.shape_transform import transform_shape
+        return list(map(lambda shape: transform_shape(shape, self.transform), self.block.shapes))
@@ -0,0 +1,174 @@
+from array import array
+from typing import List
+
+from laser_offset.geometry_2d.bounds_rect_2d import BoundsRect2d
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.style2d import Style
+from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
+from laser_offset.geometry_2d.shapes_2d.arc2d import Arc2d
+from laser_offset.geometry_2d.shapes_2d.path2d import Path2d, PathComponent, MoveOrigin, Line, SimpleArc, ClosePath
+
+COMPONENT_MOVE = 0
+COMPONENT_LINE = 1
+COMPONENT_ARC = 2
+COMPONENT_CLOSE = 3
+
+FLAG_CW = 1
+FLAG_LARGE_ARC = 2
+
+
+class PackedPath2d(Shape2d):
+    """Path Shape stored in flat arrays, one item per component
+
+    Holds move, line, simple arc and close components only.
+    Uses a few dozen bytes per vertex instead of component and point objects.
+    """
+
+    style: Style
+
+    codes: array
+    xs: array
+    ys: array
+    radiuses: array
+    flags: array
+
+    def __init__(self, style: Style) -> None:
+        super().__init__(style)
+        self.codes = array('b')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.radiuses = array('d')
+        self.flags = array('b')
+
+    @classmethod
+    def canPack(cls, path: Path2d) -> bool:
+        return all(map(lambda component: isinstance(component, (MoveOrigin, Line, SimpleArc, ClosePath)), path.components))
+
+    @classmethod
+    def fromPath2d(cls, path: Path2d) -> 'PackedPath2d':
+        packed = PackedPath2d(path.style)
+        for component in path.components:
+            if isinstance(component, MoveOrigin):
+                packed.move_to(component.target.x, component.target.y)
+            elif isinstance(component, Line):
+                packed.line_to(component.target.x, component.target.y)
+            elif isinstance(component, SimpleArc):
+                packed.arc_to(component.target.x, component.target.y, component.radius, component.cw_direction, component.large_arc)
+            elif isinstance(component, ClosePath):
+                packed.close()
+            else:
+                raise RuntimeError("Not Implemented")
+        return packed
+
+    @classmethod
+    def fromShapes(cls, chain: List[Shape2d]) -> 'PackedPath2d':
+        # Same components as Path2d.pathFromShapes, packed paths of the chain are copied by slices
+        packed = PackedPath2d(Style())
+        start = chain[0].start
+        packed.move_to(start.x, start.y)
+        for shape in chain:
+            if isinstance(shape, PackedPath2d):
+                packed.extend(shape)
+            elif isinstance(shape, Line2d):
+                packed.line_to(shape.end.x, shape.end.y)
+            elif isinstance(shape, Arc2d):
+                packed.arc_to(shape.end.x, shape.end.y, shape.radiuses.width, not shape.sweep_flat, shape.large_arc)
+        packed.close()
+        return packed
+
+    def append(self, code: int, x: float, y: float, radius: float, flags: int):
+        self.codes.append(code)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.radiuses.append(radius)
+        self.flags.append(flags)
+
+    def move_to(self, x: float, y: float):
+        self.append(COMPONENT_MOVE, x, y, 0, 0)
+
+    def line_to(self, x: float, y: float):
+        self.append(COMPONENT_LINE, x, y, 0, 0)
+
+    def arc_to(self, x: float, y: float, radius: float, cw_direction: bool, large_arc: bool):
+        self.append(COMPONENT_ARC, x, y, radius, (FLAG_CW if cw_direction else 0) | (FLAG_LARGE_ARC if large_arc else 0))
+
+    def close(self):
+        self.append(COMPONENT_CLOSE, 0, 0, 0, 0)
+
+    def extend(self, path: 'PackedPath2d'):
+        # Components after the first move, without close
+        end = path.__len__() - 1 if path.codes[-1] == COMPONENT_CLOSE else path.__len__()
+        self.codes.extend(path.codes[1:end])
+        self.xs.extend(path.xs[1:end])
+        self.ys.extend(path.ys[1:end])
+        self.radiuses.extend(path.radiuses[1:end])
+        self.flags.extend(path.flags[1:end])
+
+    def __len__(self) -> int:
+        return self.codes.__len__()
+
+    def component(self, index: int) -> PathComponent:
+        code = self.codes[index]
+        if code == COMPONENT_CLOSE:
+            return ClosePath()
+
+        target = Point2d.cartesian(self.xs[index], self.ys[index])
+        if code == COMPONENT_MOVE:
+            return MoveOrigin(target)
+        elif code == COMPONENT_LINE:
+            return Line(target)
+        else:
+            flags = self.flags[index]
+            return SimpleArc(target, self.radiuses[index], bool(flags & FLAG_CW), bool(flags & FLAG_LARGE_ARC))
+
+    @property
+    def components(self) -> List[PathComponent]:
+        return list(map(self.component, range(self.__len__())))
+
+    def toPath2d(self) -> Path2d:
+        return Path2d(self.style, self.components)
+
+    @property
+    def isContour(self) -> bool:
+        # One move at the start and close at the end only, it can be merged with other shapes as one piece
+        codes = self.codes
+        if self.__len__() < 2 or codes[0] != COMPONENT_MOVE or codes.count(COMPONENT_MOVE) != 1:
+            return False
+        closes = codes.count(COMPONENT_CLOSE)
+        return closes == 0 or (closes == 1 and codes[-1] == COMPONENT_CLOSE)
+
+    @property
+    def isClosed(self) -> bool:
+        # Contour which ends at its start without close is merged and gets close there
+        return self.isContour and self.__len__() > 3 and self.codes[-1] == COMPONENT_CLOSE
+
+    @property
+    def inverse(self) -> 'PackedPath2d':
+        # Open contour from end to start, arc of every component goes to the previous point in other direction
+        end = self.__len__() - 1 if self.codes[-1] == COMPONENT_CLOSE else self.__len__()
+        packed = PackedPath2d(self.style)
+        packed.move_to(self.xs[end - 1], self.ys[end - 1])
+        for index in range(end - 1, 0, -1):
+            flags = self.flags[index] ^ FLAG_CW if self.codes[index] == COMPONENT_ARC else 0
+            packed.append(self.codes[index], self.xs[index - 1], self.ys[index - 1], self.radiuses[index], flags)
+        return packed
+
+    @property
+    def start(self) -> Point2d:
+        return Point2d.cartesian(self.xs[0], self.ys[0])
+
+    @property
+    def end(self) -> Point2d:
+        index = self.__len__() - 1
+        if self.codes[index] == COMPONENT_CLOSE and index > 0:
+            index -= 1
+        return Point2d.cartesian(self.xs[index], self.ys[index])
+
+    @property
+    def maxBoundary(self) -> BoundsRect2d:
+        return self.toPath2d().maxBoundary
+
+    @property
+    def relative(self) -> 'Shape2d':
+        return self.toPath2d().relative
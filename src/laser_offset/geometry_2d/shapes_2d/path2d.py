@@ -6,7 +6,7 @@ from laser_offset.geometry_2d.shape2d import Shape2d
 from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
 from laser_offset.geometry_2d.shapes_2d.arc2d import Arc2d
 
-from typing import List, NamedTuple
+from typing import List, NamedTuple, Optional, Tuple
 from laser_offset.geometry_2d.size2d import Size2d
 
 from laser_offset.geometry_2d.stroke_style import StrokeStyle
@@ -85,12 +85,7 @@ class Path2d(Shape2d):
                 prev_point = line.target
             elif isinstance(component, SimpleArc):
                 arc: SimpleArc = component
-                arc_info = ArcInfo.fromArc(prev_point,
-                                           arc.target,
-                                           arc.radius,
-                                           arc.large_arc,
-                                           arc.cw_direction
-                                           )
+                arc_info = arc.arcInfo(prev_point)
                 minX = min(minX, arc_info.center.x - arc_info.radius)
                 minY = min(minY, arc_info.center.y - arc_info.radius)
                 maxX = max(maxX, arc_info.center.x + arc_info.radius)
@@ -333,6 +328,8 @@ class SimpleArc(PathComponent):
     radius: float
     cw_direction: bool
     large_arc: bool
+    cached_arc_info: Optional[ArcInfo]
+    cached_arc_key: Optional[Tuple[float, float, float, float, float, bool, bool]]
     def __init__(self,
         target: Point2d,
         radius: float,
@@ -344,6 +341,16 @@ class SimpleArc(PathComponent):
         self.radius = radius
         self.cw_direction = cw_direction
         self.large_arc = large_arc
+        self.cached_arc_info = None
+        self.cached_arc_key = None
+
+    def arcInfo(self, start_point: Point2d) -> ArcInfo:
+        # Arc is solved once and reused while start point and arc parameters are the same
+        key = (start_point.x, start_point.y, self.target.x, self.target.y, self.radius, self.large_arc, self.cw_direction)
+        if self.cached_arc_key != key:
+            self.cached_arc_info = ArcInfo.fromArc(start_point, self.target, self.radius, self.large_arc, self.cw_direction)
+            self.cached_arc_key = key
+        return self.cached_arc_info
 
 class RelSimpleArc(PathComponent):
     target: Vector2d
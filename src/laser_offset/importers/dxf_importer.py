@@ -2,32 +2,48 @@ from enum import Enum
 from re import X
 from sys import path_hooks
 from turtle import width
-from typing import List, NamedTuple, Optional, Tuple, cast
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, cast
 from codecs import StreamReader
 
+from laser_offset.geometry_2d.affine2d import Affine2d
+from laser_offset.geometry_2d.block2d import Block2d
 from laser_offset.geometry_2d.point2d import Point2d
 from laser_offset.geometry_2d.shape2d import Shape2d
 from laser_offset.geometry_2d.shapes_2d.circle2d import Circle2d
 from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
 from laser_offset.geometry_2d.shapes_2d.arc2d import Arc2d
+from laser_offset.geometry_2d.shapes_2d.block_reference2d import BlockReference2d
 from laser_offset.geometry_2d.shapes_2d.path2d import Arc, ClosePath, Line, MoveOrigin, Path2d, PathComponent, SimpleArc
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d
 from laser_offset.geometry_2d.size2d import Size2d
+from laser_offset.geometry_2d.shape_transform import transform_shape
 from laser_offset.geometry_2d.style2d import Style
+from laser_offset.geometry_2d.vector2d import Vector2d
 from laser_offset.importers.importer import Importer
+from laser_offset.importers.dxf_scanner import DXFScanner
 
 from laser_offset.geometry_2d.canvas2d import Canvas2d
 
 from laser_offset.math.float_functions import fclose, fzero
 
 import ezdxf
+from ezdxf.entities import factory
+from ezdxf.lldxf.extendedtags import ExtendedTags
+from ezdxf.lldxf.tagger import ascii_tags_loader, tag_compiler
+from ezdxf.lldxf.types import DXFTag
+from ezdxf.math import Vec3
 from ezdxf.document import Drawing
 from ezdxf.layouts.layout import Modelspace
 from ezdxf.layouts.layout import Paperspace
 from ezdxf.entities import DXFEntity
 from ezdxf.entities.lwpolyline import LWPolyline
+from ezdxf.entities.insert import Insert
 
 import math
 
+# Entities which are read by streaming import, others are skipped
+STREAMING_TYPES = ['CIRCLE', 'LWPOLYLINE', 'LINE', 'ARC', 'SPLINE', 'INSERT']
+
 class DXFPathPoint(NamedTuple):
     x: float
     y: float
@@ -47,7 +63,27 @@ class PointType(Enum):
 
 class DXFImporter(Importer):
 
+    packed_paths: bool
+    fast_scan: bool
+
+    # Block definitions of the file being imported, every block is read once for all its INSERTs
+    blocks: Dict[str, Block2d]
+
+    def __init__(self, packed_paths: bool = False, fast_scan: bool = False) -> None:
+        # Paths and splines are stored as PackedPath2d to save memory on large drawings
+        self.packed_paths = packed_paths
+        # Supported entities are read from group codes, ezdxf is used when the file can not be scanned
+        self.fast_scan = fast_scan
+        self.blocks = dict()
+
     def import_canvas(self, relative: bool, reader: StreamReader) -> Canvas2d:
+
+        self.blocks = dict()
+
+        if self.fast_scan:
+            scanned_canvas: Optional[Canvas2d] = self.scan_canvas(reader)
+            if scanned_canvas is not None:
+                return scanned_canvas.relative if relative else scanned_canvas
         
         doc: Drawing = ezdxf.read(reader)
         
@@ -65,30 +101,9 @@ class DXFImporter(Importer):
         shapes: List[Shape2d] = list()
         
         for child in model_space:
-            entity: DXFEntity = child
-            
-            if entity.dxftype() == 'CIRCLE':
-                circle: Circle2d = self.read_circle(entity)
-                shapes.append(circle)
-                
-            elif entity.dxftype() == 'LWPOLYLINE':
-                path: Path2d = self.read_path2d(entity)
-                shapes.append(path)
-                
-            elif entity.dxftype() == 'LINE':
-                line: Line2d = self.read_line2d(entity)
-                shapes.append(line)                
-                
-            elif entity.dxftype() == 'ARC':
-                arc: Arc2d = self.read_arc2d(entity)
-                shapes.append(arc)
-
-            elif entity.dxftype() == 'SPLINE':
-                spline_as_path: Path2d = self.read_spline_as_path2d(entity)
-                shapes.append(spline_as_path)
-                
-            else:
-                print('UNKNOWN TYPE: ',entity.dxftype())
+            shape: Optional[Shape2d] = self.read_entity(child)
+            if shape is not None:
+                shapes.append(shape)
 
         canvas: Canvas2d = Canvas2d(
             Point2d.cartesian(0, 0), 
@@ -99,6 +114,173 @@ class DXFImporter(Importer):
 
         return canvas
 
+    def scan_canvas(self, reader: StreamReader) -> Optional[Canvas2d]:
+        scanner = DXFScanner(self)
+        start = reader.tell()
+        try:
+            shapes: List[Shape2d] = list(scanner.scan_shapes(reader))
+        except (ValueError, UnicodeDecodeError):
+            # Not an ASCII DXF, reader is returned to start for ezdxf
+            reader.seek(start)
+            return None
+
+        return Canvas2d(
+            Point2d.cartesian(0, 0),
+            Size2d(scanner.paper_max[0] - scanner.paper_min[0], scanner.paper_max[1] - scanner.paper_min[1]),
+            shapes)
+
+    def import_shapes(self, reader: StreamReader) -> Iterator[Shape2d]:
+        """Reads model space entities one by one without building the whole document
+
+        Only tags of the current entity are kept in memory. Drawing limits are not read, shapes only.
+        Block definitions are read from BLOCKS section before entities and kept for INSERTs.
+        """
+
+        self.blocks = dict()
+
+        if self.fast_scan:
+            yield from DXFScanner(self).scan_shapes(reader)
+            return
+
+        section: Optional[str] = None
+        prev_code: int = -1
+        prev_value: str = ''
+        entity_tags: List[DXFTag] = list()
+
+        # Block which is read from BLOCKS section
+        block_entity: Optional[DXFEntity] = None
+        block_shapes: List[Shape2d] = list()
+
+        for tag in tag_compiler(ascii_tags_loader(reader)):
+            if section == 'ENTITIES' or section == 'BLOCKS':
+                if tag.code != 0:
+                    entity_tags.append(tag)
+                    continue
+
+                # Next entity starts, previous one is complete
+                if entity_tags.__len__() > 0:
+                    entity_type = entity_tags[0].value
+                    if section == 'BLOCKS' and entity_type == 'BLOCK':
+                        block_entity = factory.load(ExtendedTags(entity_tags))
+                        block_shapes = list()
+                    elif section == 'BLOCKS' and entity_type == 'ENDBLK':
+                        if block_entity is not None:
+                            self.add_block(block_entity.dxf.name, block_entity.dxf.base_point, block_shapes)
+                        block_entity = None
+                    elif entity_type in STREAMING_TYPES:
+                        entity: DXFEntity = factory.load(ExtendedTags(entity_tags))
+                        if section == 'BLOCKS' or entity.dxf.paperspace == 0:
+                            shape: Optional[Shape2d] = self.read_entity(entity)
+                            if shape is None:
+                                pass
+                            elif section == 'BLOCKS':
+                                block_shapes.append(shape)
+                            else:
+                                yield shape
+
+                if tag.value == 'ENDSEC':
+                    if section == 'ENTITIES':
+                        return
+                    section = None
+                    entity_tags = list()
+                else:
+                    entity_tags = [tag]
+
+            elif tag.code == 2 and prev_code == 0 and prev_value == 'SECTION':
+                section = tag.value
+
+            prev_code = tag.code
+            prev_value = tag.value
+
+    def read_entity(self, entity: DXFEntity) -> Optional[Shape2d]:
+
+        if entity.dxftype() == 'CIRCLE':
+            return self.read_circle(entity)
+
+        elif entity.dxftype() == 'LWPOLYLINE':
+            path: Path2d = self.read_path2d(entity)
+            return PackedPath2d.fromPath2d(path) if self.packed_paths else path
+
+        elif entity.dxftype() == 'LINE':
+            return self.read_line2d(entity)
+
+        elif entity.dxftype() == 'ARC':
+            return self.read_arc2d(entity)
+
+        elif entity.dxftype() == 'SPLINE':
+            if self.packed_paths:
+                return self.read_spline_as_packed_path2d(entity)
+            else:
+                return self.read_spline_as_path2d(entity)
+
+        elif entity.dxftype() == 'INSERT':
+            return self.read_insert(entity)
+
+        else:
+            print('UNKNOWN TYPE: ',entity.dxftype())
+            return None
+
+    def read_insert(self, entity: Insert) -> Optional[BlockReference2d]:
+        block = self.read_block(entity.dxf.name, entity.doc)
+        if block is None:
+            return None
+
+        transform = self.insert_transform(
+            entity.dxf.insert.x, entity.dxf.insert.y,
+            entity.dxf.xscale, entity.dxf.yscale,
+            entity.dxf.rotation)
+
+        # MINSERT places block in rows and columns of rotated insert axes
+        rows = entity.dxf.row_count
+        columns = entity.dxf.column_count
+        if rows * columns <= 1:
+            return BlockReference2d(Style(), block, transform)
+
+        rotation = Affine2d.rotate(math.radians(entity.dxf.rotation))
+        references: List[Shape2d] = list()
+        for row in range(rows):
+            for column in range(columns):
+                offset = rotation.applyToVector(Vector2d.cartesian(column * entity.dxf.column_spacing, row * entity.dxf.row_spacing))
+                references.append(BlockReference2d(Style(), block, Affine2d.translate(offset.dx, offset.dy).multiply(transform)))
+        return BlockReference2d(Style(), Block2d(block.name, references), Affine2d.identity())
+
+    def insert_transform(self, x: float, y: float, xscale: float, yscale: float, rotation: float) -> Affine2d:
+        return Affine2d.translate(x, y).multiply(Affine2d.rotate(math.radians(rotation))).multiply(Affine2d.scale(xscale, yscale))
+
+    def read_block(self, name: str, doc: Optional[Drawing]) -> Optional[Block2d]:
+        if name in self.blocks:
+            return self.blocks[name]
+
+        # Entities loaded without document use blocks from BLOCKS section only
+        if doc is None:
+            return None
+
+        block_layout = doc.blocks.get(name)
+        if block_layout is None:
+            return None
+
+        # Added before its entities are read, so the block can not insert itself forever
+        block = self.add_block(name, block_layout.block.dxf.base_point, [])
+        shapes: List[Shape2d] = list()
+        for child in block_layout:
+            shape: Optional[Shape2d] = self.read_entity(child)
+            if shape is not None:
+                shapes.append(shape)
+        block.shapes = self.block_shapes(block_layout.block.dxf.base_point, shapes)
+        return block
+
+    def add_block(self, name: str, base_point: Vec3, shapes: List[Shape2d]) -> Block2d:
+        block = Block2d(name, self.block_shapes(base_point, shapes))
+        self.blocks[name] = block
+        return block
+
+    def block_shapes(self, base_point: Vec3, shapes: List[Shape2d]) -> List[Shape2d]:
+        # Block shapes are kept relative to block base point
+        if base_point[0] == 0 and base_point[1] == 0:
+            return shapes
+        to_base = Affine2d.translate(-base_point[0], -base_point[1])
+        return list(map(lambda shape: transform_shape(shape, to_base), shapes))
+
     def read_line2d(self, entity: ezdxf.entities.line.Line) -> Line2d:
         return Line2d(Style(), 
                       Point2d.cartesian(entity.dxf.start.x, entity.dxf.start.y), 
@@ -120,9 +302,11 @@ class DXFImporter(Importer):
         return Circle2d(Style(), Point2d.cartesian(cx, cy), r)
 
     def read_path2d(self, entity: LWPolyline) -> Path2d:
+        return self.path2d_from_points(self.flip_y(entity), entity.closed)
+
+    def path2d_from_points(self, points: List[Tuple[float, float, float, float, float]], closed: bool) -> Path2d:
         
         components: List[PathComponent] = list()
-        points: List[Tuple[float, float, float, float, float]] = self.flip_y(entity)
 
         for index, point in enumerate(points+[points[0]]):
 
@@ -131,7 +315,7 @@ class DXFImporter(Importer):
                 point_type = PointType.FIRST
 
 
-            prev_point = points[index - 1] if index > 0 else points[entity.__len__()-1]
+            prev_point = points[index - 1] if index > 0 else points[points.__len__()-1]
             start_point: DXFPathPoint = DXFPathPoint.fromTuple(prev_point)
             end_point: DXFPathPoint = DXFPathPoint.fromTuple(point)
             component: PathComponent = self.read_path_component(point_type, start_point, end_point)
@@ -144,7 +328,7 @@ class DXFImporter(Importer):
                 if component is not None:
                     components.append(component)
 
-        if entity.closed:
+        if closed:
             start_point: Point2d = cast(MoveOrigin, components[0]).target
             end_point: Point2d
             if isinstance(components[-1], SimpleArc):
@@ -206,15 +390,16 @@ class DXFImporter(Importer):
         return polyline_points
 
     def read_spline_as_path2d(self, entity: ezdxf.entities.spline.Spline ) -> Path2d:
+        return self.spline_path2d(entity.control_points[0], entity.flattening(0.05, 3), entity.closed)
 
-        components: List[PathComponent] = list()
+    def spline_path2d(self, step_point: Vec3, flattening: Iterable[Vec3], closed: bool) -> Path2d:
 
-        step_point = entity.control_points[0]
+        components: List[PathComponent] = list()
 
         prev_point = Point2d.cartesian(step_point[0], step_point[1])
         components.append(MoveOrigin(prev_point))
 
-        for step_point in entity.flattening(0.05, 3):
+        for step_point in flattening:
             point = Point2d.cartesian(step_point.x, step_point.y)
             if not fzero(prev_point.distance(point)):
                 components.append(Line(point))
@@ -223,7 +408,28 @@ class DXFImporter(Importer):
         # step_point = entity.control_points[-1]
         # components.append(Line(Point2d.cartesian(step_point[0], step_point[1])))
 
-        if entity.closed:
+        if closed:
             components.append(ClosePath())
 
-        return Path2d(Style(), components)
\ No newline at end of file
+        return Path2d(Style(), components)
+
+    def read_spline_as_packed_path2d(self, entity: ezdxf.entities.spline.Spline) -> PackedPath2d:
+        return self.spline_packed_path2d(entity.control_points[0], entity.flattening(0.05, 3), entity.closed)
+
+    def spline_packed_path2d(self, step_point: Vec3, flattening: Iterable[Vec3], closed: bool) -> PackedPath2d:
+
+        path = PackedPath2d(Style())
+
+        prev_point = Point2d.cartesian(step_point[0], step_point[1])
+        path.move_to(prev_point.x, prev_point.y)
+
+        for step_point in flattening:
+            point = Point2d.cartesian(step_point.x, step_point.y)
+            if not fzero(prev_point.distance(point)):
+                path.line_to(point.x, point.y)
+            prev_point = point
+
+        if closed:
+            path.close()
+
+        return path
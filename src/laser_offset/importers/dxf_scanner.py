@@ -0,0 +1,243 @@
+from codecs import StreamReader
+from typing import Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+import math
+
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.shapes_2d.circle2d import Circle2d
+from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
+from laser_offset.geometry_2d.shapes_2d.arc2d import Arc2d
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d
+from laser_offset.geometry_2d.style2d import Style
+
+from ezdxf.entities import factory
+from ezdxf.lldxf.extendedtags import ExtendedTags
+from ezdxf.lldxf.tagger import tag_compiler
+from ezdxf.lldxf.types import DXFTag
+from ezdxf.math import BSpline, Vec3
+
+if TYPE_CHECKING:
+    from laser_offset.importers.dxf_importer import DXFImporter
+
+# Parts of other entities, they are not shapes by themselves
+LINKED_TYPES = {'VERTEX', 'SEQEND', 'ATTRIB'}
+
+# Entities of block definitions which give shapes, others are not loaded
+BLOCK_TYPES = {'LINE', 'ARC', 'CIRCLE', 'LWPOLYLINE', 'SPLINE', 'INSERT'}
+
+# Same defaults as ezdxf uses for paper space layout
+DEFAULT_PAPER_MIN = (0.0, 0.0)
+DEFAULT_PAPER_MAX = (420.0, 297.0)
+
+COMMENT_CODE = 999
+
+
+class DXFScanner:
+    """Reads shapes from ENTITIES section of ASCII DXF without ezdxf document
+
+    LINE, ARC, CIRCLE, LWPOLYLINE and SPLINE are read from group codes, other entities are loaded by ezdxf.
+    Blocks from BLOCKS section are given to importer, so INSERTs loaded by ezdxf find them.
+    Shapes are converted by the same importer methods, so result is the same as with ezdxf entities.
+    Paper space limits are taken from $PLIMMIN and $PLIMMAX header variables.
+    """
+
+    importer: 'DXFImporter'
+
+    paper_min: Tuple[float, float]
+    paper_max: Tuple[float, float]
+
+    def __init__(self, importer: 'DXFImporter') -> None:
+        self.importer = importer
+        self.paper_min = DEFAULT_PAPER_MIN
+        self.paper_max = DEFAULT_PAPER_MAX
+
+    def tags(self, reader: StreamReader) -> Iterator[Tuple[int, str]]:
+        lines = iter(reader)
+        for code_line, value_line in zip(lines, lines):
+            code = int(code_line)
+            if code != COMMENT_CODE:
+                yield (code, value_line.rstrip('\r\n'))
+
+    def scan_shapes(self, reader: StreamReader) -> Iterator[Shape2d]:
+        section: Optional[str] = None
+        section_name_expected: bool = False
+        header_variable: Optional[str] = None
+        header_values: Dict[str, List[float]] = dict()
+        entity_tags: List[Tuple[int, str]] = list()
+
+        # Block which is read from BLOCKS section
+        block_tags: Optional[List[Tuple[int, str]]] = None
+        block_shapes: List[Shape2d] = list()
+
+        for code, value in self.tags(reader):
+            if code == 0:
+                if entity_tags.__len__() > 0:
+                    if section == 'BLOCKS':
+                        if entity_tags[0][1] == 'BLOCK':
+                            block_tags = entity_tags
+                            block_shapes = list()
+                        elif entity_tags[0][1] == 'ENDBLK':
+                            if block_tags is not None:
+                                self.read_block(block_tags, block_shapes)
+                            block_tags = None
+                        elif entity_tags[0][1] in BLOCK_TYPES:
+                            shape = self.read_entity(entity_tags)
+                            if shape is not None:
+                                block_shapes.append(shape)
+                    else:
+                        shape = self.read_entity(entity_tags)
+                        if shape is not None:
+                            yield shape
+                    entity_tags = list()
+
+                value = value.strip()
+                if value == 'SECTION':
+                    section_name_expected = True
+                elif value == 'ENDSEC':
+                    if section == 'HEADER':
+                        self.read_header(header_values)
+                    section = None
+                elif value == 'EOF':
+                    return
+                elif section == 'ENTITIES' or section == 'BLOCKS':
+                    entity_tags.append((code, value))
+
+            elif section_name_expected:
+                section = value.strip() if code == 2 else None
+                section_name_expected = False
+
+            elif section == 'HEADER':
+                if code == 9:
+                    header_variable = value.strip()
+                elif header_variable in ('$PLIMMIN', '$PLIMMAX') and code in (10, 20):
+                    header_values.setdefault(header_variable, []).append(float(value))
+
+            elif entity_tags.__len__() > 0:
+                entity_tags.append((code, value))
+
+    def read_header(self, header_values: Dict[str, List[float]]):
+        if header_values.get('$PLIMMIN', []).__len__() == 2:
+            self.paper_min = (header_values['$PLIMMIN'][0], header_values['$PLIMMIN'][1])
+        if header_values.get('$PLIMMAX', []).__len__() == 2:
+            self.paper_max = (header_values['$PLIMMAX'][0], header_values['$PLIMMAX'][1])
+
+    def read_block(self, tags: List[Tuple[int, str]], shapes: List[Shape2d]):
+        name = next(map(lambda tag: tag[1], filter(lambda tag: tag[0] == 2, tags)), None)
+        if name is None:
+            return
+        values = self.values(tags, {10: 0, 20: 0})
+        self.importer.add_block(name, (values[10], values[20]), shapes)
+
+    def read_entity(self, tags: List[Tuple[int, str]]) -> Optional[Shape2d]:
+        entity_type = tags[0][1]
+
+        if entity_type in LINKED_TYPES:
+            return None
+
+        # Paper space entities are not in model space
+        if any(map(lambda tag: tag[0] == 67 and int(tag[1]) == 1, tags)):
+            return None
+
+        if entity_type == 'LINE':
+            return self.read_line2d(tags)
+        elif entity_type == 'ARC':
+            return self.read_arc2d(tags)
+        elif entity_type == 'CIRCLE':
+            return self.read_circle(tags)
+        elif entity_type == 'LWPOLYLINE':
+            return self.read_path2d(tags)
+        elif entity_type == 'SPLINE':
+            shape = self.read_spline(tags)
+            if shape is not None:
+                return shape
+
+        # Tags are compiled to typed values and points as ezdxf loader does
+        entity = factory.load(ExtendedTags(tag_compiler(iter(map(lambda tag: DXFTag(tag[0], tag[1]), tags)))))
+        return self.importer.read_entity(entity)
+
+    def values(self, tags: List[Tuple[int, str]], defaults: Dict[int, float]) -> Dict[int, float]:
+        result = dict(defaults)
+        for code, value in tags:
+            if code in defaults:
+                result[code] = float(value)
+        return result
+
+    def read_line2d(self, tags: List[Tuple[int, str]]) -> Line2d:
+        values = self.values(tags, {10: 0, 20: 0, 11: 0, 21: 0})
+        return Line2d(Style(),
+                      Point2d.cartesian(values[10], values[20]),
+                      Point2d.cartesian(values[11], values[21]))
+
+    def read_arc2d(self, tags: List[Tuple[int, str]]) -> Arc2d:
+        values = self.values(tags, {10: 0, 20: 0, 40: 1, 50: 0, 51: 360})
+        return Arc2d.fromCenteredArc(Style(),
+                                     Point2d.cartesian(values[10], values[20]),
+                                     math.radians(values[50]),
+                                     math.radians(values[51]),
+                                     values[40]
+                                    )
+
+    def read_circle(self, tags: List[Tuple[int, str]]) -> Circle2d:
+        values = self.values(tags, {10: 0, 20: 0, 40: 1})
+        return Circle2d(Style(), Point2d.cartesian(values[10], values[20]), values[40])
+
+    def read_path2d(self, tags: List[Tuple[int, str]]) -> Shape2d:
+        flags = 0
+        # x, y, start width, end width, bulge for every vertex
+        points: List[List[float]] = list()
+        for code, value in tags:
+            if code == 70:
+                flags = int(value)
+            elif code == 10:
+                points.append([float(value), 0, 0, 0, 0])
+            elif points.__len__() > 0:
+                if code == 20:
+                    points[-1][1] = float(value)
+                elif code == 40:
+                    points[-1][2] = float(value)
+                elif code == 41:
+                    points[-1][3] = float(value)
+                elif code == 42:
+                    points[-1][4] = float(value)
+
+        path = self.importer.path2d_from_points(list(map(tuple, points)), bool(flags & 1))
+        return PackedPath2d.fromPath2d(path) if self.importer.packed_paths else path
+
+    def read_spline(self, tags: List[Tuple[int, str]]) -> Optional[Shape2d]:
+        flags = 0
+        degree = 3
+        knots: List[float] = list()
+        weights: List[float] = list()
+        control_points: List[List[float]] = list()
+        for code, value in tags:
+            if code == 70:
+                flags = int(value)
+            elif code == 71:
+                degree = int(value)
+            elif code == 40:
+                knots.append(float(value))
+            elif code == 41:
+                weights.append(float(value))
+            elif code == 10:
+                control_points.append([float(value), 0, 0])
+            elif code == 20 and control_points.__len__() > 0:
+                control_points[-1][1] = float(value)
+            elif code == 30 and control_points.__len__() > 0:
+                control_points[-1][2] = float(value)
+
+        # Fit point splines are built by ezdxf
+        if control_points.__len__() == 0:
+            return None
+
+        vertices = list(map(Vec3, control_points))
+        spline = BSpline(
+            control_points=vertices,
+            order=degree + 1,
+            knots=knots if knots.__len__() > 0 else None,
+            weights=weights if weights.__len__() > 0 else None
+        )
+        closed = bool(flags & 1)
+        if self.importer.packed_paths:
+            return self.importer.spline_packed_path2d(vertices[0], spline.flattening(0.05, 3), closed)
+        return self.importer.spline_path2d(vertices[0], spline.flattening(0.05, 3), closed)
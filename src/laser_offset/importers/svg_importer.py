@@ -1,11 +1,15 @@
 from asyncio import StreamReader
 from ctypes import pointer
 from re import S
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from laser_offset.geometry_2d.affine2d import Affine2d
+from laser_offset.geometry_2d.block2d import Block2d
 from laser_offset.geometry_2d.canvas2d import Canvas2d
 from laser_offset.geometry_2d.fill_style import FillStyle
 from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.shape_transform import transform_shape
 from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.shapes_2d.block_reference2d import BlockReference2d
 from laser_offset.geometry_2d.shapes_2d.circle2d import Circle2d
 from laser_offset.geometry_2d.shapes_2d.ellipse2d import Ellipse2d
 from laser_offset.geometry_2d.shapes_2d.line2d import Line2d
@@ -19,73 +23,274 @@ from laser_offset.geometry_2d.style2d import Style
 from laser_offset.geometry_2d.vector2d import Vector2d
 from laser_offset.importers.importer import Importer
 
+import math
+import re
 import xml.etree.ElementTree as ET
 
-class SVGImporter(Importer):
+SVG_NAMESPACE = '{http://www.w3.org/2000/svg}'
+XLINK_NAMESPACE = '{http://www.w3.org/1999/xlink}'
 
-    def import_canvas(self, relative: bool, reader: StreamReader) -> Canvas2d:
-        xml_tree = ET.parse(reader)
-        root = xml_tree.getroot()
-        if root.tag != '{http://www.w3.org/2000/svg}svg':
-            raise RuntimeError("Root should be SVG")
+# Content of these elements is not drawn where it is defined
+HIDDEN_ELEMENTS = set(map(lambda name: SVG_NAMESPACE + name, ['defs', 'symbol', 'clipPath', 'mask', 'pattern', 'marker']))
 
-        # TODO: Read Canvas Size
-        viewBox = root.attrib.get('viewBox')
-        centerPoint = Point2d.cartesian
-        size = Size2d(100, 100)
-        if viewBox != None:
-            coords = viewBox.split(" ")
-            if coords.__len__() == 4:
-                x1 = float(coords[0])
-                y1 = float(coords[1])
-                x2 = float(coords[2])
-                y2 = float(coords[3])
+# Presentation attributes which groups pass to shapes inside
+INHERITED_ATTRIBUTES = ['fill', 'stroke']
 
-                size = Size2d(x2-x1, y2-y1)
-                centerPoint = Point2d.cartesian((x1+x2)/2, (y1+y2)/2)
+TRANSFORM_PATTERN = re.compile(r'(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)')
 
-        shapes: List[Shape2d] = list()
+NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+NUMBER_PATTERN = re.compile(NUMBER)
 
-        for element in root:
-            shape = self.parse_element(element)
-            if shape is None:
-                continue
+# Command letter with everything up to the next command
+PATH_COMMAND_PATTERN = re.compile(r'([MmZzLlHhVvCcSsQqTtAa])([^MmZzLlHhVvCcSsQqTtAa]*)')
+
+# Arc flags are single digits, "a1 1 0 00.5.5" has flags 0 and 0
+ARC_PARAMETERS_PATTERN = re.compile(r'[\s,]*'.join(['(' + NUMBER + ')'] * 3 + ['([01])'] * 2 + ['(' + NUMBER + ')'] * 2))
+
+PATH_PARAMETERS_COUNT = {
+    'M': 2, 'L': 2, 'T': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'A': 7, 'Z': 0,
+    'm': 2, 'l': 2, 't': 2, 'h': 1, 'v': 1, 'c': 6, 's': 4, 'q': 4, 'a': 7, 'z': 0
+}
+
+
+def tokenize_path(path_data: str) -> Iterator[Tuple[str, List[float]]]:
+    """Scans path data once, yields command with its parameters
+
+    Repeated parameters make repeated commands, moveto repeats as lineto.
+    Parameters which do not fill a whole command are dropped.
+    """
+
+    for match in PATH_COMMAND_PATTERN.finditer(path_data):
+        command = match.group(1)
+        count = PATH_PARAMETERS_COUNT[command]
+        if count == 0:
+            yield (command, [])
+            continue
+
+        if command == 'A' or command == 'a':
+            parameters = [float(value) for arc in ARC_PARAMETERS_PATTERN.findall(match.group(2)) for value in arc]
+        else:
+            parameters = list(map(float, NUMBER_PATTERN.findall(match.group(2))))
+
+        if parameters.__len__() == count:
+            yield (command, parameters)
+            continue
+
+        for index in range(0, parameters.__len__() - count + 1, count):
+            yield (command, parameters[index:index + count])
+            if command == 'M':
+                command = 'L'
+            elif command == 'm':
+                command = 'l'
+
+
+class SVGImporter(Importer):
+
+    center_point: Point2d
+    size: Size2d
 
-            style = self.parse_style(element)
-            shape.style = style
-            shapes.append(shape)
+    # Content of defs and symbols with id, which <use> elements refer to
+    definitions: Dict[str, Block2d]
+    # Ids of definitions which are read to the end, <use> of other ids waits for the end of the document
+    defined_ids: Set[str]
 
+    def __init__(self) -> None:
+        self.center_point = Point2d.cartesian(0, 0)
+        self.size = Size2d(100, 100)
+        self.definitions = dict()
+        self.defined_ids = set()
 
-        canvas = Canvas2d(centerPoint, size, shapes)
+    def import_canvas(self, relative: bool, reader: StreamReader) -> Canvas2d:
+        shapes: List[Shape2d] = list(self.import_shapes(reader))
+        canvas = Canvas2d(self.center_point, self.size, shapes)
         return canvas
 
+    def import_shapes(self, reader: StreamReader) -> Iterator[Shape2d]:
+        """Reads shapes while the document is parsed, group transforms are applied to shapes
+
+        Every element is dropped from its parent when it is read, so the tree never grows.
+        Canvas size is known after the root element is read.
+        Elements with id inside defs and symbols become blocks, <use> gives reference to the block.
+        """
+
+        self.definitions = dict()
+        self.defined_ids = set()
+
+        # Transform and inherited attributes of every open element
+        transforms: List[Affine2d] = [Affine2d.identity()]
+        own_transforms: List[Affine2d] = [Affine2d.identity()]
+        attributes: List[Dict[str, str]] = [dict()]
+        elements: List[ET.Element] = list()
+        hidden_depth = 0
+
+        # Open definitions as depth of element with id, the id and shapes in coordinates of the element parent
+        open_definitions: List[Tuple[int, str, List[Shape2d]]] = list()
+        # References to blocks which are defined later in the document
+        pending_references: List[BlockReference2d] = list()
+
+        for event, element in ET.iterparse(reader, events=('start', 'end')):
+
+            if event == 'start':
+                if elements.__len__() == 0:
+                    self.read_root(element)
+
+                own_transform = self.element_transform(element)
+                transforms.append(transforms[-1].multiply(own_transform))
+                own_transforms.append(own_transform)
+                element_attributes = attributes[-1].copy()
+                for name in INHERITED_ATTRIBUTES:
+                    if name in element.attrib:
+                        element_attributes[name] = element.attrib[name]
+                attributes.append(element_attributes)
+
+                if element.tag in HIDDEN_ELEMENTS:
+                    hidden_depth += 1
+                if hidden_depth > 0 and 'id' in element.attrib and element.tag != SVG_NAMESPACE + 'defs':
+                    open_definitions.append((elements.__len__() + 1, element.attrib['id'], list()))
+                elements.append(element)
+                continue
+
+            depth = elements.__len__()
+            elements.pop()
+
+            if element.tag == SVG_NAMESPACE + 'use':
+                shape, is_pending = self.parse_use(element)
+            else:
+                shape, is_pending = (self.parse_element(element), False)
+
+            if shape is not None:
+                shape.style = self.parse_style(attributes[-1])
+                for definition_depth, _, definition_shapes in open_definitions:
+                    definition_transform = own_transforms[definition_depth]
+                    for own_transform in own_transforms[definition_depth + 1:]:
+                        definition_transform = definition_transform.multiply(own_transform)
+                    definition_shapes.append(transform_shape(shape, definition_transform))
+
+                if hidden_depth == 0:
+                    if is_pending:
+                        pending_references.append(transform_shape(shape, transforms[-1]))
+                    else:
+                        yield transform_shape(shape, transforms[-1])
+
+            if open_definitions.__len__() > 0 and open_definitions[-1][0] == depth:
+                _, definition_id, definition_shapes = open_definitions.pop()
+                # References which are read before the definition have the same block
+                self.definitions.setdefault(definition_id, Block2d(definition_id, [])).shapes = definition_shapes
+                self.defined_ids.add(definition_id)
+
+            if element.tag in HIDDEN_ELEMENTS:
+                hidden_depth -= 1
+
+            transforms.pop()
+            own_transforms.pop()
+            attributes.pop()
+
+            element.clear()
+            if elements.__len__() > 0:
+                elements[-1].remove(element)
+
+        # References to ids which are never defined are dropped
+        for reference in pending_references:
+            if reference.block.name in self.defined_ids:
+                yield reference
+
+    def element_transform(self, element: ET.Element) -> Affine2d:
+        # Symbol is drawn only by <use>, its own transform is not applied
+        if element.tag == SVG_NAMESPACE + 'symbol':
+            return Affine2d.identity()
+
+        transform = self.parse_transform(element.attrib.get('transform'))
+        if element.tag == SVG_NAMESPACE + 'use':
+            x = float(element.attrib.get('x', '0'))
+            y = float(element.attrib.get('y', '0'))
+            if x != 0 or y != 0:
+                transform = transform.multiply(Affine2d.translate(x, y))
+        return transform
+
+    def read_root(self, root: ET.Element):
+        if root.tag != SVG_NAMESPACE + 'svg':
+            raise RuntimeError("Root should be SVG")
+
+        viewBox = root.attrib.get('viewBox')
+        if viewBox != None:
+            coords = list(map(float, NUMBER_PATTERN.findall(viewBox)))
+            if coords.__len__() == 4:
+                x1 = coords[0]
+                y1 = coords[1]
+                x2 = coords[2]
+                y2 = coords[3]
+
+                self.size = Size2d(x2-x1, y2-y1)
+                self.center_point = Point2d.cartesian((x1+x2)/2, (y1+y2)/2)
+
+    def parse_transform(self, transform: Optional[str]) -> Affine2d:
+        result = Affine2d.identity()
+        if transform is None:
+            return result
+
+        # Last transform in the list is applied first
+        for name, arguments in TRANSFORM_PATTERN.findall(transform):
+            values = list(map(float, NUMBER_PATTERN.findall(arguments)))
+            if name == 'matrix' and values.__len__() == 6:
+                result = result.multiply(Affine2d(*values))
+            elif name == 'translate' and values.__len__() in (1, 2):
+                result = result.multiply(Affine2d.translate(values[0], values[1] if values.__len__() == 2 else 0))
+            elif name == 'scale' and values.__len__() in (1, 2):
+                result = result.multiply(Affine2d.scale(values[0], values[1] if values.__len__() == 2 else values[0]))
+            elif name == 'rotate' and values.__len__() in (1, 3):
+                result = result.multiply(Affine2d.rotate(math.radians(values[0]), *values[1:]))
+            elif name == 'skewX' and values.__len__() == 1:
+                result = result.multiply(Affine2d.skewX(math.radians(values[0])))
+            elif name == 'skewY' and values.__len__() == 1:
+                result = result.multiply(Affine2d.skewY(math.radians(values[0])))
+        return result
+
     def parse_element(self, element: ET.Element) -> Optional[Shape2d]:
         
-        if element.tag == '{http://www.w3.org/2000/svg}rectangle':
+        if element.tag == SVG_NAMESPACE + 'rect' or element.tag == SVG_NAMESPACE + 'rectangle':
             return self.parse_rectangle(element)
-        elif element.tag == '{http://www.w3.org/2000/svg}line':
+        elif element.tag == SVG_NAMESPACE + 'line':
             return self.parse_line(element)
-        elif element.tag == '{http://www.w3.org/2000/svg}circle':
+        elif element.tag == SVG_NAMESPACE + 'circle':
             return self.parse_circle(element)
-        elif element.tag == '{http://www.w3.org/2000/svg}ellipse':
+        elif element.tag == SVG_NAMESPACE + 'ellipse':
             return self.parse_ellipse(element)
-        elif element.tag == '{http://www.w3.org/2000/svg}polyline':
+        elif element.tag == SVG_NAMESPACE + 'polyline':
             return self.parse_polyline(element)
-        elif element.tag == '{http://www.w3.org/2000/svg}polygon':
+        elif element.tag == SVG_NAMESPACE + 'polygon':
             return self.parse_polygon(element)
-        elif element.tag == '{http://www.w3.org/2000/svg}path':
+        elif element.tag == SVG_NAMESPACE + 'path':
             return self.parse_path(element)
 
+    def parse_use(self, element: ET.Element) -> Tuple[Optional[BlockReference2d], bool]:
+        """Reference to block by href and flag that the block is not defined yet
+
+        x and y of <use> are in element transform. Block which is not defined yet is empty
+        until its definition is read, every reference to it is pending until then.
+        """
+
+        href = element.attrib.get('href', element.attrib.get(XLINK_NAMESPACE + 'href'))
+        if href is None or not href.startswith('#'):
+            return (None, False)
+
+        block_id = href[1:]
+        is_pending = block_id not in self.defined_ids
+        block = self.definitions.setdefault(block_id, Block2d(block_id, []))
+        return (BlockReference2d(Style(), block, Affine2d.identity()), is_pending)
+
     def parse_rectangle(self, element: ET.Element) -> Optional[Rect2d]:
-        x = element.attrib.get('x')
-        y = element.attrib.get('y')
+        x = element.attrib.get('x', '0')
+        y = element.attrib.get('y', '0')
         width = element.attrib.get('width')
         height = element.attrib.get('height')
-        if x is None or y is None or width is None or height is None:
+        if width is None or height is None:
             return None
         
-        cx = element.attrib.get('cx')
-        return Rect2d(Style(), Point2d.cartesian(x,y), Point2d.cartesian(x+width, y+height), cx if cx is not None else 0)
+        rx = element.attrib.get('rx', element.attrib.get('ry'))
+        return Rect2d(Style(),
+                      Point2d.cartesian(float(x), float(y)),
+                      Point2d.cartesian(float(x) + float(width), float(y) + float(height)),
+                      float(rx) if rx is not None else 0)
         
     def parse_line(self, element: ET.Element) -> Optional[Line2d]:
         x1 = element.attrib.get('x1')
@@ -96,49 +301,36 @@ class SVGImporter(Importer):
         if x1 is None or y1 is None or x2 is None or y2 is None:
             return None
 
-        return Line2d(Style(), Point2d.cartesian(x1, y1), Point2d.cartesian(x2, y2))
+        return Line2d(Style(), Point2d.cartesian(float(x1), float(y1)), Point2d.cartesian(float(x2), float(y2)))
 
     def parse_circle(self, element: ET.Element) -> Optional[Circle2d]:
-        cx = element.attrib.get('cx')
-        cy = element.attrib.get('cy')
+        cx = element.attrib.get('cx', '0')
+        cy = element.attrib.get('cy', '0')
         r = element.attrib.get('r')
 
-        if cx is None or cy is None or r is None:
+        if r is None:
             return None
         
-        return Circle2d(Style(), Point2d.cartesian(cx,cy), r)
+        return Circle2d(Style(), Point2d.cartesian(float(cx), float(cy)), float(r))
 
     def parse_ellipse(self, element: ET.Element) -> Optional[Ellipse2d]:
-        cx = element.attrib.get('cx')
-        cy = element.attrib.get('cy')
+        cx = element.attrib.get('cx', '0')
+        cy = element.attrib.get('cy', '0')
         rx = element.attrib.get('rx')
         ry = element.attrib.get('ry')
 
-        if cx is None or cy is None or rx is None or ry is None:
+        if rx is None or ry is None:
             return None
         
-        return Ellipse2d(Style(), Point2d.cartesian(cx,cy), Size2d(rx, ry))
-
-    def preparse_points_string(self, points_string: str) -> str:
-        import re
-
-        filtered_points = re.sub(r'(\,[\s\n]*)', ',', points_string)
-        points_to_split = re.sub(r'([\s\n]+)', ';', filtered_points)
-        return points_to_split
+        return Ellipse2d(Style(), Point2d.cartesian(float(cx), float(cy)), Size2d(float(rx), float(ry)), 0)
 
     def parse_points(self, element: ET.Element) -> List[Point2d]:
 
-        points = element.attrib.get('points')
-        
-        points_to_split = self.preparse_points_string(points)
-        
-        coord_pairs = points_to_split.split(";")
+        numbers = list(map(float, NUMBER_PATTERN.findall(element.attrib.get('points', ''))))
 
         points: List[Point2d] = list()
-        for coord_pair in coord_pairs:
-            coords = coord_pair.split(',')
-            if coords.__len__() == 2:
-                points.append(Point2d.cartesian(float(coords[0]), float(coords[1])))
+        for index in range(0, numbers.__len__() - 1, 2):
+            points.append(Point2d.cartesian(numbers[index], numbers[index + 1]))
         return points
 
     def parse_polyline(self, element: ET.Element) -> Optional[Polyline2d]:
@@ -150,222 +342,172 @@ class SVGImporter(Importer):
         return Polygon2d(Style(), points)
 
     def parse_path(self, element: ET.Element) -> Optional[Path2d]:
-        import re
         
-        components_str = element.attrib.get('d')
-        splittable_components = re.sub(r'([\s\n]+([MmAaLlQqCcZz]))', ';\g<2>', components_str)
-
         parsed_components: List[PathComponent] = list()
 
-        for component in splittable_components.split(";"):
-            command = component[0]
-            points_to_split = self.preparse_points_string(component[1:]).replace(',', ';')
-            parsed_component = self.parse_component(command, points_to_split)
+        for command, parameters in tokenize_path(element.attrib.get('d', '')):
+            parsed_component = self.parse_component(command, parameters)
             if parsed_component is None:
                 continue
             parsed_components.append(parsed_component)
 
         return Path2d(Style(), parsed_components)
 
-    def parse_component(self, command: str, config: str) -> Optional[PathComponent]:
+    def parse_component(self, command: str, parameters: List[float]) -> Optional[PathComponent]:
         if command == 'M':
-            return self.parse_M_command(config)
+            return self.parse_M_command(parameters)
         elif command == 'm':
-            return self.parse_m_command(config)
+            return self.parse_m_command(parameters)
         elif command == 'H':
-            return self.parse_H_command(config)
+            return self.parse_H_command(parameters)
         elif command == 'h':
-            return self.parse_h_command(config)
+            return self.parse_h_command(parameters)
         elif command == 'V':
-            return self.parse_V_command(config)
+            return self.parse_V_command(parameters)
         elif command == 'v':
-            return self.parse_v_command(config)
+            return self.parse_v_command(parameters)
         elif command == 'L':
-            return self.parse_L_command(config)
+            return self.parse_L_command(parameters)
         elif command == 'l':
-            return self.parse_l_command(config)
+            return self.parse_l_command(parameters)
         elif command == 'C':
-            return self.parse_C_command(config)
+            return self.parse_C_command(parameters)
         elif command == 'c':
-            return self.parse_c_command(config)
+            return self.parse_c_command(parameters)
         elif command == 'S':
-            return self.parse_S_command(config)
+            return self.parse_S_command(parameters)
         elif command == 's':
-            return self.parse_s_command(config)
+            return self.parse_s_command(parameters)
         elif command == 'Q':
-            return self.parse_Q_command(config)
+            return self.parse_Q_command(parameters)
         elif command == 'q':
-            return self.parse_q_command(config)
+            return self.parse_q_command(parameters)
         elif command == 'T':
-            return self.parse_T_command(config)
+            return self.parse_T_command(parameters)
         elif command == 't':
-            return self.parse_t_command(config)
+            return self.parse_t_command(parameters)
         elif command == 'A':
-            return self.parse_A_command(config)
+            return self.parse_A_command(parameters)
         elif command == 'a':
-            return self.parse_a_command(config)
+            return self.parse_a_command(parameters)
         elif command == 'Z':
-            return self.parse_Z_command(config)
+            return self.parse_Z_command(parameters)
         elif command == 'z':
-            return self.parse_Z_command(config)
+            return self.parse_Z_command(parameters)
 
 
 
-    def parse_M_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 2:
-            return None
-        return MoveOrigin(Point2d.cartesian(float(parameters[0]), float(parameters[1])))
+    def parse_M_command(self, parameters: List[float]) -> Optional[PathComponent]:
+        return MoveOrigin(Point2d.cartesian(parameters[0], parameters[1]))
 
-    def parse_m_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 2:
-            return None
-        return RelMoveOrigin(Vector2d.cartesian(float(parameters[0]), float(parameters[1])))
+    def parse_m_command(self, parameters: List[float]) -> Optional[PathComponent]:
+        return RelMoveOrigin(Vector2d.cartesian(parameters[0], parameters[1]))
 
-    def parse_H_command(self, config: str) -> Optional[PathComponent]:
-        return HorizontalLine(float(config))
+    def parse_H_command(self, parameters: List[float]) -> Optional[PathComponent]:
+        return HorizontalLine(parameters[0])
 
-    def parse_h_command(self, config: str) -> Optional[PathComponent]:
-        return RelHorizontalLine(float(config))
+    def parse_h_command(self, parameters: List[float]) -> Optional[PathComponent]:
+        return RelHorizontalLine(parameters[0])
 
-    def parse_V_command(self, config: str) -> Optional[PathComponent]:
-        return VerticalLine(float(config))
+    def parse_V_command(self, parameters: List[float]) -> Optional[PathComponent]:
+        return VerticalLine(parameters[0])
 
-    def parse_v_command(self, config: str) -> Optional[PathComponent]:
-        return RelVerticalLine(float(config))
+    def parse_v_command(self, parameters: List[float]) -> Optional[PathComponent]:
+        return RelVerticalLine(parameters[0])
 
-    def parse_L_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 2:
-            return None
-        return Line(Point2d.cartesian(float(parameters[0]), float(parameters[1])))
+    def parse_L_command(self, parameters: List[float]) -> Optional[PathComponent]:
+        return Line(Point2d.cartesian(parameters[0], parameters[1]))
 
-    def parse_l_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 2:
-            return None
-        return RelLine(Point2d.cartesian(float(parameters[0]), float(parameters[1])))
+    def parse_l_command(self, parameters: List[float]) -> Optional[PathComponent]:
+        return RelLine(Vector2d.cartesian(parameters[0], parameters[1]))
 
-    def parse_C_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 6:
-            return None
+    def parse_C_command(self, parameters: List[float]) -> Optional[PathComponent]:
         return CubicBezier(
-            Point2d.cartesian(float(parameters[0]), float(parameters[1])),
-            Point2d.cartesian(float(parameters[2]), float(parameters[3])),
-            Point2d.cartesian(float(parameters[4]), float(parameters[5])))
+            Point2d.cartesian(parameters[4], parameters[5]),
+            Point2d.cartesian(parameters[0], parameters[1]),
+            Point2d.cartesian(parameters[2], parameters[3]))
 
-    def parse_c_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 6:
-            return None
+    def parse_c_command(self, parameters: List[float]) -> Optional[PathComponent]:
         return RelCubicBezier(
-            Vector2d.cartesian(float(parameters[0]), float(parameters[1])),
-            Vector2d.cartesian(float(parameters[2]), float(parameters[3])),
-            Vector2d.cartesian(float(parameters[4]), float(parameters[5])))
+            Vector2d.cartesian(parameters[4], parameters[5]),
+            Vector2d.cartesian(parameters[0], parameters[1]),
+            Vector2d.cartesian(parameters[2], parameters[3]))
 
-    def parse_S_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 4:
-            return None
+    def parse_S_command(self, parameters: List[float]) -> Optional[PathComponent]:
         return StrugBezier(
-            Point2d.cartesian(float(parameters[0]), float(parameters[1])),
-            Point2d.cartesian(float(parameters[2]), float(parameters[3])))
+            Point2d.cartesian(parameters[2], parameters[3]),
+            Point2d.cartesian(parameters[0], parameters[1]))
 
-    def parse_s_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 4:
-            return None
+    def parse_s_command(self, parameters: List[float]) -> Optional[PathComponent]:
         return RelStrugBezier(
-            Vector2d.cartesian(float(parameters[0]), float(parameters[1])),
-            Vector2d.cartesian(float(parameters[2]), float(parameters[3])))
+            Vector2d.cartesian(parameters[2], parameters[3]),
+            Vector2d.cartesian(parameters[0], parameters[1]))
 
-    def parse_Q_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 4:
-            return None
+    def parse_Q_command(self, parameters: List[float]) -> Optional[PathComponent]:
         return Quadratic(
-            Point2d.cartesian(float(parameters[0]), float(parameters[1])),
-            Point2d.cartesian(float(parameters[2]), float(parameters[3])))
+            Point2d.cartesian(parameters[2], parameters[3]),
+            Point2d.cartesian(parameters[0], parameters[1]))
 
-    def parse_q_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 4:
-            return None
+    def parse_q_command(self, parameters: List[float]) -> Optional[PathComponent]:
         return RelQuadratic(
-            Vector2d.cartesian(float(parameters[0]), float(parameters[1])),
-            Vector2d.cartesian(float(parameters[2]), float(parameters[3])))
+            Vector2d.cartesian(parameters[2], parameters[3]),
+            Vector2d.cartesian(parameters[0], parameters[1]))
 
-    def parse_T_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 2:
-            return None
+    def parse_T_command(self, parameters: List[float]) -> Optional[PathComponent]:
         return ReflectedQuadratic(
-            Point2d.cartesian(float(parameters[0]), float(parameters[1])))
+            Point2d.cartesian(parameters[0], parameters[1]))
 
-    def parse_t_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 2:
-            return None
+    def parse_t_command(self, parameters: List[float]) -> Optional[PathComponent]:
         return RelReflectedQuadratic(
-            Vector2d.cartesian(float(parameters[0]), float(parameters[1])))
-
-    def parse_A_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 7:
-            return None
+            Vector2d.cartesian(parameters[0], parameters[1]))
 
+    def parse_A_command(self, parameters: List[float]) -> Optional[PathComponent]:
         if parameters[0] == parameters[1]:
             return SimpleArc(
-                Point2d.cartesian(float(parameters[5]), float(parameters[6])),
-                float(parameters[0]),
-                True if parameters[3] == '1' or parameters[3].lower() == 'true' else False,
-                True if parameters[4] == '1' or parameters[4].lower() == 'true' else False
+                Point2d.cartesian(parameters[5], parameters[6]),
+                parameters[0],
+                parameters[4] == 0,
+                parameters[3] != 0
                 )
         else:
             return Arc(
-                Point2d.cartesian(float(parameters[5]), float(parameters[6])),
-                Size2d(float(parameters[0]), float(parameters[1])),
-                float(parameters[2]),
-                True if parameters[3] == '1' or parameters[3].lower() == 'true' else False,
-                True if parameters[4] == '1' or parameters[4].lower() == 'true' else False
+                Point2d.cartesian(parameters[5], parameters[6]),
+                Size2d(parameters[0], parameters[1]),
+                math.radians(parameters[2]),
+                parameters[3] != 0,
+                parameters[4] != 0
                 )
 
-    def parse_a_command(self, config: str) -> Optional[PathComponent]:
-        parameters = config.split(';')
-        if parameters.__len__() != 7:
-            return None
-
+    def parse_a_command(self, parameters: List[float]) -> Optional[PathComponent]:
         if parameters[0] == parameters[1]:
             return RelSimpleArc(
-                Point2d.cartesian(float(parameters[5]), float(parameters[6])),
-                float(parameters[0]),
-                True if parameters[3] == '1' or parameters[3].lower() == 'true' else False,
-                True if parameters[4] == '1' or parameters[4].lower() == 'true' else False
+                Vector2d.cartesian(parameters[5], parameters[6]),
+                parameters[0],
+                parameters[4] == 0,
+                parameters[3] != 0
                 )
         return RelArc(
-            Vector2d.cartesian(float(parameters[5]), float(parameters[6])),
-            Size2d(float(parameters[0]), float(parameters[1])),
-            float(parameters[2]),
-            True if parameters[3] == '1' or parameters[3].lower() == 'true' else False,
-            True if parameters[4] == '1' or parameters[4].lower() == 'true' else False
+            Vector2d.cartesian(parameters[5], parameters[6]),
+            Size2d(parameters[0], parameters[1]),
+            math.radians(parameters[2]),
+            parameters[3] != 0,
+            parameters[4] != 0
             )
 
-    def parse_Z_command(self, config: str) -> Optional[PathComponent]:
+    def parse_Z_command(self, parameters: List[float]) -> Optional[PathComponent]:
         return ClosePath()
 
-    def parse_z_command(self, config: str) -> Optional[PathComponent]:
+    def parse_z_command(self, parameters: List[float]) -> Optional[PathComponent]:
         return ClosePath()
 
-    def parse_style(self, element: ET.Element) -> Optional[Style]:
+    def parse_style(self, attributes: Dict[str, str]) -> Optional[Style]:
         style = Style()
-        fill = element.attrib.get('fill')
+        fill = attributes.get('fill')
         if fill is not None:
             style.fill_style = FillStyle(fill)
 
-        stroke = element.attrib.get('stroke')
+        stroke = attributes.get('stroke')
         if stroke is not None:
             style.stroke_style = StrokeStyle(0.25, stroke)
         
-        return style
\ No newline at end of file
+        return style
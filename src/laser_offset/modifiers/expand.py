@@ -1,25 +1,83 @@
-from typing import Tuple, List, Optional
+from typing import Dict, Tuple, List, Optional, Type, Union
+from weakref import WeakKeyDictionary
 
+import warnings
+
+from laser_offset.geometry_2d.block2d import Block2d
 from laser_offset.geometry_2d.canvas2d import Canvas2d
 from laser_offset.geometry_2d.shape2d import Shape2d
-from laser_offset.modifiers.polygon_data import PolygonData
+from laser_offset.modifiers.polygon_data import PolygonData, ShapeSegment
 from laser_offset.geometry_2d.shapes_2d.path2d import Path2d
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d
 from laser_offset.geometry_2d.shapes_2d.circle2d import Circle2d
+from laser_offset.geometry_2d.shapes_2d.block_reference2d import BlockReference2d
+from laser_offset.math.float_functions import fclose
 from laser_offset.modifiers.segment_operations import expdand_segments, fix_segments, fix_loops, make_shape
 from laser_offset.modifiers.modifier import Modifier
+from laser_offset.modifiers.segment_index import SegmentIndex, GridSegmentIndex
+from laser_offset.modifiers.parallel_expand import expand_shapes_parallel, shape_size
+from laser_offset.modifiers.segment_operations_numpy import expand_segments_numpy, numpy_available
+from laser_offset.modifiers.offset_cache import OffsetCache
 
 
 class Expand(Modifier):
     
     expand_value: float
-    def __init__(self, expand_value: float):
-        self.expand_value = expand_value
+    expand_values: List[float]
+    segment_index: Type[SegmentIndex]
+    use_numpy: bool
+    workers: int
+    parallel_threshold: int
+    offset_cache: Optional[OffsetCache]
+
+    # Expanded shapes of every block by reference scale, block is expanded once for all its references
+    expanded_blocks: 'WeakKeyDictionary[Block2d, Dict[float, Block2d]]'
+
+    def __init__(self,
+        expand_value: Union[float, List[float]],
+        segment_index: Type[SegmentIndex] = GridSegmentIndex,
+        use_numpy: bool = False,
+        workers: int = 1,
+        parallel_threshold: int = 5000,
+        offset_cache: Optional[OffsetCache] = None
+        ):
+        # Several distances give several rings around every shape, in the same order
+        self.expand_values = list(expand_value) if isinstance(expand_value, (list, tuple)) else [expand_value]
+        self.expand_value = self.expand_values[0]
+        self.segment_index = segment_index
+        # Falls back to scalar expand when NumPy is not installed
+        self.use_numpy = use_numpy and numpy_available
+        # Drawings with less path components than threshold are expanded in this process
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        self.offset_cache = offset_cache
+        self.expanded_blocks = WeakKeyDictionary()
         
-    def perform_expand(self, polygon_data: PolygonData, shape: Shape2d, internal: bool = False) -> Optional[Shape2d]:
-        segments = expdand_segments(polygon_data, self.expand_value, internal)
-        fixed_segments = fix_segments(polygon_data, segments, self.expand_value, internal)
-        has_fixes, segments_with_fixed_loops = fix_loops(fixed_segments)
-        result_segments = fix_segments(polygon_data, segments_with_fixed_loops, self.expand_value, internal) if has_fixes else fixed_segments
+    def perform_expand(self, polygon_data: PolygonData, shape: Shape2d, internal: bool = False, expand_value: Optional[float] = None) -> Optional[Shape2d]:
+        expand_value = self.expand_value if expand_value is None else expand_value
+
+        cache_key = self.offset_cache.offset_key(shape, expand_value, internal, self.use_numpy) if self.offset_cache is not None else None
+        if cache_key is not None:
+            found, cached_shape = self.offset_cache.get(cache_key, shape.style)
+            if found:
+                return cached_shape
+
+        result_shape = self.perform_expand_uncached(polygon_data, shape, internal, expand_value)
+        if cache_key is not None:
+            self.offset_cache.put(cache_key, result_shape)
+        return result_shape
+
+    def perform_expand_uncached(self, polygon_data: PolygonData, shape: Shape2d, internal: bool, expand_value: float) -> Optional[Shape2d]:
+        if self.use_numpy:
+            segments = expand_segments_numpy(polygon_data, expand_value, internal)
+        else:
+            segments = expdand_segments(polygon_data, expand_value, internal)
+        return self.fix_expanded_segments(polygon_data, shape, segments, internal, expand_value)
+
+    def fix_expanded_segments(self, polygon_data: PolygonData, shape: Shape2d, segments: List[ShapeSegment], internal: bool, expand_value: float) -> Optional[Shape2d]:
+        fixed_segments = fix_segments(polygon_data, segments, expand_value, internal)
+        has_fixes, segments_with_fixed_loops = fix_loops(fixed_segments, self.segment_index)
+        result_segments = fix_segments(polygon_data, segments_with_fixed_loops, expand_value, internal) if has_fixes else fixed_segments
         
         result_shapes = make_shape(polygon_data, shape.style, result_segments)
         if result_shapes is None:
@@ -33,30 +91,81 @@ class Expand(Modifier):
 
         polygon_data: PolygonData = PolygonData.fromShape(shape)        
         result = [shape]
-        exp_shape = self.perform_expand(polygon_data, shape, False)
-        if exp_shape is not None:
-            result.append(exp_shape)
-        int_shape = self.perform_expand(polygon_data, shape, True)
-        if int_shape is not None:
-            result.append(int_shape)
+        for expand_value in self.expand_values:
+            exp_shape = self.perform_expand(polygon_data, shape, False, expand_value)
+            if exp_shape is not None:
+                result.append(exp_shape)
+            int_shape = self.perform_expand(polygon_data, shape, True, expand_value)
+            if int_shape is not None:
+                result.append(int_shape)
+        return result
+
+    def modifyPackedPath(self, shape: PackedPath2d) -> List[Shape2d]:
+        # Components live while this shape is expanded only, canvas keeps the packed source and packed rings
+        path = shape.toPath2d()
+        result = list()
+        for modified_shape in self.modifyPath(path):
+            if modified_shape is path:
+                result.append(shape)
+            elif isinstance(modified_shape, Path2d) and PackedPath2d.canPack(modified_shape):
+                result.append(PackedPath2d.fromPath2d(modified_shape))
+            else:
+                result.append(modified_shape)
         return result
 
     def modifyCircle(self, shape: Circle2d) -> List[Shape2d]:
         result = [shape]
-        result.append(Circle2d(shape.style, shape.centerPoint, shape.radius + self.expand_value))
-        result.append(Circle2d(shape.style, shape.centerPoint, shape.radius - self.expand_value))
+        for expand_value in self.expand_values:
+            result.append(Circle2d(shape.style, shape.centerPoint, shape.radius + expand_value))
+            result.append(Circle2d(shape.style, shape.centerPoint, shape.radius - expand_value))
         return result
     
+    def modifyBlockReference(self, shape: BlockReference2d) -> List[Shape2d]:
+        # Offset in block coordinates is the same only for not stretched references
+        if not shape.transform.isSimilarity:
+            result = list()
+            for transformed_shape in shape.transformedShapes:
+                # Stretched arcs are elliptic, they are kept as they are
+                if isinstance(transformed_shape, Path2d) and not PackedPath2d.canPack(transformed_shape):
+                    warnings.warn(f"Elliptic arcs of stretched block {shape.block.name} are not expanded", stacklevel=2)
+                    result.append(transformed_shape)
+                else:
+                    result += self.modifyShape(transformed_shape)
+            return result
+
+        scale = shape.transform.scaleFactor
+        block_results = self.expanded_blocks.setdefault(shape.block, dict())
+        if scale not in block_results:
+            modifier = self
+            if not fclose(scale, 1):
+                modifier = Expand(
+                    list(map(lambda expand_value: expand_value / scale, self.expand_values)),
+                    self.segment_index,
+                    self.use_numpy,
+                    self.workers,
+                    self.parallel_threshold,
+                    self.offset_cache)
+            block_results[scale] = Block2d(shape.block.name, modifier.modifyShapes(shape.block.shapes))
+
+        return [BlockReference2d(shape.style, block_results[scale], shape.transform)]
+
     def modifyShape(self, shape: Shape2d) -> List[Shape2d]:
         if isinstance(shape, Path2d):
             return self.modifyPath(shape)
+        elif isinstance(shape, PackedPath2d):
+            return self.modifyPackedPath(shape)
         elif isinstance(shape, Circle2d):
             return self.modifyCircle(shape)
+        elif isinstance(shape, BlockReference2d):
+            return self.modifyBlockReference(shape)
         else:
             print(f"Unknown shape {type(shape)} {shape}")
             return [shape]
     
     def modifyShapes(self, shapes: List[Shape2d]) -> List[Shape2d]:
+        if self.workers > 1 and sum(map(shape_size, shapes)) >= self.parallel_threshold:
+            return expand_shapes_parallel(self, shapes, self.workers)
+
         result = list()
             
         for shape in shapes:
@@ -0,0 +1,282 @@
+from array import array
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import hashlib
+import os
+import struct
+import tempfile
+
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.style2d import Style
+from laser_offset.geometry_2d.shapes_2d.path2d import Path2d
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d
+from laser_offset.modifiers.parallel_expand import can_pack_shape, pack_shape, unpack_shape
+
+# Changes when stored values change, so old disk entries are not used
+CACHE_VERSION = 1
+
+# Packages with the offset code, keys change when any of their sources change
+OFFSET_CODE_PACKAGES = ['modifiers', 'geometry_2d', 'math']
+
+# Disk size is scanned again after this part of the limit is written, other processes can share the folder
+RESCAN_FRACTION = 0.1
+
+# Stored value for an offset which gives no shape
+EMPTY_RESULT = b''
+
+# Hash of offset code sources, made once by offset_code_hash
+offset_code_digest: Optional[bytes] = None
+
+
+def offset_code_hash() -> bytes:
+    """Hash of CACHE_VERSION and sources of OFFSET_CODE_PACKAGES, so results of other releases and local changes are not used"""
+
+    global offset_code_digest
+    if offset_code_digest is not None:
+        return offset_code_digest
+
+    code_hash = hashlib.sha256(struct.pack('<i', CACHE_VERSION))
+    package_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    source_files = 0
+    for package in OFFSET_CODE_PACKAGES:
+        for folder, folder_names, file_names in os.walk(os.path.join(package_folder, package)):
+            folder_names.sort()
+            for file_name in sorted(file_names):
+                if not file_name.endswith('.py'):
+                    continue
+                file_path = os.path.join(folder, file_name)
+                try:
+                    with open(file_path, 'rb') as source:
+                        code_hash.update(os.path.relpath(file_path, package_folder).encode('utf-8'))
+                        code_hash.update(source.read())
+                        source_files += 1
+                except OSError:
+                    continue
+
+    # Sources are not found when the package is imported from an archive
+    if source_files == 0:
+        code_hash.update(package_version().encode('utf-8'))
+
+    offset_code_digest = code_hash.digest()
+    return offset_code_digest
+
+
+def package_version() -> str:
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        return "unknown"
+    try:
+        return version("laser_offset")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class OffsetCache:
+    """Offset results keyed by path geometry, distance and offset side
+
+    Keeps recent results in memory and, with cache_dir, in files limited by max_disk_size bytes.
+    Least recently used entries are dropped first.
+    """
+
+    memory_items: int
+    cache_dir: Optional[str]
+    max_disk_size: int
+
+    memory: 'OrderedDict[str, bytes]'
+    # Size of the disk store from the last scan with changes made by this process after it
+    disk_size: Optional[int]
+    written_since_scan: int
+
+    # Key of the last hashed shape, the same shape is expanded by every distance
+    last_shape: Optional[Shape2d]
+    last_geometry_key: Optional[str]
+
+    hits: int
+    misses: int
+
+    def __init__(self, memory_items: int = 4096, cache_dir: Optional[str] = None, max_disk_size: int = 256 * 1024 * 1024) -> None:
+        self.memory_items = memory_items
+        self.cache_dir = cache_dir
+        self.max_disk_size = max_disk_size
+        self.memory = OrderedDict()
+        self.disk_size = None
+        self.written_since_scan = 0
+        self.last_shape = None
+        self.last_geometry_key = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0
+
+    # ---- Keys
+
+    def geometry_key(self, shape: Shape2d) -> Optional[str]:
+        if shape is self.last_shape:
+            return self.last_geometry_key
+
+        self.last_shape = shape
+        self.last_geometry_key = self.hash_geometry(shape)
+        return self.last_geometry_key
+
+    def hash_geometry(self, shape: Shape2d) -> Optional[str]:
+        if isinstance(shape, Path2d):
+            if not PackedPath2d.canPack(shape):
+                return None
+            packed = PackedPath2d.fromPath2d(shape)
+        elif isinstance(shape, PackedPath2d):
+            packed = shape
+        else:
+            return None
+
+        geometry_hash = hashlib.sha256()
+        geometry_hash.update(offset_code_hash())
+        geometry_hash.update(struct.pack('<q', packed.__len__()))
+        for buffer in [packed.codes, packed.xs, packed.ys, packed.radiuses, packed.flags]:
+            geometry_hash.update(buffer.tobytes())
+        return geometry_hash.hexdigest()
+
+    def offset_key(self, shape: Shape2d, expand_value: float, internal: bool, use_numpy: bool) -> Optional[str]:
+        # NumPy and scalar expand may round differently, so their results are kept apart
+        geometry_key = self.geometry_key(shape)
+        if geometry_key is None:
+            return None
+        return hashlib.sha256(struct.pack('<d??', expand_value, internal, use_numpy) + geometry_key.encode('ascii')).hexdigest()
+
+    # ---- Values
+
+    def get(self, key: str, style: Style) -> Tuple[bool, Optional[Shape2d]]:
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+        else:
+            data = self.read_file(key)
+            if data is not None:
+                self.remember(key, data)
+
+        if data is None:
+            self.misses += 1
+            return (False, None)
+
+        self.hits += 1
+        if data == EMPTY_RESULT:
+            return (True, None)
+
+        values = array('d')
+        values.frombytes(data)
+        shape, _ = unpack_shape(values, 0, style)
+        return (True, shape)
+
+    def contains(self, key: str) -> bool:
+        # Not counted as hit or miss, value read from disk is kept in memory for the next get
+        if key in self.memory:
+            return True
+        data = self.read_file(key)
+        if data is None:
+            return False
+        self.remember(key, data)
+        return True
+
+    def put(self, key: str, shape: Optional[Shape2d]):
+        if shape is None:
+            data = EMPTY_RESULT
+        elif not can_pack_shape(shape):
+            return
+        else:
+            values = array('d')
+            pack_shape(shape, values)
+            data = values.tobytes()
+
+        self.store(key, data)
+
+    def store(self, key: str, data: bytes):
+        self.remember(key, data)
+        self.write_file(key, data)
+
+    def remember(self, key: str, data: bytes):
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while self.memory.__len__() > self.memory_items:
+            self.memory.popitem(last=False)
+
+    # ---- Disk store
+
+    def file_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + '.bin')
+
+    def read_file(self, key: str) -> Optional[bytes]:
+        if self.cache_dir is None:
+            return None
+
+        file_path = self.file_path(key)
+        try:
+            with open(file_path, 'rb') as cache_file:
+                data = cache_file.read()
+            # Access time for eviction order
+            os.utime(file_path)
+            return data
+        except OSError:
+            return None
+
+    def write_file(self, key: str, data: bytes):
+        if self.cache_dir is None:
+            return
+
+        file_path = self.file_path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # Overwritten file is not counted twice
+        try:
+            old_size = os.stat(file_path).st_size
+        except OSError:
+            old_size = 0
+
+        file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix='.tmp')
+        with os.fdopen(file_descriptor, 'wb') as cache_file:
+            cache_file.write(data)
+        os.replace(temp_path, file_path)
+        self.add_disk_size(data.__len__() - old_size)
+
+    def add_disk_size(self, size: int):
+        if self.disk_size is None or self.written_since_scan + size > self.max_disk_size * RESCAN_FRACTION:
+            self.disk_size = sum(map(lambda entry: entry[1], self.cache_files()))
+            self.written_since_scan = 0
+        else:
+            self.disk_size += size
+            self.written_since_scan += max(size, 0)
+
+        if self.disk_size > self.max_disk_size:
+            self.evict()
+
+    def cache_files(self):
+        result = list()
+        for folder, _, file_names in os.walk(self.cache_dir):
+            for file_name in file_names:
+                if not file_name.endswith('.bin'):
+                    continue
+                file_path = os.path.join(folder, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                result.append((file_path, stat.st_size, stat.st_mtime))
+        return result
+
+    def evict(self):
+        # Oldest files are removed until the store takes 90% of its limit
+        files = sorted(self.cache_files(), key=lambda entry: entry[2])
+        total_size = sum(map(lambda entry: entry[1], files))
+        for file_path, size, _ in files:
+            if total_size <= self.max_disk_size * 0.9:
+                break
+            try:
+                os.remove(file_path)
+                total_size -= size
+            except OSError:
+                pass
+        self.disk_size = total_size
+        self.written_since_scan = 0
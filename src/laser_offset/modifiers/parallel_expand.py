@@ -0,0 +1,255 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Type
+
+import sys
+
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.style2d import Style
+from laser_offset.geometry_2d.shapes_2d.circle2d import Circle2d
+from laser_offset.geometry_2d.shapes_2d.path2d import Path2d, PathComponent, MoveOrigin, Line, SimpleArc, ClosePath
+from laser_offset.geometry_2d.shapes_2d.packed_path2d import PackedPath2d, COMPONENT_MOVE, COMPONENT_LINE, COMPONENT_ARC, COMPONENT_CLOSE, FLAG_CW, FLAG_LARGE_ARC
+from laser_offset.modifiers.segment_index import SegmentIndex
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+# Shapes are sent to workers as flat arrays of doubles instead of pickled objects:
+#   path:   SHAPE_PATH, components count, then code, x, y, radius, flags for every component
+#   circle: SHAPE_CIRCLE, center x, center y, radius
+#   source: SHAPE_SOURCE, result is the shape which was sent to the worker
+# Component codes and flags are the same as in PackedPath2d
+SHAPE_PATH = 0
+SHAPE_CIRCLE = 1
+SHAPE_SOURCE = 2
+
+
+def can_pack_shape(shape: Shape2d) -> bool:
+    if isinstance(shape, Circle2d) or isinstance(shape, PackedPath2d):
+        return True
+    elif isinstance(shape, Path2d):
+        return PackedPath2d.canPack(shape)
+    return False
+
+
+def pack_shape(shape: Shape2d, output: array):
+    if isinstance(shape, Circle2d):
+        output.extend((SHAPE_CIRCLE, shape.centerPoint.x, shape.centerPoint.y, shape.radius))
+        return
+
+    if isinstance(shape, PackedPath2d):
+        output.extend((SHAPE_PATH, shape.__len__()))
+        for index in range(shape.__len__()):
+            output.extend((shape.codes[index], shape.xs[index], shape.ys[index], shape.radiuses[index], shape.flags[index]))
+        return
+
+    output.extend((SHAPE_PATH, shape.components.__len__()))
+    for component in shape.components:
+        if isinstance(component, MoveOrigin):
+            output.extend((COMPONENT_MOVE, component.target.x, component.target.y, 0, 0))
+        elif isinstance(component, Line):
+            output.extend((COMPONENT_LINE, component.target.x, component.target.y, 0, 0))
+        elif isinstance(component, SimpleArc):
+            flags = (FLAG_CW if component.cw_direction else 0) | (FLAG_LARGE_ARC if component.large_arc else 0)
+            output.extend((COMPONENT_ARC, component.target.x, component.target.y, component.radius, flags))
+        elif isinstance(component, ClosePath):
+            output.extend((COMPONENT_CLOSE, 0, 0, 0, 0))
+
+
+def unpack_shape(data: array, offset: int, style: Style) -> Tuple[Optional[Shape2d], int]:
+    kind = int(data[offset])
+
+    if kind == SHAPE_SOURCE:
+        return (None, offset + 1)
+
+    elif kind == SHAPE_CIRCLE:
+        return (Circle2d(style, Point2d.cartesian(data[offset+1], data[offset+2]), data[offset+3]), offset + 4)
+
+    count = int(data[offset+1])
+    offset += 2
+    components: List[PathComponent] = list()
+    for _ in range(count):
+        code = int(data[offset])
+        target = Point2d.cartesian(data[offset+1], data[offset+2])
+        if code == COMPONENT_MOVE:
+            components.append(MoveOrigin(target))
+        elif code == COMPONENT_LINE:
+            components.append(Line(target))
+        elif code == COMPONENT_ARC:
+            flags = int(data[offset+4])
+            components.append(SimpleArc(target, data[offset+3], bool(flags & FLAG_CW), bool(flags & FLAG_LARGE_ARC)))
+        else:
+            components.append(ClosePath())
+        offset += 5
+
+    return (Path2d(style, components), offset)
+
+
+def shape_size(shape: Shape2d) -> int:
+    if isinstance(shape, Path2d):
+        return shape.components.__len__()
+    elif isinstance(shape, PackedPath2d):
+        return shape.__len__()
+    return 1
+
+
+def is_cached(modifier: 'Expand', shape: Shape2d) -> bool:
+    # Every offset of the shape is in the cache, so it is not sent to workers
+    offset_cache = modifier.offset_cache
+    if offset_cache is None:
+        return False
+
+    for expand_value in modifier.expand_values:
+        for internal in (False, True):
+            key = offset_cache.offset_key(shape, expand_value, internal, modifier.use_numpy)
+            if key is None or not offset_cache.contains(key):
+                return False
+    return True
+
+
+def expand_packed_shapes(
+    memory_name: Optional[str],
+    data: Optional[bytes],
+    start: int,
+    end: int,
+    count: int,
+    expand_values: List[float],
+    segment_index: Type[SegmentIndex],
+    use_numpy: bool,
+    cache_results: bool
+) -> Tuple[bytes, List[int], List[Tuple[str, bytes]], int]:
+    """Worker part, expands `count` shapes packed between `start` and `end` items
+
+    Returns packed result shapes, number of results for every source shape,
+    and offset cache entries with number of misses when cache_results is set.
+    """
+
+    from laser_offset.modifiers.expand import Expand
+    from laser_offset.modifiers.offset_cache import OffsetCache
+
+    shapes_data = array('d')
+    if memory_name is not None:
+        memory = shared_memory.SharedMemory(name=memory_name)
+        try:
+            shapes_data.frombytes(bytes(memory.buf[start * shapes_data.itemsize:end * shapes_data.itemsize]))
+        finally:
+            memory.close()
+    else:
+        shapes_data.frombytes(data)
+
+    # Worker cache keeps entries in memory only, they are written by the cache of the parent process
+    offset_cache = OffsetCache(memory_items=sys.maxsize) if cache_results else None
+    modifier = Expand(expand_values, segment_index, use_numpy, offset_cache=offset_cache)
+
+    result = array('d')
+    result_counts: List[int] = list()
+    offset = 0
+    style = Style()
+    for _ in range(count):
+        shape, offset = unpack_shape(shapes_data, offset, style)
+        modified_shapes = modifier.modifyShape(shape)
+        for modified_shape in modified_shapes:
+            if modified_shape is shape:
+                result.append(SHAPE_SOURCE)
+            else:
+                pack_shape(modified_shape, result)
+        result_counts.append(modified_shapes.__len__())
+
+    if offset_cache is None:
+        return (result.tobytes(), result_counts, [], 0)
+    return (result.tobytes(), result_counts, list(offset_cache.memory.items()), offset_cache.misses)
+
+
+def expand_shapes_parallel(modifier: 'Expand', shapes: List[Shape2d], workers: int) -> List[Shape2d]:
+    """Spreads shapes between worker processes, result order is the same as in serial mode
+    """
+
+    packed = array('d')
+    # (first shape, shapes count, start item, end item) for every chunk
+    chunks: List[Tuple[int, int, int, int]] = list()
+
+    # Shapes with every offset in the cache are expanded in this process from the cache
+    offset_cache = modifier.offset_cache
+    packable = list(map(lambda shape: can_pack_shape(shape) and not is_cached(modifier, shape), shapes))
+    total_size = sum(map(lambda index: shape_size(shapes[index]) if packable[index] else 0, range(shapes.__len__())))
+    chunk_size = max(1, total_size // (workers * 4))
+
+    chunk_first = None
+    chunk_start = 0
+    chunk_size_left = chunk_size
+    for index, shape in enumerate(shapes):
+        if packable[index]:
+            if chunk_first is None:
+                chunk_first = index
+                chunk_start = packed.__len__()
+            pack_shape(shape, packed)
+            chunk_size_left -= shape_size(shape)
+
+        # Chunk ends on its size or on a shape which stays in this process
+        if chunk_first is not None and (chunk_size_left <= 0 or index == shapes.__len__() - 1 or not packable[index + 1]):
+            chunks.append((chunk_first, index + 1 - chunk_first, chunk_start, packed.__len__()))
+            chunk_first = None
+            chunk_size_left = chunk_size
+
+    memory = None
+    if shared_memory is not None and packed.__len__() > 0:
+        memory = shared_memory.SharedMemory(create=True, size=packed.__len__() * packed.itemsize)
+        memory.buf[:packed.__len__() * packed.itemsize] = packed.tobytes()
+
+    chunk_results = list()
+    try:
+        if chunks.__len__() > 0:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = list()
+                for first, count, start, end in chunks:
+                    futures.append(executor.submit(
+                        expand_packed_shapes,
+                        memory.name if memory is not None else None,
+                        None if memory is not None else packed[start:end].tobytes(),
+                        start,
+                        end,
+                        count,
+                        modifier.expand_values,
+                        modifier.segment_index,
+                        modifier.use_numpy,
+                        offset_cache is not None
+                    ))
+
+                chunk_results = list(map(lambda future: future.result(), futures))
+    finally:
+        if memory is not None:
+            memory.close()
+            memory.unlink()
+
+    results_by_shape: List[Optional[List[Shape2d]]] = [None] * shapes.__len__()
+    for (first, count, start, end), (result_bytes, result_counts, cache_entries, cache_misses) in zip(chunks, chunk_results):
+        if offset_cache is not None:
+            for key, data in cache_entries:
+                offset_cache.store(key, data)
+            offset_cache.misses += cache_misses
+
+        result_data = array('d')
+        result_data.frombytes(result_bytes)
+        offset = 0
+        for index in range(first, first + count):
+            shape = shapes[index]
+            shape_results: List[Shape2d] = list()
+            for _ in range(result_counts[index - first]):
+                result_shape, offset = unpack_shape(result_data, offset, shape.style)
+                if result_shape is None:
+                    result_shape = shape
+                elif isinstance(shape, PackedPath2d) and isinstance(result_shape, Path2d):
+                    result_shape = PackedPath2d.fromPath2d(result_shape)
+                shape_results.append(result_shape)
+            results_by_shape[index] = shape_results
+
+    result: List[Shape2d] = list()
+    for index, shape in enumerate(shapes):
+        if results_by_shape[index] is None:
+            results_by_shape[index] = modifier.modifyShape(shape)
+        result += results_by_shape[index]
+
+    return result
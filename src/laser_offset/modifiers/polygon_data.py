@@ -38,7 +38,7 @@ def vectors_from_component(prev_point: Point2d, component: PathComponent) -> Tup
     
     elif isinstance(component, SimpleArc):
         
-        arcinfo = ArcInfo.fromArc(prev_point, component.target, component.radius, component.large_arc, component.cw_direction)
+        arcinfo = component.arcInfo(prev_point)
         return (arcinfo.startVector, arcinfo.endVector)
         
     raise RuntimeError('Not Implemented')
@@ -0,0 +1,192 @@
+from abc import ABC
+from typing import Dict, List, Set, Tuple, Type, Union
+
+import bisect
+import heapq
+import math
+
+from laser_offset.geometry_2d.bounds_rect_2d import BoundsRect2d
+from laser_offset.geometry_2d.arc_segment_2d import ArcSegment2d
+from laser_offset.geometry_2d.segment_2d import Segment2d
+
+# Bounds are compared with this margin, so touching segments are never missed
+BOUNDS_TOLERANCE = 1e-4
+
+# Sweep line pieces this many times taller than average are not kept in y order
+TALL_PIECE_FACTOR = 8
+
+
+def bounds_overlap(a: BoundsRect2d, b: BoundsRect2d, tolerance: float = BOUNDS_TOLERANCE) -> bool:
+    return a.minX - tolerance <= b.maxX and b.minX - tolerance <= a.maxX and \
+           a.minY - tolerance <= b.maxY and b.minY - tolerance <= a.maxY
+
+
+class SegmentIndex(ABC):
+    """Finds segment pairs that may intersect
+
+    Implementations must return candidates for each segment in ascending order,
+    so that callers visit pairs in the same order as a plain double loop.
+    """
+
+    geometries: List[Union[ArcSegment2d, Segment2d]]
+    bounds: List[BoundsRect2d]
+
+    def __init__(self, geometries: List[Union[ArcSegment2d, Segment2d]]) -> None:
+        self.geometries = geometries
+        self.bounds = list(map(lambda geometry: geometry.maxBoundary, geometries))
+
+    def candidates(self, index: int) -> List[int]:
+        raise RuntimeError('Not Implemented')
+
+
+class BruteForceSegmentIndex(SegmentIndex):
+    """Reference index, every earlier segment is a candidate
+    """
+
+    def candidates(self, index: int) -> List[int]:
+        return list(range(index))
+
+
+class GridSegmentIndex(SegmentIndex):
+    """Uniform grid over segment bounds, earlier segments with overlapping bounds are candidates
+    """
+
+    min_x: float
+    min_y: float
+    max_x: float
+    max_y: float
+    cell_size: float
+    cells: Dict[Tuple[int, int], List[int]]
+
+    def __init__(self, geometries: List[Union[ArcSegment2d, Segment2d]]) -> None:
+        super().__init__(geometries)
+        self.cells = dict()
+        bounds = self.bounds
+
+        if bounds.__len__() == 0:
+            self.min_x = 0
+            self.min_y = 0
+            self.max_x = 0
+            self.max_y = 0
+            self.cell_size = 1
+            return
+
+        self.min_x = min(map(lambda rect: rect.minX, bounds))
+        self.min_y = min(map(lambda rect: rect.minY, bounds))
+        self.max_x = max(map(lambda rect: rect.maxX, bounds))
+        self.max_y = max(map(lambda rect: rect.maxY, bounds))
+
+        # Cell is about the size of an average segment
+        average_size = sum(map(lambda rect: max(rect.maxX - rect.minX, rect.maxY - rect.minY), bounds)) / bounds.__len__()
+        self.cell_size = max(average_size, BOUNDS_TOLERANCE * 10)
+
+        for index, rect in enumerate(bounds):
+            for cell in self.cells_for_bounds(rect):
+                self.cells.setdefault(cell, []).append(index)
+
+    def cell_coordinate(self, value: float, origin: float) -> int:
+        return math.floor((value - origin) / self.cell_size)
+
+    def cells_for_bounds(self, rect: BoundsRect2d) -> List[Tuple[int, int]]:
+        # Nothing is stored outside of overall bounds, so large arcs are clipped to them
+        start_x = self.cell_coordinate(max(rect.minX, self.min_x) - BOUNDS_TOLERANCE, self.min_x)
+        start_y = self.cell_coordinate(max(rect.minY, self.min_y) - BOUNDS_TOLERANCE, self.min_y)
+        end_x = self.cell_coordinate(min(rect.maxX, self.max_x) + BOUNDS_TOLERANCE, self.min_x)
+        end_y = self.cell_coordinate(min(rect.maxY, self.max_y) + BOUNDS_TOLERANCE, self.min_y)
+
+        return [(x, y) for x in range(start_x, end_x + 1) for y in range(start_y, end_y + 1)]
+
+    def candidates(self, index: int) -> List[int]:
+        rect = self.bounds[index]
+        result = set()
+        for cell in self.cells_for_bounds(rect):
+            for other_index in self.cells.get(cell, []):
+                if other_index >= index:
+                    # Cell lists are filled in index order
+                    break
+                if other_index not in result and bounds_overlap(rect, self.bounds[other_index]):
+                    result.add(other_index)
+
+        return sorted(result)
+
+
+class SweepLineSegmentIndex(SegmentIndex):
+    """Sweeps a vertical line over x-monotone pieces of segments
+
+    Arcs are split at 0 and pi, so every piece is reported while the line crosses it.
+    Pieces which are active at the same time and overlap by y are candidates.
+    Active pieces are sorted by minY, so only pieces which start in y range of the new piece are visited.
+    """
+
+    pairs: List[List[int]]
+
+    def __init__(self, geometries: List[Union[ArcSegment2d, Segment2d]]) -> None:
+        super().__init__(geometries)
+
+        pieces: List[Tuple[BoundsRect2d, int]] = list()
+        for index, geometry in enumerate(geometries):
+            for rect in geometry.monotoneBounds:
+                pieces.append((rect, index))
+        pieces.sort(key=lambda piece: piece[0].minX)
+
+        found: List[Set[int]] = [set() for _ in geometries]
+
+        if pieces.__len__() == 0:
+            self.pairs = list()
+            return
+
+        # Pieces much taller than average are checked with every active piece, others are found by minY range
+        average_height = sum(map(lambda piece: piece[0].maxY - piece[0].minY, pieces)) / pieces.__len__()
+        tall_height = max(average_height * TALL_PIECE_FACTOR, BOUNDS_TOLERANCE * 10)
+        short_height = max(map(lambda piece: piece[0].maxY - piece[0].minY if piece[0].maxY - piece[0].minY <= tall_height else 0, pieces))
+
+        # Heap of pieces crossed by sweep line, ordered by their right end
+        active: List[Tuple[float, int, BoundsRect2d, int]] = list()
+        # Active short pieces as (minY, order) in ascending order and their maxY and segment index by order
+        active_keys: List[Tuple[float, int]] = list()
+        active_short: Dict[int, Tuple[float, int]] = dict()
+        active_tall: Dict[int, Tuple[BoundsRect2d, int]] = dict()
+
+        for order, (rect, index) in enumerate(pieces):
+
+            while active.__len__() > 0 and active[0][0] < rect.minX - BOUNDS_TOLERANCE:
+                _, removed_order, removed_rect, _ = heapq.heappop(active)
+                if removed_order in active_tall:
+                    del active_tall[removed_order]
+                else:
+                    del active_short[removed_order]
+                    del active_keys[bisect.bisect_left(active_keys, (removed_rect.minY, removed_order))]
+
+            min_y = rect.minY - BOUNDS_TOLERANCE
+            max_y = rect.maxY + BOUNDS_TOLERANCE
+
+            # Short piece which overlaps by y starts not lower than short_height below the new piece
+            first = bisect.bisect_left(active_keys, (min_y - short_height,))
+            last = bisect.bisect_right(active_keys, (max_y, math.inf))
+            for _, other_order in active_keys[first:last]:
+                other_max_y, other_index = active_short[other_order]
+                if other_index != index and min_y <= other_max_y:
+                    found[max(index, other_index)].add(min(index, other_index))
+
+            for other_rect, other_index in active_tall.values():
+                if other_index != index and min_y <= other_rect.maxY and other_rect.minY <= max_y:
+                    found[max(index, other_index)].add(min(index, other_index))
+
+            heapq.heappush(active, (rect.maxX, order, rect, index))
+            if rect.maxY - rect.minY > tall_height:
+                active_tall[order] = (rect, index)
+            else:
+                active_short[order] = (rect.maxY, index)
+                bisect.insort(active_keys, (rect.minY, order))
+
+        self.pairs = list(map(sorted, found))
+
+    def candidates(self, index: int) -> List[int]:
+        return self.pairs[index]
+
+# Index classes by name, for command line options
+SEGMENT_INDEXES: Dict[str, Type[SegmentIndex]] = {
+    'grid': GridSegmentIndex,
+    'sweep': SweepLineSegmentIndex,
+    'brute': BruteForceSegmentIndex
+}
@@ -1,4 +1,4 @@
-from typing import List, Tuple, Optional
+from typing import List, NamedTuple, Tuple, Optional, Type, Union
 import math
 
 from laser_offset.modifiers.polygon_data import PolygonData, ShapeSegment
@@ -12,75 +12,128 @@ from laser_offset.geometry_2d.arc_segment_2d import ArcSegment2d
 from laser_offset.geometry_2d.segment_2d import Segment2d
 from laser_offset.geometry_2d.arc_info import ArcInfo
 from laser_offset.geometry_2d.shapes_2d.path2d import PathComponent
+from laser_offset.modifiers.segment_index import SegmentIndex, GridSegmentIndex
 
-def expdand_segments(polygon_data: PolygonData, shift_distance: float, internal: bool = False) -> List[ShapeSegment]:
+# Number of segment intersection tests made by fix_segments and fix_loops
+intersection_tests: int = 0
 
-    ext_segments: List[ShapeSegment] = list()
-    shift_sign = (1 if polygon_data.clockwise else -1) * (-1 if internal else 1)
-    radius_sign = (1 if polygon_data.clockwise else -1)
+# Number of loops found by fix_loops
+removed_loops: int = 0
 
-    # External segments
-    for index, segment in enumerate(polygon_data.segments):
+class SegmentOffsetData(NamedTuple):
+    """Part of segment offset which does not depend on offset side
+    """
+    segment: ShapeSegment
+    extend_line: bool
+    start_extension: Optional[Vector2d]
+    end_extension: Optional[Vector2d]
+    radius_direction: int
 
-        start_shift_vector = Vector2d.polar( shift_distance, normalize_angle(segment.start_vector.da + shift_sign * math.pi / 2 ))
-        end_shift_vector = Vector2d.polar( shift_distance, normalize_angle(segment.end_vector.da + shift_sign * math.pi / 2 ))
 
-        new_start_point = segment.start_point + start_shift_vector
-        new_end_point = segment.end_point + end_shift_vector
-        
+def segments_offset_data(polygon_data: PolygonData, shift_distance: float) -> List[SegmentOffsetData]:
+
+    result: List[SegmentOffsetData] = list()
+    angle_range = 5 * math.pi / 180
+
+    for index, segment in enumerate(polygon_data.segments):
+
         prev_segment = polygon_data.segments[index-1]
-        
-        angle_range = 5 * math.pi / 180
 
         on_line = fclose(prev_segment.end_vector.da, segment.start_vector.da, angle_range) or \
                   fclose(prev_segment.end_vector.da, segment.start_vector.da - 2 * math.pi, angle_range) or \
                   fclose(prev_segment.end_vector.da - 2 * math.pi, segment.start_vector.da, angle_range)
 
-        if not on_line and not segment.is_arc and segment.start_point.distance(segment.end_point) < shift_distance:
-            new_start_point += segment.start_vector.inverted.single_vector * (shift_distance)
-            new_end_point += segment.end_vector.single_vector * (shift_distance)
+        # Short lines between corners are extended along themselves to keep corners sharp
+        extend_line = not on_line and not segment.is_arc and segment.start_point.distance(segment.end_point) < shift_distance
+
+        result.append(SegmentOffsetData(
+            segment=segment,
+            extend_line=extend_line,
+            start_extension=segment.start_vector.inverted.single_vector * (shift_distance) if extend_line else None,
+            end_extension=segment.end_vector.single_vector * (shift_distance) if extend_line else None,
+            radius_direction=(-1 if not polygon_data.clockwise == segment.component.cw_direction else 1) if segment.is_arc else 0
+        ))
+
+    return result
+
+
+def expand_segment(offset_data: SegmentOffsetData, clockwise: bool, shift_distance: float, internal: bool) -> Optional[ShapeSegment]:
+
+    segment = offset_data.segment
+    shift_sign = (1 if clockwise else -1) * (-1 if internal else 1)
+
+    start_shift_vector = Vector2d.polar( shift_distance, normalize_angle(segment.start_vector.da + shift_sign * math.pi / 2 ))
+    end_shift_vector = Vector2d.polar( shift_distance, normalize_angle(segment.end_vector.da + shift_sign * math.pi / 2 ))
+
+    new_start_point = segment.start_point + start_shift_vector
+    new_end_point = segment.end_point + end_shift_vector
+
+    if offset_data.extend_line:
+        new_start_point += offset_data.start_extension
+        new_end_point += offset_data.end_extension
+
+    if segment.is_arc:
+
+        new_radius = segment.component.radius + shift_distance * offset_data.radius_direction * (-1 if internal else 1)
+
+        if fzero(new_radius) or new_radius < 0:
+            return None
+
+        new_arc = SimpleArc(new_end_point, new_radius, segment.component.cw_direction, segment.component.large_arc)
+
+        return ShapeSegment(
+            component=new_arc,
+            start_point=new_start_point,
+            end_point=new_end_point,
+            start_vector=segment.start_vector,
+            end_vector=segment.end_vector,
+            is_arc=True
+        )
+
+    else:
+
+        new_line = Line(new_end_point)
+
+        return ShapeSegment(
+            component=new_line,
+            start_point=new_start_point,
+            end_point=new_end_point,
+            start_vector=segment.start_vector,
+            end_vector=segment.end_vector,
+            is_arc=False
+        )
+
+
+def expdand_segments(polygon_data: PolygonData, shift_distance: float, internal: bool = False) -> List[ShapeSegment]:
+
+    ext_segments: List[ShapeSegment] = list()
+
+    for offset_data in segments_offset_data(polygon_data, shift_distance):
+        new_segment = expand_segment(offset_data, polygon_data.clockwise, shift_distance, internal)
+        if new_segment is not None:
+            ext_segments.append(new_segment)
 
-        if segment.is_arc:
-            
-            new_radius = segment.component.radius + shift_distance * (-1 if not polygon_data.clockwise == segment.component.cw_direction else 1) * (-1 if internal else 1)
-            
-            if fzero(new_radius) or new_radius < 0:
-                continue
-                        
-            new_arc = SimpleArc(new_end_point, new_radius, segment.component.cw_direction, segment.component.large_arc)
-            
-            ext_segments.append(ShapeSegment(
-                component=new_arc,
-                start_point=new_start_point,
-                end_point=new_end_point,
-                start_vector=segment.start_vector,
-                end_vector=segment.end_vector,
-                is_arc=True
-            ))
-        
-        else:
-            
-            new_line = Line(new_end_point)
-
-            ext_segments.append(ShapeSegment(
-                component=new_line,
-                start_point=new_start_point,
-                end_point=new_end_point,
-                start_vector=segment.start_vector,
-                end_vector=segment.end_vector,
-                is_arc=False
-            ))
-            
     return ext_segments
 
 
 # ---- ---- ---- ---- ---- ----
 
 
+def segment_geometry(segment: ShapeSegment) -> Union[ArcSegment2d, Segment2d]:
+    if segment.is_arc:
+        return ArcSegment2d.fromArc(segment.start_point, segment.component)
+    else:
+        return Segment2d(segment.start_point, segment.end_point)
+
+
 def fix_segments(polygon_data: PolygonData, new_segments: List[ShapeSegment], shift_distance: float, internal: bool = False) -> List[ShapeSegment]:
     
     if new_segments.__len__() == 0:
         return []
+
+    # Every segment is tested with the previous one
+    global intersection_tests
+    intersection_tests += new_segments.__len__()
     
     result: List[ShapeSegment] = list()
     prev_segment = new_segments[-1]
@@ -90,15 +143,8 @@ def fix_segments(polygon_data: PolygonData, new_segments: List[ShapeSegment], sh
         
         fixed_segment = segment
         
-        if prev_segment.is_arc:
-            ab = ArcSegment2d.fromArc(prev_segment.start_point, prev_segment.component)
-        else:
-            ab = Segment2d(prev_segment.start_point, prev_segment.end_point)
-            
-        if segment.is_arc:
-            cd = ArcSegment2d.fromArc(segment.start_point, segment.component)
-        else:
-            cd = Segment2d(segment.start_point, segment.end_point)
+        ab = segment_geometry(prev_segment)
+        cd = segment_geometry(segment)
         
         intersections = ab.intersection(cd)
                 
@@ -147,12 +193,12 @@ def fix_segments(polygon_data: PolygonData, new_segments: List[ShapeSegment], sh
                           fclose(prev_segment.end_vector.da - 2 * math.pi, segment.start_vector.da, angle_range)
                                 
                 arc_proposal = SimpleArc(segment.start_point, shift_distance, not arc_direction, False)
-                arc_info = ArcInfo.fromArc(prev_segment.end_point, arc_proposal.target, arc_proposal.radius, arc_proposal.large_arc, arc_proposal.cw_direction)
+                arc_info = arc_proposal.arcInfo(prev_segment.end_point)
                                                                     
                 if fle(segment.start_point.distance(prev_segment.end_point), shift_distance) and on_line and arc_info.radius <= shift_distance:
                     result.append(ShapeSegment(Line(segment.start_point), prev_segment.end_point, segment.start_point, prev_segment.end_vector, segment.start_vector, False))
                 else:
-                    result.append(ShapeSegment(SimpleArc(segment.start_point, shift_distance, not arc_direction, False), prev_segment.end_point, segment.start_point, prev_segment.end_vector, segment.start_vector, True))
+                    result.append(ShapeSegment(arc_proposal, prev_segment.end_point, segment.start_point, prev_segment.end_vector, segment.start_vector, True))
 
         if index == new_segments.__len__() - 1 and first_segment_fix is not None:
             fixed_segment = ShapeSegment(
@@ -174,35 +220,46 @@ def fix_segments(polygon_data: PolygonData, new_segments: List[ShapeSegment], sh
 # ---- ---- ---- ---- ---- ----
 
 
-def fix_loops(segments: List[ShapeSegment]) -> Tuple[bool, List[ShapeSegment]]:
-            
+def fix_loops(segments: List[ShapeSegment], segment_index: Type[SegmentIndex] = GridSegmentIndex) -> Tuple[bool, List[ShapeSegment]]:
+    """Removes loops between self-intersecting segments
+
+    segment_index selects candidate pairs, BruteForceSegmentIndex checks every pair and gives the reference result
+    """
+
+    # Only non-adjacent segments can form a loop
+    if segments.__len__() < 4:
+        return (False, segments)
+
     items_to_remove: List[int] = list()
-    
-    for index, segment in enumerate(segments):
-        
-        for prev_index, prev_segment in enumerate(segments[:index]):
-                    
-            if prev_segment.is_arc:
-                ab = ArcSegment2d.fromArc(prev_segment.start_point, prev_segment.component)
-            else:
-                ab = Segment2d(prev_segment.start_point, prev_segment.end_point)
 
-            if segment.is_arc:
-                cd = ArcSegment2d.fromArc(segment.start_point, segment.component)
-            else:
-                cd = Segment2d(segment.start_point, segment.end_point)
-                
-            intersections = ab.intersection(cd)
-                        
-            if intersections.__len__() >= 1 and abs(prev_index-index) > 1 and not (index == segments.__len__() -1 and prev_index == 0):
+    geometries = list(map(segment_geometry, segments))
+    index_of_segments = segment_index(geometries)
+    last_index = segments.__len__() - 1
+    tests = 0
+
+    for index, cd in enumerate(geometries):
+
+        for prev_index in index_of_segments.candidates(index):
+
+            if abs(prev_index-index) <= 1 or (index == last_index and prev_index == 0):
+                continue
+
+            tests += 1
+            intersections = geometries[prev_index].intersection(cd)
+
+            if intersections.__len__() >= 1:
                 items_to_remove.append(range(prev_index+1, index))
+
+    global intersection_tests, removed_loops
+    intersection_tests += tests
+    removed_loops += items_to_remove.__len__()
     
     if items_to_remove.__len__() == 0:
         return (False, segments)
 
-    result_indexes = list()
+    result_indexes = set()
     for items_range in items_to_remove:
-        result_indexes += list(items_range)
+        result_indexes.update(items_range)
     
     new_segments = [i for j, i in enumerate(segments) if j not in result_indexes]
     
@@ -0,0 +1,124 @@
+from typing import List, NamedTuple
+import math
+
+from laser_offset.modifiers.polygon_data import PolygonData, ShapeSegment
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.shapes_2d.path2d import SimpleArc, Line
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# NumPy is optional, expdand_segments is used without it
+numpy_available: bool = numpy is not None
+
+
+class SegmentArrays(NamedTuple):
+    """Contour segments as arrays, one item per segment
+    """
+    start_x: 'numpy.ndarray'
+    start_y: 'numpy.ndarray'
+    end_x: 'numpy.ndarray'
+    end_y: 'numpy.ndarray'
+    start_angle: 'numpy.ndarray'
+    end_angle: 'numpy.ndarray'
+    radius: 'numpy.ndarray'
+    is_arc: 'numpy.ndarray'
+    cw_direction: 'numpy.ndarray'
+    on_line: 'numpy.ndarray'
+
+    @classmethod
+    def fromPolygonData(cls, polygon_data: PolygonData) -> 'SegmentArrays':
+
+        segments = polygon_data.segments
+
+        start_angle = numpy.array([segment.start_vector.da for segment in segments], dtype=float)
+        end_angle = numpy.array([segment.end_vector.da for segment in segments], dtype=float)
+
+        # Same test as in segments_offset_data
+        angle_range = 5 * math.pi / 180
+        prev_end_angle = numpy.roll(end_angle, 1)
+        on_line = (numpy.abs(prev_end_angle - start_angle) < angle_range) | \
+                  (numpy.abs(prev_end_angle - (start_angle - 2 * math.pi)) < angle_range) | \
+                  (numpy.abs((prev_end_angle - 2 * math.pi) - start_angle) < angle_range)
+
+        return SegmentArrays(
+            start_x=numpy.array([segment.start_point.x for segment in segments], dtype=float),
+            start_y=numpy.array([segment.start_point.y for segment in segments], dtype=float),
+            end_x=numpy.array([segment.end_point.x for segment in segments], dtype=float),
+            end_y=numpy.array([segment.end_point.y for segment in segments], dtype=float),
+            start_angle=start_angle,
+            end_angle=end_angle,
+            radius=numpy.array([segment.component.radius if segment.is_arc else 0 for segment in segments], dtype=float),
+            is_arc=numpy.array([segment.is_arc for segment in segments], dtype=bool),
+            cw_direction=numpy.array([segment.component.cw_direction if segment.is_arc else False for segment in segments], dtype=bool),
+            on_line=on_line
+        )
+
+
+def expand_segment_arrays(polygon_data: PolygonData, arrays: SegmentArrays, shift_distance: float, internal: bool = False) -> List[ShapeSegment]:
+
+    shift_sign = (1 if polygon_data.clockwise else -1) * (-1 if internal else 1)
+
+    start_shift_angle = arrays.start_angle + shift_sign * math.pi / 2
+    end_shift_angle = arrays.end_angle + shift_sign * math.pi / 2
+
+    new_start_x = arrays.start_x + shift_distance * numpy.cos(start_shift_angle)
+    new_start_y = arrays.start_y + shift_distance * numpy.sin(start_shift_angle)
+    new_end_x = arrays.end_x + shift_distance * numpy.cos(end_shift_angle)
+    new_end_y = arrays.end_y + shift_distance * numpy.sin(end_shift_angle)
+
+    # Short lines between corners are extended along themselves
+    length = numpy.hypot(arrays.end_x - arrays.start_x, arrays.end_y - arrays.start_y)
+    extend_line = ~arrays.on_line & ~arrays.is_arc & (length < shift_distance)
+    extension = numpy.where(extend_line, shift_distance, 0.0)
+
+    new_start_x -= extension * numpy.cos(arrays.start_angle)
+    new_start_y -= extension * numpy.sin(arrays.start_angle)
+    new_end_x += extension * numpy.cos(arrays.end_angle)
+    new_end_y += extension * numpy.sin(arrays.end_angle)
+
+    radius_direction = numpy.where(arrays.cw_direction == polygon_data.clockwise, 1, -1)
+    new_radius = arrays.radius + shift_distance * radius_direction * (-1 if internal else 1)
+
+    # Arcs which collapse to a point or turn inside out are dropped
+    keep = ~arrays.is_arc | ~((numpy.abs(new_radius) < 1e-5) | (new_radius < 0))
+
+    ext_segments: List[ShapeSegment] = list()
+
+    for index, start_x, start_y, end_x, end_y, radius in zip(
+        numpy.flatnonzero(keep).tolist(),
+        new_start_x[keep].tolist(),
+        new_start_y[keep].tolist(),
+        new_end_x[keep].tolist(),
+        new_end_y[keep].tolist(),
+        new_radius[keep].tolist()
+    ):
+        segment = polygon_data.segments[index]
+        new_start_point = Point2d.cartesian(start_x, start_y)
+        new_end_point = Point2d.cartesian(end_x, end_y)
+
+        if segment.is_arc:
+            component = SimpleArc(new_end_point, radius, segment.component.cw_direction, segment.component.large_arc)
+        else:
+            component = Line(new_end_point)
+
+        ext_segments.append(ShapeSegment(
+            component=component,
+            start_point=new_start_point,
+            end_point=new_end_point,
+            start_vector=segment.start_vector,
+            end_vector=segment.end_vector,
+            is_arc=segment.is_arc
+        ))
+
+    return ext_segments
+
+
+def expand_segments_numpy(polygon_data: PolygonData, shift_distance: float, internal: bool = False) -> List[ShapeSegment]:
+    if polygon_data.segments.__len__() == 0:
+        return []
+
+    arrays = SegmentArrays.fromPolygonData(polygon_data)
+    return expand_segment_arrays(polygon_data, arrays, shift_distance, internal)
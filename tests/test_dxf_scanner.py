@@ -0,0 +1,94 @@
+from array import array
+from enum import Enum
+from pathlib import Path
+from typing import Any, List
+
+import ezdxf
+import pytest
+
+from laser_offset.geometry_2d.canvas2d import Canvas2d
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.importers.dxf_importer import DXFImporter
+
+SAMPLE_FOLDER = Path(__file__).parent.parent / "sample"
+SAMPLE_FILES = sorted(filter(lambda path: path.suffix.lower() == '.dxf', SAMPLE_FOLDER.iterdir()))
+
+
+def describe(value: Any) -> Any:
+    """Plain tuples with every field of shapes, points, blocks and styles, so shapes of both readers can be compared"""
+
+    if isinstance(value, Point2d):
+        return ('Point2d', value.x, value.y)
+    if isinstance(value, (bool, int, float, str, Enum)) or value is None:
+        return value
+    if isinstance(value, (list, tuple, array)):
+        return tuple(map(describe, value))
+    if isinstance(value, dict):
+        return tuple(sorted(map(lambda item: (item[0], describe(item[1])), value.items())))
+    return (type(value).__name__, describe(vars(value)))
+
+
+def describe_canvas(canvas: Canvas2d) -> Any:
+    return (describe(canvas.center), describe(canvas.size), describe(canvas.shapes))
+
+
+def import_canvas(path: Path, fast_scan: bool, packed_paths: bool = False) -> Canvas2d:
+    with open(path, "rt") as reader:
+        return DXFImporter(packed_paths=packed_paths, fast_scan=fast_scan).import_canvas(False, reader)
+
+
+def import_shapes(path: Path, fast_scan: bool) -> List[Any]:
+    with open(path, "rt") as reader:
+        return list(DXFImporter(fast_scan=fast_scan).import_shapes(reader))
+
+
+@pytest.fixture(scope="module")
+def generated_file(tmp_path_factory) -> Path:
+    # Entities which samples do not have: bulges, closed polylines, rational and closed splines, blocks, paper space
+    doc = ezdxf.new()
+    model_space = doc.modelspace()
+    model_space.add_line((0, 0), (10, 5))
+    model_space.add_arc((5, 5), 3, 30, 250)
+    model_space.add_circle((20, 20), 4)
+    model_space.add_lwpolyline([(0, 0, 0, 0, 0), (10, 0, 0, 0, 0.5), (10, 10, 0, 0, -1.5), (0, 10, 0, 0, 0)], close=True)
+    model_space.add_lwpolyline([(20, 0, 0, 0, 0), (30, 0, 0, 0, 0.3), (30, 10, 0, 0, 0)])
+    model_space.add_open_spline([(40, 0), (43, 8), (47, 8), (50, 0)])
+    model_space.add_rational_spline([(60, 0), (63, 8), (67, 8), (70, 0)], [1, 2, 2, 1])
+    closed_spline = model_space.add_open_spline([(80, 0), (85, 8), (90, 0), (85, -8), (80, 0)])
+    closed_spline.closed = True
+    model_space.add_ellipse((0, 40), major_axis=(5, 0), ratio=0.5)
+
+    block = doc.blocks.new(name="PART")
+    block.add_lwpolyline([(0, 0), (4, 0), (4, 2), (0, 2)], close=True)
+    block.add_circle((2, 1), 0.5)
+    model_space.add_blockref("PART", (100, 0))
+    model_space.add_blockref("PART", (110, 0), dxfattribs={'rotation': 30, 'xscale': 2, 'yscale': 2})
+
+    doc.layout('Layout1').add_line((0, 0), (1, 1))
+
+    path = tmp_path_factory.mktemp("dxf") / "generated.dxf"
+    doc.saveas(path)
+    return path
+
+
+@pytest.mark.parametrize("path", SAMPLE_FILES, ids=lambda path: path.name)
+def test_samples_same_as_ezdxf(path: Path):
+    assert describe_canvas(import_canvas(path, True)) == describe_canvas(import_canvas(path, False))
+
+
+@pytest.mark.parametrize("path", SAMPLE_FILES, ids=lambda path: path.name)
+def test_samples_packed_same_as_ezdxf(path: Path):
+    assert describe_canvas(import_canvas(path, True, True)) == describe_canvas(import_canvas(path, False, True))
+
+
+@pytest.mark.parametrize("path", SAMPLE_FILES, ids=lambda path: path.name)
+def test_samples_streaming_same_as_ezdxf(path: Path):
+    assert describe(import_shapes(path, True)) == describe(import_shapes(path, False))
+
+
+def test_generated_same_as_ezdxf(generated_file: Path):
+    canvas = import_canvas(generated_file, True)
+    assert canvas.shapes.__len__() > 0
+    assert describe_canvas(canvas) == describe_canvas(import_canvas(generated_file, False))
+    assert describe_canvas(import_canvas(generated_file, True, True)) == describe_canvas(import_canvas(generated_file, False, True))
+
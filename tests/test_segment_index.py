@@ -0,0 +1,82 @@
+from typing import List, Tuple
+
+import math
+
+import pytest
+
+from laser_offset.geometry_2d.point2d import Point2d
+from laser_offset.geometry_2d.style2d import Style
+from laser_offset.geometry_2d.shapes_2d.path2d import Path2d, PathComponent, MoveOrigin, Line, SimpleArc, ClosePath
+from laser_offset.modifiers.polygon_data import PolygonData, ShapeSegment
+from laser_offset.modifiers.segment_index import BruteForceSegmentIndex, GridSegmentIndex, SweepLineSegmentIndex
+from laser_offset.modifiers.segment_operations import expdand_segments, fix_segments, fix_loops, segment_geometry
+
+
+def rounded_comb(teeth: int) -> Path2d:
+    # Horizontal teeth with round ends, gaps are narrower than the offset, so the outer ring has loops
+    components: List[PathComponent] = [MoveOrigin(Point2d.cartesian(0, 0))]
+    for tooth in range(teeth):
+        y = tooth * 1.0
+        components.append(Line(Point2d.cartesian(20, y)))
+        components.append(SimpleArc(Point2d.cartesian(20, y + 0.6), 0.3, False, False))
+        components.append(Line(Point2d.cartesian(0, y + 0.6)))
+        components.append(Line(Point2d.cartesian(0, y + 1.0)))
+    components.append(ClosePath())
+    return Path2d(Style(), components)
+
+
+def star(rays: int) -> Path2d:
+    components: List[PathComponent] = list()
+    for ray in range(rays):
+        angle = 2 * math.pi * ray / rays
+        point = Point2d.cartesian(10 * math.cos(angle), 10 * math.sin(angle))
+        components.append(Line(point) if ray > 0 else MoveOrigin(point))
+        angle += math.pi / rays
+        components.append(Line(Point2d.cartesian(2 * math.cos(angle), 2 * math.sin(angle))))
+    components.append(ClosePath())
+    return Path2d(Style(), components)
+
+
+def offset_ring(shape: Path2d, expand_value: float, internal: bool) -> List[ShapeSegment]:
+    polygon_data = PolygonData.fromShape(shape)
+    segments = expdand_segments(polygon_data, expand_value, internal)
+    return fix_segments(polygon_data, segments, expand_value, internal)
+
+
+RINGS = [
+    ('comb', lambda: offset_ring(rounded_comb(30), 0.3, False)),
+    ('comb_internal', lambda: offset_ring(rounded_comb(30), 0.1, True)),
+    ('star', lambda: offset_ring(star(40), 0.5, False)),
+    ('star_internal', lambda: offset_ring(star(40), 0.5, True)),
+]
+
+
+def intersecting_pairs(segments: List[ShapeSegment]) -> List[Tuple[int, int]]:
+    geometries = list(map(segment_geometry, segments))
+    result = list()
+    for index in range(geometries.__len__()):
+        for prev_index in range(index):
+            if geometries[prev_index].intersection(geometries[index]).__len__() > 0:
+                result.append((prev_index, index))
+    return result
+
+
+@pytest.mark.parametrize("segment_index", [GridSegmentIndex, SweepLineSegmentIndex])
+@pytest.mark.parametrize("name,make_ring", RINGS)
+def test_candidates_cover_every_intersection(name, make_ring, segment_index):
+    segments = make_ring()
+    index = segment_index(list(map(segment_geometry, segments)))
+
+    for prev_index, other_index in intersecting_pairs(segments):
+        assert prev_index in index.candidates(other_index)
+    for other_index in range(segments.__len__()):
+        candidates = index.candidates(other_index)
+        assert candidates == sorted(set(candidates))
+        assert all(map(lambda candidate: candidate < other_index, candidates))
+
+
+@pytest.mark.parametrize("segment_index", [GridSegmentIndex, SweepLineSegmentIndex])
+@pytest.mark.parametrize("name,make_ring", RINGS)
+def test_fix_loops_matches_brute_force(name, make_ring, segment_index):
+    segments = make_ring()
+    assert fix_loops(segments, segment_index) == fix_loops(segments, BruteForceSegmentIndex)
@@ -0,0 +1,38 @@
+from io import BytesIO
+from typing import List
+
+from laser_offset.geometry_2d.shape2d import Shape2d
+from laser_offset.geometry_2d.shapes_2d.block_reference2d import BlockReference2d
+from laser_offset.geometry_2d.shapes_2d.rect2d import Rect2d
+from laser_offset.importers.svg_importer import SVGImporter
+
+
+def import_shapes(body: str) -> List[Shape2d]:
+    document = f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">{body}</svg>'
+    return list(SVGImporter().import_shapes(BytesIO(document.encode())))
+
+
+def test_use_of_undefined_id_is_dropped():
+    shapes = import_shapes(
+        '<use href="#missing"/>'
+        '<use href="#missing" x="10"/>'
+        '<use href="#missing" x="20"/>'
+        '<rect width="5" height="5"/>')
+
+    assert list(map(type, shapes)) == [Rect2d]
+
+
+def test_every_use_before_definition_gets_the_block():
+    shapes = import_shapes(
+        '<use href="#part"/>'
+        '<use href="#part" x="10"/>'
+        '<use href="#part" x="20"/>'
+        '<rect width="5" height="5"/>'
+        '<defs><rect id="part" width="1" height="1"/></defs>'
+        '<use href="#part" x="30"/>')
+
+    assert list(map(type, shapes)) == [Rect2d, BlockReference2d, BlockReference2d, BlockReference2d, BlockReference2d]
+    # Reference after the definition is read at once, earlier ones at the end of the document in their order
+    offsets = list(map(lambda shape: shape.transform.e, shapes[1:]))
+    assert offsets == [30, 0, 10, 20]
+    assert all(map(lambda shape: shape.block.shapes.__len__() == 1, shapes[1:]))